@@ -12,6 +12,14 @@
 import pygame                  
 import math                    
 import random                  
+import sys
+import time
+
+import collisions
+import lights
+import scenario
+from governor import FrameGovernor
+from world import MODES
 
 pygame.init()                  
 
@@ -34,81 +42,30 @@ def draw_sun(surface, x, y, radius):
         sy = y + math.sin(angle) * (radius + 10)
         pygame.draw.line(surface, (255, 200, 0), (x, y), (sx, sy), 3)# draw ray line from center (x,y) to (sx,sy) 
         
-class Light:
-    def __init__(self, x, y, radius=18): #constructor for each light object: position x,y and radius default 18 
-        self.x = x                
-        self.y = y                
-        self.radius = radius      
-
-    def move_to(self, pos):
-        self.x, self.y = pos # destructure tuple and assign to instance variables
-
-    @property
-    def pos(self):
-        # property to get position as a tuple
-        return (self.x, self.y)
+class Light(lights.Light):
+    # a view onto one row of the LightManager arrays; only the look differs
+    __slots__ = ()
 
     def draw(self, surface):
         # draw this light onto the provided surface by calling helper draw_sun
-        draw_sun(surface, self.x, self.y, self.radius)
+        draw_sun(surface, self.x, self.y, int(self.radius))
+
 
+class LightManager(lights.LightManager):
+    light_class = Light          # views handed out by get_lights()
 
-class LightManager:
     def __init__(self):
-        self.lights = []         # Light instances
+        super().__init__(WIDTH, HEIGHT, radius=18, margin=50)   # positions / radii live in arrays
         self.reset_defaults()    
 
     def reset_defaults(self):
-        self.lights.clear()     
+        self.clear_all()     
         cx, cy = WIDTH // 2, HEIGHT // 2         # compute center coordinates
         spread = 150            # how far from center default lights are placed
-        self.lights.append(Light(cx - spread, cy)) #r
-        self.lights.append(Light(cx + spread, cy)) #l
-        self.lights.append(Light(cx, cy - spread)) #a
-        self.lights.append(Light(cx, cy + spread)) #b
-
-    def add_light_at(self, x, y, radius=18):
-        # add a new Light at explicit coordinates (used for mouse clicks)
-        self.lights.append(Light(x, y, radius))
-
-    def add_random_light(self, radius=18):
-        x = random.randint(50, WIDTH - 50)
-        y = random.randint(50, HEIGHT - 50)
-        self.add_light_at(x, y, radius)
-
-    def move_nearest(self, x, y, threshold_factor=2.0):
-        # move the nearest light to (x,y) if the click is sufficiently close
-        if not self.lights:
-            return False         # no lights to move: return False (indicates nothing moved)
-        nearest = min(self.lights, key=lambda L: (L.x - x)**2 + (L.y - y)**2)
-        # find the light with minimum squared distance to (x,y)
-        dist_sq = (nearest.x - x)**2 + (nearest.y - y)**2
-        # compute squared distance to nearest
-        if dist_sq <= (nearest.radius * threshold_factor)**2:
-            # if within threshold_factor * radius (squared check), consider it a hit
-            nearest.move_to((x, y))   # update the nearest light to new mouse coords
-            return True               # indicate success
-        return False                  # click too far: do nothing and return False
-
-    def remove_nearest(self, x, y, threshold_factor=2.0):
-        # remove the nearest light if the click is sufficiently close
-        if not self.lights:
-            return False
-        nearest = min(self.lights, key=lambda L: (L.x - x)**2 + (L.y - y)**2)
-        dist_sq = (nearest.x - x)**2 + (nearest.y - y)**2
-        if dist_sq <= (nearest.radius * threshold_factor)**2:
-            self.lights.remove(nearest)  # remove from the list
-            return True
-        return False
-
-    def draw(self, surface):
-        # draw all lights onto the provided surface
-        for L in self.lights:
-            L.draw(surface)
-
-    def get_lights(self):
-        # return the internal lights list (used by the vehicle to sense lights)
-        return self.lights
+        self.add_light_at(cx - spread, cy) #r
+        self.add_light_at(cx + spread, cy) #l
+        self.add_light_at(cx, cy - spread) #a
+        self.add_light_at(cx, cy + spread) #b
 
 class BraitenbergVehicle2:
     def __init__(self, x, y, radius=30, heading=0.0, mode="coward"):
@@ -137,6 +94,12 @@ class BraitenbergVehicle2:
         self.forward_speed = 0       
         self.turn_rate = 0           
 
+        self.collide_lights = False
+        # when True the car is pushed out of any sun it drives into ([K] toggles)
+
+        self._hud = None
+        # rendered UI text, reused on frames that skip re-rendering it
+
     def _sensor_positions(self):
         # compute the world coordinates of the left and right sensors based on vehicle pose
         a = self.sensor_offset_angle
@@ -229,12 +192,17 @@ class BraitenbergVehicle2:
         self.y += self.forward_speed * math.sin(self.heading)
         # integrate position: move along heading by forward_speed each frame
 
+        if self.collide_lights:
+            collisions.collide_with_lights(self, lights, WIDTH, HEIGHT)
+            # circle-vs-circle push-out using the car radius and each light radius
+
         self.x %= WIDTH
         self.y %= HEIGHT
         # wrap-around boundaries using modulus so the vehicle reappears on the opposite edge
 
    
-    def draw(self, surface, light_count):
+    def draw(self, surface, light_count, hud=True):
+        # hud=False reuses the UI text rendered last time (see governor.py)
         car_w = self.radius * 2
         car_h = self.radius * 1.2
 
@@ -299,20 +267,50 @@ class BraitenbergVehicle2:
 
         txt1 = f"Mode: {'COWARD' if self.mode=='coward' else 'AGGRESSIVE'}  [1]=coward [2]=aggressive [R]=reset  L-click:add/move  R-click:remove"
         # prepare UI string showing mode and controls; uses inline ternary to display mode label
-        txt2 = f"Lights: {light_count}   [C]=reset lights [N]=random light"
+        txt2 = f"Lights: {light_count}   [C]=reset lights [N]=random light [K]=collide {'on' if self.collide_lights else 'off'}"
         # prepare second UI string showing number of lights and additional controls
 
-        surface.blit(font.render(txt1, True, (0, 0, 0)), (10, 10))
-        # render txt1 to a Surface via font and blit (draw) it at coordinates (10,10) in black
-        surface.blit(font.render(txt2, True, (0, 0, 0)), (10, 30))
-        # render txt2 and draw at (10,30)
-
-def main():
+        if hud or self._hud is None:
+            self._hud = [font.render(txt1, True, (0, 0, 0)), font.render(txt2, True, (0, 0, 0))]
+            # render both strings to Surfaces via font, in black
+        surface.blit(self._hud[0], (10, 10))
+        # draw txt1 at coordinates (10,10)
+        surface.blit(self._hud[1], (10, 30))
+        # draw txt2 at (10,30)
+
+# scenario fields the class keeps as attributes (under its own names); scenarios
+# changing any other tunable are rejected (see scenario.script_params)
+SCENARIO_PARAMS = {
+    "radius": "radius", "sensor_angle": "sensor_offset_angle", "sensor_dist": "sensor_distance",
+    "INTENSITY_GAIN": "INTENSITY_GAIN", "BASE_SPEED": "BASE_SPEED", "MOTOR_GAIN": "MOTOR_GAIN",
+    "MAX_WHEEL_SPEED": "MAX_WHEEL_SPEED", "TURN_GAIN": "TURN_GAIN", "NOISE": "MOTOR_NOISE",
+}
+# the vehicle 4 curves play no part in vehicle 2
+UNUSED_PARAMS = ("mu_4a", "sigma_4a", "low_4b", "high_4b")
+
+def main(scenario_path=None):
     # entry point for the application logic (creates manager and vehicle, runs main loop)
     light_manager = LightManager()  # instantiate the manager that holds and manipulates lights
     vehicle = BraitenbergVehicle2(WIDTH//2, HEIGHT//2, heading=random.uniform(-math.pi, math.pi))
     # create vehicle centered on screen with random initial heading angle
 
+    if scenario_path:
+        # lights and the first vehicle's pose, mode and params come from the scenario file
+        world = scenario.load(scenario_path)
+        light_manager.load_lights(world.lights)
+        if len(world.vehicles):
+            row = world.vehicles[0]
+            vehicle.x, vehicle.y, vehicle.heading = float(row["x"]), float(row["y"]), float(row["heading"])
+            params = scenario.script_params(row, "Garimav2", SCENARIO_PARAMS, UNUSED_PARAMS)
+            for name, value in params.items():
+                setattr(vehicle, name, value)
+            if MODES[row["mode"]] in ("coward", "aggressive"):
+                vehicle.set_mode(MODES[row["mode"]])
+
+    governor = FrameGovernor(budget_ms=1000.0 / FPS)
+    # skips UI text re-renders while frames run over budget
+    frames = 0  # frames since the governor last changed level
+
     running = True  # control flag for main loop
     while running:  # game loop: runs until running is set False
         screen.fill((240, 240, 240))
@@ -354,17 +352,28 @@ def main():
                 elif event.key == pygame.K_n:
                     light_manager.add_random_light()
                     # add a random light when 'n' pressed
+                elif event.key == pygame.K_k:
+                    vehicle.collide_lights = not vehicle.collide_lights
+                    # toggle bumping into lights when 'k' pressed
 
         lights = light_manager.get_lights()  # fetch current list of lights for sensing and drawing
+        start = time.perf_counter()          # frame timing for the governor
         light_manager.draw(screen)           # draw lights to the screen first (so vehicle appears on top)
 
+        mid = time.perf_counter()
         vehicle.update(lights)               # update vehicle physics/behavior based on lights
-        vehicle.draw(screen, len(lights))    # draw the vehicle, passing light count for UI
-
+        update_ms = (time.perf_counter() - mid) * 1000.0
+        vehicle.draw(screen, len(lights), hud=frames % governor.hud_every == 0)
+        # draw the vehicle, passing light count for UI; the UI text is refreshed every hud_every frames
+
+        draw_ms = (time.perf_counter() - start) * 1000.0 - update_ms
+        if governor.frame(update_ms, draw_ms):
+            frames = -1                      # show the new level right away
+        frames += 1
         pygame.display.flip()                # flip the display buffers to show the rendered frame
         clock.tick(FPS)                      # pause to maintain the target FPS (limits speed)
 
     pygame.quit()                           # cleanup and close pygame when loop exits
 
 if __name__ == "__main__":
-    main()                                 # if script executed directly, call main() to start the app
+    main(sys.argv[1] if len(sys.argv) > 1 else None)  # if script executed directly, call main() to start the app
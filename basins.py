@@ -0,0 +1,221 @@
+"""
+Basin-of-attraction maps: which starting poses end up where.
+
+Every (x, y, heading) of a regular grid becomes one vehicle; the whole grid is
+split into tiles, each tile is one world.World stepped as a batch (noise off),
+and the tiles are spread over worker processes. After `settle` steps the
+vehicles are watched for `window` more steps with metrics.BehaviorMetrics and
+labelled:
+
+    0            escaped (neither captured nor orbiting)
+    1 + k        captured by light k (stays within capture_radius of it)
+    1 + L + k    orbiting light k (at least min_loops loops around it)
+
+The raw labels are saved as an (ny, nx, headings) uint8 .npy array, and the
+heatmap PNG colors each pixel by the most common label over the headings,
+dimmed where the headings disagree.
+
+    python basins.py vehicle4 4a --grid 512 512 16 --out basins_4a
+    python basins.py vehicle3 explorer --scenario my_scene.json
+"""
+
+import argparse
+import colorsys
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from metrics import BehaviorMetrics
+from obstacles import Obstacles
+from world import LIGHT_DTYPE, World, vehicle_row
+
+
+ESCAPED = 0
+
+# light layouts of the scripts (reset_defaults), used when no scenario is given
+DEFAULT_SCENES = {
+    "vehicle4": dict(width=900, height=700, lights=[(330, 350, 18), (570, 350, 18)]),
+    "vehicle3": dict(width=800, height=600, lights=[(250, 300, 20), (550, 300, 20),
+                                                    (400, 150, 20), (400, 450, 20)]),
+}
+
+
+def label_names(n_lights):
+    names = ["escaped"]
+    names += [f"captured by light {k}" for k in range(n_lights)]
+    names += [f"orbiting light {k}" for k in range(n_lights)]
+    return names
+
+
+def pose_grid(width, height, nx, ny, nh, first=0, last=None):
+    """Cell-centered poses first..last (default all), flattened in (y, x, heading) order."""
+    last = nx * ny * nh if last is None else last
+    iy, ix, ih = np.unravel_index(np.arange(first, last), (ny, nx, nh))
+    return (ix + 0.5) * width / nx, (iy + 0.5) * height / ny, ih * (2 * math.pi / nh)
+
+
+def classify(metrics, n_lights, capture_fraction=0.9, min_loops=2):
+    labels = np.full(metrics.n, ESCAPED, dtype=np.uint8)
+    if n_lights == 0:
+        return labels
+    frac = metrics.fraction_within()[:, :, 0]
+    captured = frac.max(axis=1) >= capture_fraction
+    labels[captured] = 1 + frac[captured].argmax(axis=1)
+    loops = metrics.loops()
+    orbiting = loops.max(axis=1) >= min_loops
+    labels[orbiting] = 1 + n_lights + loops[orbiting].argmax(axis=1)
+    return labels
+
+
+def _simulate_tile(job):
+    (first, last, scene, preset, mode, params, grid, steps) = job
+    nx, ny, nh = grid
+    settle, window, capture_radius, capture_fraction, min_loops = steps
+
+    x, y, h = pose_grid(scene["width"], scene["height"], nx, ny, nh, first, last)
+    vehicles = np.repeat(vehicle_row(preset, 0.0, 0.0, mode=mode, **params), len(x))
+    vehicles["x"] = x
+    vehicles["y"] = y
+    vehicles["heading"] = h
+
+    lights = np.zeros(len(scene["lights"]), dtype=LIGHT_DTYPE)
+    for i, (lx, ly, lr) in enumerate(scene["lights"]):
+        lights[i] = (lx, ly, lr)
+    world = World(scene["width"], scene["height"], lights, vehicles, seed=first)
+    world.periodic = scene.get("periodic", False)
+    if scene.get("obstacles"):
+        world.obstacles = Obstacles(scene["obstacles"])
+
+    world.run(settle)
+    periodic = world.periodic
+    metrics = BehaviorMetrics(len(x), lights["x"], lights["y"], radii=(capture_radius,),
+                              width=world.width if periodic else None,
+                              height=world.height if periodic else None)
+    for _ in range(window):
+        world.step()
+        metrics.update(world)
+    return first, classify(metrics, len(lights), capture_fraction, min_loops)
+
+
+def basin_map(preset, mode, scene=None, grid=(512, 512, 16), settle=1000, window=500,
+              capture_radius=60.0, capture_fraction=0.9, min_loops=2, tile=65536,
+              processes=None, noise=False, progress=None, **params):
+    """
+    Labels of every pose of the grid, shape (ny, nx, headings).
+
+    scene: dict with width, height, lights [(x, y, radius), ...] and optionally
+    periodic / obstacles; defaults to the script's own light layout.
+    """
+    if scene is None:
+        scene = DEFAULT_SCENES[preset if preset in DEFAULT_SCENES else "vehicle3"]
+    if not noise:
+        params.setdefault("NOISE", 0.0)
+    nx, ny, nh = grid
+    total = nx * ny * nh
+    steps = (settle, window, capture_radius, capture_fraction, min_loops)
+    jobs = [(first, min(first + tile, total), scene, preset, mode, params, grid, steps)
+            for first in range(0, total, tile)]
+
+    labels = np.zeros(total, dtype=np.uint8)
+    done = 0
+    if processes == 1:
+        results = map(_simulate_tile, jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(processes)
+        results = pool.map(_simulate_tile, jobs)
+    try:
+        for first, tile_labels in results:
+            labels[first:first + len(tile_labels)] = tile_labels
+            done += 1
+            if progress:
+                progress(done, len(jobs))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return labels.reshape(ny, nx, nh)
+
+
+# ---------- output ----------
+
+def palette(n_lights):
+    """RGB per label: gray for escaped, one hue per light, lighter when orbiting."""
+    colors = [(40, 40, 40)]
+    for orbit in (False, True):
+        for k in range(n_lights):
+            hue = k / max(n_lights, 1)
+            r, g, b = colorsys.hsv_to_rgb(hue, 0.45 if orbit else 0.9, 1.0 if orbit else 0.8)
+            colors.append((int(r * 255), int(g * 255), int(b * 255)))
+    return np.array(colors, dtype=np.uint8)
+
+
+def heatmap(labels, n_lights):
+    """(ny, nx, 3) image: most common label over the headings, dimmed by disagreement."""
+    n_labels = 1 + 2 * n_lights
+    counts = np.stack([(labels == k).sum(axis=2) for k in range(n_labels)], axis=2)
+    winner = counts.argmax(axis=2)
+    agreement = counts.max(axis=2) / labels.shape[2]
+    rgb = palette(n_lights)[winner].astype(float)
+    return (rgb * (0.35 + 0.65 * agreement)[:, :, None]).astype(np.uint8)
+
+
+def save_outputs(labels, n_lights, prefix):
+    """Write <prefix>.npy (raw labels) and <prefix>.png (heatmap)."""
+    import pygame
+
+    np.save(prefix + ".npy", labels, allow_pickle=False)
+    image = heatmap(labels, n_lights)
+    surface = pygame.surfarray.make_surface(np.ascontiguousarray(image.transpose(1, 0, 2)))
+    pygame.image.save(surface, prefix + ".png")
+
+
+def _scene_from_scenario(path):
+    import scenario
+
+    world = scenario.load(path)
+    return dict(width=world.width, height=world.height,
+                lights=[(float(L["x"]), float(L["y"]), float(L["radius"])) for L in world.lights],
+                periodic=world.periodic,
+                obstacles=[p.tolist() for p in world.obstacles.polygons] if world.obstacles else [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Basin-of-attraction map over initial poses.")
+    parser.add_argument("preset", choices=["vehicle4", "vehicle3"],
+                        help="vehicle4 (Vehicle4) or vehicle3 (BraitenbergVehicle)")
+    parser.add_argument("mode", choices=["4a", "4b", "lover", "explorer"])
+    parser.add_argument("--scenario", help="take world size and lights from a scenario/snapshot")
+    parser.add_argument("--grid", type=int, nargs=3, default=(512, 512, 16), metavar=("NX", "NY", "NH"))
+    parser.add_argument("--settle", type=int, default=1000)
+    parser.add_argument("--window", type=int, default=500)
+    parser.add_argument("--capture-radius", type=float, default=60.0)
+    parser.add_argument("--tile", type=int, default=65536)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--out", default=None, help="output prefix (default basins_<mode>)")
+    args = parser.parse_args()
+
+    scene = _scene_from_scenario(args.scenario) if args.scenario else DEFAULT_SCENES[args.preset]
+    start = time.perf_counter()
+
+    def progress(done, total):
+        print(f"\rtile {done}/{total}  {time.perf_counter() - start:.0f}s", end="", flush=True)
+
+    labels = basin_map(args.preset, args.mode, scene, tuple(args.grid), args.settle, args.window,
+                       args.capture_radius, tile=args.tile, processes=args.processes,
+                       progress=progress)
+    print()
+    prefix = args.out or f"basins_{args.mode}"
+    save_outputs(labels, len(scene["lights"]), prefix)
+
+    names = label_names(len(scene["lights"]))
+    counts = np.bincount(labels.ravel(), minlength=len(names))
+    for name, count in zip(names, counts):
+        print(f"{name:24s} {count / labels.size:6.1%}")
+    print(f"wrote {os.path.abspath(prefix)}.npy / .png")
+
+
+if __name__ == "__main__":
+    main()
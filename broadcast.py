@@ -0,0 +1,412 @@
+"""
+Live state broadcast of a running World to other processes or machines.
+
+StateBroadcaster runs a small server next to the simulation and sends the
+vehicle and light state to every subscriber, at most `rate` times a second.
+Subscribers can be plain TCP clients (every frame behind a 4-byte length) or
+WebSocket clients (every frame one binary message; e.g. from a browser).
+
+Frames are compact. Positions, headings and radii are quantized to 16 bits.
+After a key frame each frame carries only the change since the previous one,
+zlib-compressed. The change is almost all zeros for lights and small for
+vehicles. Every subscriber has a short queue and its own sender thread. If a
+subscriber cannot keep up, frames are dropped for it alone, and its next
+frame is a key frame. The simulation never waits for the network.
+
+    python broadcast.py serve my_scene.json --port 8765 --rate 30
+    python broadcast.py view --host 192.168.1.20 --port 8765
+
+The viewer needs pygame and draws with render.py; the server does not.
+"""
+
+import argparse
+import base64
+import hashlib
+import math
+import queue
+import socket
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from world import LIGHT_DTYPE, VEHICLE_DTYPE
+
+
+MAGIC = b"BVST"
+VERSION = 1
+KEY, DELTA = 0, 1
+# magic, version, kind, step, vehicles, lights, width, height
+HEADER = struct.Struct("<4sBBIIIff")
+
+RADIUS_SCALE = 16.0            # radii in 1/16 px
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+# ---------- encoding ----------
+
+def quantize(world):
+    """uint16 vehicle rows (x, y, heading, radius) and light rows (x, y, radius)."""
+    v = world.vehicles
+    L = world.lights
+    sx = 65535.0 / world.width
+    sy = 65535.0 / world.height
+    qv = np.empty((len(v), 4), dtype=np.uint16)
+    qv[:, 0] = np.clip(np.rint(v["x"] * sx), 0, 65535)
+    qv[:, 1] = np.clip(np.rint(v["y"] * sy), 0, 65535)
+    qv[:, 2] = np.rint((v["heading"] % (2 * math.pi)) * (65536 / (2 * math.pi))).astype(np.int64) % 65536
+    qv[:, 3] = np.clip(np.rint(v["radius"] * RADIUS_SCALE), 0, 65535)
+    ql = np.empty((len(L), 3), dtype=np.uint16)
+    ql[:, 0] = np.clip(np.rint(L["x"] * sx), 0, 65535)
+    ql[:, 1] = np.clip(np.rint(L["y"] * sy), 0, 65535)
+    ql[:, 2] = np.clip(np.rint(L["radius"] * RADIUS_SCALE), 0, 65535)
+    return qv, ql
+
+
+def encode(kind, step, width, height, qv, ql, base=None):
+    """One frame; a DELTA frame stores (q - base) modulo 2^16 for base = (qv, ql) of the last frame."""
+    if kind == DELTA:
+        qv = qv - base[0]              # uint16 arithmetic wraps, which the decoder undoes
+        ql = ql - base[1]
+    payload = zlib.compress(qv.tobytes() + ql.tobytes(), 1)
+    return HEADER.pack(MAGIC, VERSION, kind, step, len(qv), len(ql), width, height) + payload
+
+
+def decode(frame, base=None):
+    """(step, width, height, qv, ql) of a frame; a DELTA frame needs the previous (qv, ql)."""
+    magic, version, kind, step, n, m, width, height = HEADER.unpack_from(frame)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a state frame")
+    data = np.frombuffer(zlib.decompress(frame[HEADER.size:]), dtype=np.uint16)
+    qv = data[:n * 4].reshape(n, 4)
+    ql = data[n * 4:].reshape(m, 3)
+    if kind == DELTA:
+        if base is None or len(base[0]) != n or len(base[1]) != m:
+            raise ValueError("delta frame without a matching key frame")
+        qv = qv + base[0]
+        ql = ql + base[1]
+    return step, width, height, qv, ql
+
+
+class StreamView:
+    """A World-like view of received state, for render.py (no trails, no sensors)."""
+
+    def __init__(self):
+        self.step_count = 0
+        self.width = 1
+        self.height = 1
+        self.vehicles = np.zeros(0, dtype=VEHICLE_DTYPE)
+        self.lights = np.zeros(0, dtype=LIGHT_DTYPE)
+        self.trail_len = 0
+        self.obstacles = None
+        self._base = None
+
+    def apply(self, frame):
+        step, width, height, qv, ql = decode(frame, self._base)
+        self._base = (qv, ql)
+        self.step_count = step
+        self.width = width
+        self.height = height
+        if len(self.vehicles) != len(qv):
+            self.vehicles = np.zeros(len(qv), dtype=VEHICLE_DTYPE)
+        if len(self.lights) != len(ql):
+            self.lights = np.zeros(len(ql), dtype=LIGHT_DTYPE)
+        self.vehicles["x"] = qv[:, 0] * (width / 65535.0)
+        self.vehicles["y"] = qv[:, 1] * (height / 65535.0)
+        self.vehicles["heading"] = qv[:, 2] * (2 * math.pi / 65536)
+        self.vehicles["radius"] = qv[:, 3] / RADIUS_SCALE
+        self.lights["x"] = ql[:, 0] * (width / 65535.0)
+        self.lights["y"] = ql[:, 1] * (height / 65535.0)
+        self.lights["radius"] = ql[:, 2] / RADIUS_SCALE
+
+
+# ---------- server ----------
+
+def _websocket_handshake(conn):
+    request = b""
+    while b"\r\n\r\n" not in request:
+        chunk = conn.recv(4096)
+        if not chunk:
+            raise ConnectionError("closed during handshake")
+        request += chunk
+    key = None
+    for line in request.split(b"\r\n"):
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"sec-websocket-key":
+            key = value.strip()
+    if key is None:
+        raise ConnectionError("not a WebSocket request")
+    accept = base64.b64encode(hashlib.sha1(key + _WS_GUID).digest())
+    conn.sendall(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                 b"Connection: Upgrade\r\nSec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+
+
+def _websocket_message(frame):
+    n = len(frame)
+    if n < 126:
+        head = struct.pack("!BB", 0x82, n)
+    elif n < 1 << 16:
+        head = struct.pack("!BBH", 0x82, 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x82, 127, n)
+    return head + frame
+
+
+class _Subscriber:
+    def __init__(self, conn, address, websocket, queue_size):
+        self.conn = conn
+        self.address = address
+        self.websocket = websocket
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.needs_key = True          # a new or lagging subscriber starts over from a key frame
+        self.sent = 0
+        self.dropped = 0
+        self.alive = True
+
+    def offer(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self.needs_key = True
+            return False
+
+    def run(self):
+        try:
+            while self.alive:
+                frame = self.queue.get()
+                if frame is None:
+                    break
+                data = _websocket_message(frame) if self.websocket else struct.pack("<I", len(frame)) + frame
+                self.conn.sendall(data)
+                self.sent += 1
+        except OSError:
+            pass
+        finally:
+            self.alive = False
+            self.conn.close()
+
+
+class StateBroadcaster:
+    def __init__(self, world, host="127.0.0.1", port=8765, rate=30.0, queue_size=2):
+        """host: "0.0.0.0" to serve the LAN; port 0 picks a free one (see .port)."""
+        self.world = world
+        self.rate = rate
+        self.queue_size = queue_size
+        self.published = 0
+        self.key_frames = 0
+        self.bytes_out = 0
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._base = None              # (qv, ql) of the last published frame
+        self._next = 0.0
+
+        self._server = socket.create_server((host, port))
+        self.port = self._server.getsockname()[1]
+        self._running = True
+        self._accepter = threading.Thread(target=self._accept, name="broadcast-accept", daemon=True)
+        self._accepter.start()
+
+    # ---------- simulation thread ----------
+
+    def maybe_publish(self):
+        """Publish if the last frame is older than 1 / rate; call it after every step."""
+        now = time.perf_counter()
+        if now >= self._next:
+            self._next = now + 1.0 / self.rate if self.rate else now
+            self.publish()
+
+    def publish(self):
+        world = self.world
+        qv, ql = quantize(world)
+        base = self._base
+        same_shape = base is not None and len(base[0]) == len(qv) and len(base[1]) == len(ql)
+        args = (world.step_count, world.width, world.height, qv, ql)
+        delta = encode(DELTA, *args, base=base) if same_shape else None
+        key = None
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s.alive]
+            subscribers = list(self._subscribers)
+        for s in subscribers:
+            if s.needs_key or delta is None:
+                if key is None:
+                    key = encode(KEY, *args)
+                    self.key_frames += 1
+                if s.offer(key):
+                    s.needs_key = False
+                    self.bytes_out += len(key)
+            elif s.offer(delta):
+                self.bytes_out += len(delta)
+        self._base = (qv, ql)
+        self.published += 1
+
+    def stats(self):
+        with self._lock:
+            subs = [s for s in self._subscribers if s.alive]
+        return {"subscribers": len(subs), "published": self.published, "key_frames": self.key_frames,
+                "bytes_out": self.bytes_out, "dropped": {s.address: s.dropped for s in subs}}
+
+    def close(self):
+        self._running = False
+        self._server.close()
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for s in subscribers:
+            s.alive = False
+            try:
+                s.queue.put_nowait(None)
+            except queue.Full:
+                pass
+            try:
+                s.conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    # ---------- server threads ----------
+
+    def _accept(self):
+        while self._running:
+            try:
+                conn, address = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._greet, args=(conn, address), daemon=True).start()
+
+    def _greet(self, conn, address):
+        try:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.settimeout(5.0)
+            websocket = conn.recv(4, socket.MSG_PEEK) == b"GET "
+            if websocket:
+                _websocket_handshake(conn)
+            conn.settimeout(None)
+        except OSError:
+            conn.close()
+            return
+        s = _Subscriber(conn, f"{address[0]}:{address[1]}", websocket, self.queue_size)
+        with self._lock:
+            if not self._running:
+                conn.close()
+                return
+            self._subscribers.append(s)
+        s.run()
+
+
+# ---------- client ----------
+
+def frames(host, port):
+    """Receive frames from a TCP subscription until the server goes away."""
+    with socket.create_connection((host, port)) as conn:
+        conn.sendall(b"BVS1")          # anything but "GET " selects plain TCP
+        f = conn.makefile("rb")
+        while True:
+            try:
+                head = f.read(4)
+                if len(head) < 4:
+                    return
+                (size,) = struct.unpack("<I", head)
+                frame = f.read(size)
+            except ConnectionError:        # a closing server may reset instead of shutting down
+                return
+            if len(frame) < size:
+                return
+            yield frame
+
+
+def serve(args):
+    import scenario
+
+    world = scenario.load(args.scenario)
+    caster = StateBroadcaster(world, args.bind, args.port, args.rate)
+    print(f"serving {len(world.vehicles)} vehicles on {args.bind}:{caster.port} at {args.rate:g} frames/s")
+    period = 1.0 / args.steps_per_second if args.steps_per_second else 0.0
+    next_step = time.perf_counter()
+    last_report = next_step
+    try:
+        while True:
+            world.step()
+            caster.maybe_publish()
+            if period:
+                next_step += period
+                delay = next_step - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_step = time.perf_counter()
+            if time.perf_counter() - last_report >= 5.0:
+                last_report = time.perf_counter()
+                s = caster.stats()
+                print(f"step {world.step_count}: {s['subscribers']} subscribers, "
+                      f"{s['bytes_out'] / 1e6:.1f} MB sent, dropped {s['dropped']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        caster.close()
+
+
+def view(args):
+    import pygame
+
+    import render
+
+    state = StreamView()
+    latest = {"frame": None, "done": False}
+    lock = threading.Lock()
+
+    def receive():
+        try:
+            for frame in frames(args.host, args.port):
+                with lock:
+                    state.apply(frame)
+        except OSError:
+            pass
+        latest["done"] = True
+
+    threading.Thread(target=receive, name="receive", daemon=True).start()
+
+    pygame.init()
+    screen = None
+    font = pygame.font.SysFont(None, 20)
+    clock = pygame.time.Clock()
+    renderer = render.LodRenderer()
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+        with lock:
+            size = (int(state.width), int(state.height))
+            if size[0] > 1 and (screen is None or screen.get_size() != size):
+                screen = pygame.display.set_mode(size)
+                pygame.display.set_caption(f"Broadcast from {args.host}:{args.port}")
+            if screen is not None:
+                hud = [f"step {state.step_count}   {clock.get_fps():.0f} fps"
+                       + ("   (server gone)" if latest["done"] else "")]
+                renderer.draw(screen, state, trails=False, sensors=False, hud=hud, font=font)
+        if screen is not None:
+            pygame.display.flip()
+        clock.tick(60)
+    pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broadcast a running scenario, or view a broadcast.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("serve", help="run a scenario headless and broadcast it")
+    p.add_argument("scenario")
+    p.add_argument("--bind", default="127.0.0.1", help="0.0.0.0 to serve the LAN")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--rate", type=float, default=30.0, help="frames per second sent")
+    p.add_argument("--steps-per-second", type=float, default=None, help="default: as fast as possible")
+    p = sub.add_parser("view", help="draw a broadcast with pygame")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    serve(args) if args.command == "serve" else view(args)
+
+
+if __name__ == "__main__":
+    main()
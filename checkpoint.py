@@ -0,0 +1,312 @@
+"""
+Checkpoints of a running World, written in the background.
+
+A checkpoint directory holds a manifest plus one file per state part:
+
+    manifest.json                 step, world size, RNG state, obstacles, part file names
+    vehicles-<gen>.npy            full vehicle rows (poses, wheel speeds, modes, ...)
+    lights-<gen>.npy              light rows, rewritten only when the lights changed
+    trail-<block>-<gen>.npy       trail ring buffer, split in blocks of columns;
+                                  only the blocks written since the last checkpoint
+                                  are saved again
+    extras-<gen>.npz              light strengths, light motion and sensor rigs, if any
+
+The manifest also keeps the world's switches (periodic sensing, collisions,
+sense radius, occlusion threshold) and the recipes of its transfer tables.
+Tables not made by a transfer.RECIPES builder cannot be rebuilt, so
+checkpoint() rejects worlds that use them.
+
+The simulation thread only copies the parts that changed (a memcpy) and hands
+them to a writer thread. The writer writes the new part files, then replaces the
+manifest atomically, so a crash at any point leaves the previous checkpoint
+intact. Restoring a checkpoint continues the run bit for bit.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+import transfer
+from lightmotion import LightMotion
+from obstacles import Obstacles
+from world import SensorRig, World
+
+
+MANIFEST = "manifest.json"
+TRAIL_BLOCK = 256          # trail columns per block file
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return             # e.g. Windows cannot open directories
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_array(path, array):
+    with open(path, "wb") as f:
+        np.save(f, array, allow_pickle=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _write_arrays(path, arrays):
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+_RIG_FIELDS = ("angles", "distances", "weights", "fov", "transfer")
+
+
+def _extras(world):
+    """Arrays of the optional world parts, flattened into one name -> array dict."""
+    arrays = {}
+    if world.light_strength is not None:
+        arrays["light_strength"] = np.array(world.light_strength)
+    if world.light_motion is not None:
+        for name in LightMotion._PER_LIGHT + ("path_points", "path_arc", "path_key"):
+            arrays[f"motion.{name}"] = np.array(getattr(world.light_motion, name))
+    for i, (rows, rig) in enumerate(world.rigs):
+        arrays[f"rig{i}.rows"] = np.array(rows)
+        for name in _RIG_FIELDS:
+            arrays[f"rig{i}.{name}"] = np.array(getattr(rig, name))
+        if rig.readings is not None:
+            arrays[f"rig{i}.readings"] = np.array(rig.readings)
+    return arrays
+
+
+def _tables(world):
+    tables = {}
+    for key, table in world.transfer.items():
+        if getattr(table, "recipe", None) not in transfer.RECIPES:
+            raise ValueError(f"transfer table {key!r} has no recipe and cannot be checkpointed")
+        tables[str(int(key))] = {"recipe": table.recipe, "tolerance": table.tolerance, "params": table.params}
+    return tables
+
+
+class Checkpointer:
+    """
+    Periodic background checkpoints of one World.
+
+    Call `maybe_checkpoint()` once per step (or `checkpoint()` whenever you like).
+    If the writer is still busy when the next checkpoint is due, the pending one
+    is replaced by the newer state instead of blocking the simulation.
+    """
+
+    def __init__(self, world, directory, every=1000):
+        self.world = world
+        self.directory = directory
+        self.every = every
+        os.makedirs(directory, exist_ok=True)
+
+        self._generation = 0
+        self._files = {}                 # part name -> file name in the last capture
+        self._lights_version = None
+        self._trail_step = None          # step_count at the last captured trail
+        self._trail_rows = None
+        self.written = 0                 # checkpoints fully on disk
+        self.dropped = 0                 # checkpoints superseded before being written
+
+        self._pending = None
+        self._cond = threading.Condition()
+        self._closing = False
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    # ---------- simulation thread ----------
+
+    def maybe_checkpoint(self):
+        if self.every and self.world.step_count % self.every == 0:
+            self.checkpoint()
+
+    def checkpoint(self):
+        if self._error is not None:
+            raise RuntimeError("checkpoint writer failed") from self._error
+
+        w = self.world
+        # everything that can reject the world runs before the bookkeeping below changes
+        tables = _tables(w)
+        extras = _extras(w)
+        self._generation += 1
+        gen = self._generation
+        parts = {}
+
+        parts[f"vehicles-{gen:08d}.npy"] = w.vehicles.copy()
+        self._files["vehicles"] = f"vehicles-{gen:08d}.npy"
+
+        if w.lights_version != self._lights_version or "lights" not in self._files:
+            parts[f"lights-{gen:08d}.npy"] = w.lights.copy()
+            self._files["lights"] = f"lights-{gen:08d}.npy"
+            self._lights_version = w.lights_version
+
+        for block in self._dirty_trail_blocks():
+            cols = slice(block * TRAIL_BLOCK, (block + 1) * TRAIL_BLOCK)
+            name = f"trail-{block:04d}-{gen:08d}.npy"
+            parts[name] = w.trail[:, cols].copy()
+            self._files[f"trail-{block:04d}"] = name
+        self._trail_step = w.step_count
+
+        if extras:
+            parts[f"extras-{gen:08d}.npz"] = extras
+            self._files["extras"] = f"extras-{gen:08d}.npz"
+        else:
+            self._files.pop("extras", None)
+
+        manifest = {
+            "step_count": w.step_count,
+            "width": w.width,
+            "height": w.height,
+            "lights_version": w.lights_version,
+            "trail_len": w.trail_len,
+            "trail_head": w.trail_head,
+            "rng": w.rng.bit_generator.state,
+            "obstacles": [p.tolist() for p in w.obstacles.polygons] if w.obstacles else [],
+            "occlusion_min_intensity": w.occlusion_min_intensity,
+            "periodic": w.periodic,
+            "periodic_cutoff": w.periodic_cutoff,
+            "collisions": w.collisions,
+            "contacts": int(w.contacts),
+            "vehicle_sense_radius": w.vehicle_sense_radius,
+            "bit_exact": w.bit_exact,
+            "transfer": tables,
+            "light_motion": w.light_motion is not None,
+            "rigs": len(w.rigs),
+            "files": dict(self._files),
+        }
+
+        with self._cond:
+            if self._pending is not None:
+                # not written yet: carry over the part files the newer manifest still uses
+                old_parts, _ = self._pending
+                used = set(manifest["files"].values())
+                parts = {**{n: a for n, a in old_parts.items() if n in used}, **parts}
+                self.dropped += 1
+            self._pending = (parts, manifest)
+            self._cond.notify()
+
+    def _dirty_trail_blocks(self):
+        w = self.world
+        blocks = -(-w.trail_len // TRAIL_BLOCK)
+        if self._trail_step is None or w.trail.shape[0] != self._trail_rows:
+            self._trail_rows = w.trail.shape[0]
+            return range(blocks)
+        steps = w.step_count - self._trail_step
+        if steps >= w.trail_len:
+            return range(blocks)
+        dirty = set()
+        for k in range(steps):
+            dirty.add(((w.trail_head - 1 - k) % w.trail_len) // TRAIL_BLOCK)
+            if len(dirty) == blocks:
+                break
+        return sorted(dirty)
+
+    def close(self):
+        """Write whatever is pending and stop the writer thread."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("checkpoint writer failed") from self._error
+
+    # ---------- writer thread ----------
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closing:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                parts, manifest = self._pending
+                self._pending = None
+            try:
+                self._write(parts, manifest)
+            except Exception as exc:       # surfaced on the next checkpoint() / close()
+                self._error = exc
+                return
+
+    def _write(self, parts, manifest):
+        for name, array in parts.items():
+            if isinstance(array, dict):
+                _write_arrays(os.path.join(self.directory, name), array)
+            else:
+                _write_array(os.path.join(self.directory, name), array)
+        _fsync_dir(self.directory)
+
+        tmp = os.path.join(self.directory, MANIFEST + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.directory, MANIFEST))
+        _fsync_dir(self.directory)
+        self.written += 1
+
+        # anything the new manifest does not reference is garbage now
+        keep = set(manifest["files"].values()) | {MANIFEST}
+        for name in os.listdir(self.directory):
+            if name.endswith((".npy", ".npz")) and name not in keep:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+def restore(directory):
+    """Rebuild the World saved in a checkpoint directory."""
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    files = manifest["files"]
+
+    def load(name):
+        return np.load(os.path.join(directory, files[name]), allow_pickle=False)
+
+    world = World(manifest["width"], manifest["height"], load("lights"), load("vehicles"),
+                  trail_len=manifest["trail_len"])
+    for block in range(-(-world.trail_len // TRAIL_BLOCK)):
+        cols = slice(block * TRAIL_BLOCK, (block + 1) * TRAIL_BLOCK)
+        world.trail[:, cols] = load(f"trail-{block:04d}")
+    world.trail_head = manifest["trail_head"]
+    world.step_count = manifest["step_count"]
+    world.lights_version = manifest["lights_version"]
+    world.rng.bit_generator.state = manifest["rng"]
+    if manifest.get("obstacles"):
+        world.obstacles = Obstacles(manifest["obstacles"])
+    world.occlusion_min_intensity = manifest.get("occlusion_min_intensity", 0.0)
+    world.periodic = manifest.get("periodic", False)
+    world.periodic_cutoff = manifest.get("periodic_cutoff")
+    world.collisions = manifest.get("collisions", False)
+    world.contacts = manifest.get("contacts", 0)
+    world.vehicle_sense_radius = manifest.get("vehicle_sense_radius", world.vehicle_sense_radius)
+    # checkpoints written before the flag existed were stepped with math.exp
+    world.bit_exact = manifest.get("bit_exact", True)
+    for key, t in manifest.get("transfer", {}).items():
+        world.transfer[int(key)] = transfer.from_recipe(t["recipe"], t["tolerance"], t["params"])
+
+    if "extras" not in files:
+        return world
+    with np.load(os.path.join(directory, files["extras"]), allow_pickle=False) as extras:
+        if "light_strength" in extras:
+            world.light_strength = extras["light_strength"]
+        if manifest.get("light_motion"):
+            motion = LightMotion()
+            for name in LightMotion._PER_LIGHT + ("path_points", "path_arc", "path_key"):
+                setattr(motion, name, extras[f"motion.{name}"])
+            world.light_motion = motion
+        for i in range(manifest.get("rigs", 0)):
+            rig = SensorRig(extras[f"rig{i}.angles"], extras[f"rig{i}.distances"],
+                            extras[f"rig{i}.weights"], extras[f"rig{i}.fov"], extras[f"rig{i}.transfer"])
+            if f"rig{i}.readings" in extras:
+                rig.readings = extras[f"rig{i}.readings"]
+            world.add_rig(rig, extras[f"rig{i}.rows"])
+    return world
@@ -0,0 +1,124 @@
+"""
+Circle collisions between vehicles and between vehicles and lights.
+
+Broad phase: a uniform grid (spatial.SpatialHash) proposes candidate pairs.
+Narrow phase: one vectorized overlap test over all candidates, then every
+overlapping pair is pushed apart along the line between the centers. Lights
+don't move, so a vehicle overlapping a light is pushed all the way out.
+
+The world wraps around, so the grids are periodic and the distances use the
+nearest image: two vehicles on opposite edges can touch.
+"""
+
+import math
+
+import numpy as np
+
+from spatial import SpatialHash
+
+
+def _normals(dx, dy):
+    dist = np.hypot(dx, dy)
+    # exactly coincident centers: separate along x
+    safe = dist > 1e-9
+    nx = np.where(safe, dx / np.where(safe, dist, 1.0), 1.0)
+    ny = np.where(safe, dy / np.where(safe, dist, 1.0), 0.0)
+    return nx, ny
+
+
+def _wrap(dx, dy, width, height):
+    dx -= width * np.round(dx / width)
+    dy -= height * np.round(dy / height)
+
+
+def _push(x, y, i, nx, ny, depth):
+    # move points i by depth along -(nx, ny), summing over multiple contacts
+    x -= np.bincount(i, weights=nx * depth, minlength=len(x))
+    y -= np.bincount(i, weights=ny * depth, minlength=len(y))
+
+
+def resolve_vehicle_collisions(x, y, radius, width, height, grid=None):
+    """Separate overlapping vehicles in place; returns the number of contacts."""
+    n = len(x)
+    if n < 2:
+        return 0
+    reach = 2.0 * float(radius.max())
+    if grid is None or grid.cell_size < reach or not grid.periodic:
+        grid = SpatialHash(reach, width, height, periodic=True)
+    # positions may have stepped just over the edge; bin them where they wrap to
+    wx = x % width
+    wy = y % height
+    grid.build(wx, wy)
+    i, j = grid.candidate_pairs(wx, wy, reach)
+    keep = i < j
+    i, j = i[keep], j[keep]
+
+    dx = x[j] - x[i]
+    dy = y[j] - y[i]
+    _wrap(dx, dy, width, height)
+    overlap = radius[i] + radius[j] - np.hypot(dx, dy)
+    hit = overlap > 0
+    i, j, dx, dy, overlap = i[hit], j[hit], dx[hit], dy[hit], overlap[hit]
+    if len(i) == 0:
+        return 0
+
+    # each vehicle of a pair takes half of the correction
+    nx, ny = _normals(dx, dy)
+    _push(x, y, i, nx, ny, 0.5 * overlap)
+    _push(x, y, j, -nx, -ny, 0.5 * overlap)
+    return len(i)
+
+
+def resolve_light_collisions(x, y, radius, light_x, light_y, light_r, grid):
+    """
+    Push vehicles out of the lights they overlap, in place; returns the contact count.
+
+    `grid` comes from light_grid() and can be kept until the lights change.
+    """
+    if len(x) == 0 or len(light_x) == 0:
+        return 0
+    reach = float(radius.max()) + float(light_r.max())
+    width = grid.nx * grid.cell_w
+    height = grid.ny * grid.cell_h
+    i, k = grid.candidate_pairs(x % width, y % height, reach)
+
+    dx = light_x[k] - x[i]
+    dy = light_y[k] - y[i]
+    _wrap(dx, dy, width, height)
+    overlap = radius[i] + light_r[k] - np.hypot(dx, dy)
+    hit = overlap > 0
+    if not hit.any():
+        return 0
+    nx, ny = _normals(dx[hit], dy[hit])
+    _push(x, y, i[hit], nx, ny, overlap[hit])
+    return int(hit.sum())
+
+
+def light_grid(light_x, light_y, light_r, max_vehicle_radius, width, height):
+    """Grid over static lights, reusable across steps until the lights change."""
+    reach = max_vehicle_radius + (float(light_r.max()) if len(light_r) else 0.0)
+    grid = SpatialHash(max(reach, 1.0), width, height, periodic=True)
+    grid.build(light_x % width, light_y % height)
+    return grid
+
+
+def collide_with_lights(vehicle, lights, width=None, height=None):
+    """
+    Object version for the pygame scripts: push one vehicle out of any light it overlaps.
+
+    With `width` and `height` the world wraps, and lights are met across the edges.
+    """
+    for L in lights:
+        dx = vehicle.x - L.x
+        dy = vehicle.y - L.y
+        if width is not None:
+            dx -= width * round(dx / width)
+            dy -= height * round(dy / height)
+        dist = math.hypot(dx, dy)
+        overlap = vehicle.radius + L.radius - dist
+        if overlap > 0:
+            if dist > 1e-9:
+                vehicle.x += dx / dist * overlap
+                vehicle.y += dy / dist * overlap
+            else:
+                vehicle.x += overlap
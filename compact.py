@@ -0,0 +1,202 @@
+"""
+Compact vehicle objects for large object-based populations.
+
+The script classes give every vehicle its own __dict__ with 25+ attributes,
+most of them constants (INTENSITY_GAIN, MOTOR_GAIN, TURN_GAIN, ...) that are
+the same for every vehicle of a kind. Here the constants live in one
+immutable VehicleParams, shared by all vehicles of that kind. A
+CompactVehicle has __slots__ for its own state (pose, last readings, wheel
+speeds) plus a reference to its params.
+
+VehicleParams also precomputes what the classes recompute each update: the
+sensors' local offsets and the wiring of the mode. Modes, presets and
+parameter names are the ones of world.py, so
+
+    params = VehicleParams.from_preset("vehicle4", mode="4a", width=900, height=700)
+    fleet = [CompactVehicle(params, x, y, h) for x, y, h in poses]
+    for v in fleet:
+        v.update(lights)                      # objects with .pos, like the scripts'
+
+drives every vehicle the way its script class does, draw for draw of the
+`random` module when seeded alike.
+"""
+
+import math
+import random
+
+import numpy as np
+
+from world import (EXPLORER_GAIN, FALLOFF_LINEAR, MODES, TRANSFER_BELL, TRANSFER_FIXED,
+                   TRANSFER_STEP, VEHICLE_DTYPE, vehicle_row)
+
+
+# per-vehicle state; everything else is shared through VehicleParams
+_POSE = ("x", "y", "heading")
+_STATE = ("left_I", "right_I", "left_w", "right_w", "v", "omega")
+
+# row fields that are neither pose nor per-step state
+_PARAM_FIELDS = tuple(name for name in VEHICLE_DTYPE.names
+                      if name not in _POSE + _STATE + ("wiring", "transfer"))
+
+
+class VehicleParams:
+    """Immutable tunables shared by many CompactVehicles; use replace() to derive variants."""
+
+    __slots__ = _PARAM_FIELDS + ("name", "width", "height", "periodic", "sensor_lx", "sensor_ly",
+                                 "wiring", "transfer", "fast")
+
+    def __init__(self, row, width=800, height=600, periodic=False):
+        """row: one world.VEHICLE_DTYPE row (see from_preset)."""
+        init = object.__setattr__
+        for name in _PARAM_FIELDS:
+            init(self, name, row[name].item())
+        init(self, "name", MODES[self.mode])
+        init(self, "width", width)
+        init(self, "height", height)
+        init(self, "periodic", periodic)
+        # local sensor offsets: left at (lx, ly), right mirrored at (lx, -ly)
+        init(self, "sensor_lx", math.cos(self.sensor_angle) * self.sensor_dist)
+        init(self, "sensor_ly", math.sin(self.sensor_angle) * self.sensor_dist)
+        init(self, "wiring", tuple(tuple(r) for r in np.asarray(row["wiring"]).tolist()))
+        init(self, "transfer", tuple(np.asarray(row["transfer"]).tolist()))
+        # inverse-square falloff with eps > 0 on a plain plane takes the inlined path in update()
+        init(self, "fast", self.falloff != FALLOFF_LINEAR and self.EPS > 0 and not periodic)
+
+    @classmethod
+    def from_preset(cls, preset, mode=None, width=800, height=600, periodic=False, **params):
+        row = vehicle_row(preset, 0.0, 0.0, mode=mode, **params)[0]
+        return cls(row, width, height, periodic)
+
+    def replace(self, **params):
+        """A copy with some tunables changed (names as in world.VEHICLE_DTYPE)."""
+        row = np.zeros((), dtype=VEHICLE_DTYPE)
+        for name in _PARAM_FIELDS:
+            row[name] = getattr(self, name)
+        row["wiring"] = self.wiring
+        row["transfer"] = self.transfer
+        for name, value in params.items():
+            row[name] = value
+        return VehicleParams(row, self.width, self.height, self.periodic)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("VehicleParams is immutable; use replace()")
+
+    def __repr__(self):
+        return f"VehicleParams({self.name}, radius={self.radius})"
+
+    # ---------- per-sensor pieces ----------
+
+    def intensity(self, dx, dy):
+        """One light seen from offset (dx, dy), clamped to [0, I_MAX]."""
+        if self.periodic:
+            dx -= self.width * round(dx / self.width)
+            dy -= self.height * round(dy / self.height)
+        if self.falloff == FALLOFF_LINEAR:
+            dist = math.hypot(dx, dy)
+            I = max(self.MAX_SENSOR_RANGE - dist, 0.0) / self.MAX_SENSOR_RANGE * self.I_MAX
+        else:
+            den = dx * dx + dy * dy + self.EPS
+            I = self.INTENSITY_GAIN / den if den > 0 else math.inf
+        return max(0.0, min(self.I_MAX, I))
+
+    def drive(self, I, transfer):
+        """Motor drive f(I) of one sensor."""
+        if transfer == TRANSFER_FIXED:
+            return EXPLORER_GAIN * I
+        if transfer == TRANSFER_BELL:
+            sigma = self.sigma_4a
+            return self.MOTOR_GAIN * math.exp(-((I - self.mu_4a) ** 2) / (2.0 * sigma * sigma))
+        if transfer == TRANSFER_STEP:
+            level = 0.0 if I < self.low_4b else 0.5 if I < self.high_4b else 1.0
+            return self.MOTOR_GAIN * level
+        return self.MOTOR_GAIN * I
+
+
+class CompactVehicle:
+    __slots__ = _POSE + _STATE + ("params",)
+
+    def __init__(self, params, x, y, heading=0.0):
+        self.params = params
+        self.x = x
+        self.y = y
+        self.heading = heading
+        self.left_I = 0.0
+        self.right_I = 0.0
+        self.left_w = 0.0
+        self.right_w = 0.0
+        self.v = 0.0
+        self.omega = 0.0
+
+    @property
+    def radius(self):
+        return self.params.radius
+
+    @property
+    def mode(self):
+        return self.params.name
+
+    def sensor_positions(self):
+        p = self.params
+        ch = math.cos(self.heading)
+        sh = math.sin(self.heading)
+        lx, ly = p.sensor_lx, p.sensor_ly
+        return ((self.x + ch * lx - sh * ly, self.y + sh * lx + ch * ly),
+                (self.x + ch * lx - sh * -ly, self.y + sh * lx + ch * -ly))
+
+    def update(self, lights, dt=1.0):
+        p = self.params
+        (lx, ly), (rx, ry) = self.sensor_positions()
+        I_L = 0.0
+        I_R = 0.0
+        if p.fast:
+            # gain / (d^2 + eps) inlined: the common case, no call per light
+            gain, eps, i_max = p.INTENSITY_GAIN, p.EPS, p.I_MAX
+            for L in lights:
+                px, py = L.pos
+                dx = px - lx
+                dy = py - ly
+                I = gain / (dx * dx + dy * dy + eps)
+                I_L += 0.0 if I < 0.0 else i_max if I > i_max else I
+                dx = px - rx
+                dy = py - ry
+                I = gain / (dx * dx + dy * dy + eps)
+                I_R += 0.0 if I < 0.0 else i_max if I > i_max else I
+        else:
+            for L in lights:
+                px, py = L.pos
+                I_L += p.intensity(px - lx, py - ly)
+                I_R += p.intensity(px - rx, py - ry)
+        I_L = min(I_L, p.I_MAX_SUM)
+        I_R = min(I_R, p.I_MAX_SUM)
+        self.left_I = I_L
+        self.right_I = I_R
+
+        fL = p.drive(I_L, p.transfer[0])
+        fR = p.drive(I_R, p.transfer[1])
+        (w00, w01), (w10, w11) = p.wiring
+        left = p.BASE_SPEED + (w00 * fL + w01 * fR)
+        right = p.BASE_SPEED + (w10 * fL + w11 * fR)
+
+        jitter = 0.0
+        if p.NOISE > 0:
+            if p.name == "v1":
+                # VehicleOne jitters its heading instead of its wheels
+                jitter = random.uniform(-p.NOISE, p.NOISE)
+            else:
+                left += random.uniform(-p.NOISE, p.NOISE)
+                right += random.uniform(-p.NOISE, p.NOISE)
+
+        left = max(p.MIN_WHEEL_SPEED, min(p.MAX_WHEEL_SPEED, left))
+        right = max(p.MIN_WHEEL_SPEED, min(p.MAX_WHEEL_SPEED, right))
+        self.left_w = left
+        self.right_w = right
+
+        self.v = 0.5 * (left + right)
+        self.omega = (right - left) * p.TURN_GAIN
+        self.heading += self.omega * dt + jitter
+        self.x += self.v * math.cos(self.heading) * dt
+        self.y += self.v * math.sin(self.heading) * dt
+
+        # wrap world
+        self.x %= p.width
+        self.y %= p.height
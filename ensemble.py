@@ -0,0 +1,209 @@
+"""
+Monte Carlo ensembles of a noisy scenario.
+
+One run of a scenario with heading jitter (VehicleOne) or motor noise says
+little, so run_ensemble() repeats it with independently seeded noise and
+reports every metric as a mean with a confidence interval.
+
+Replicas are run in batches. A batch is a single World that holds `batch`
+copies of the scenario's vehicles side by side. Each copy draws its own
+noise, so one vectorized step advances all of them. After each batch the
+intervals are updated. The run stops as soon as every interval is narrower
+than its tolerance, or when max_replicas is reached.
+
+A replica's metric is the mean over its vehicles of a per-vehicle value
+from metrics.BehaviorMetrics (see METRICS). Intervals use the normal
+approximation, mean +- z * s / sqrt(replicas). This is why at least
+min_replicas are run before stopping.
+
+Vehicles that carry lights (EMIT > 0) and collisions would couple the
+copies within a batch, so they are not supported.
+
+    python ensemble.py my_scene.json --steps 2000 --tolerance 0.05 --relative
+"""
+
+import argparse
+import math
+import statistics
+import time
+
+import numpy as np
+
+from metrics import LABELS, BehaviorMetrics
+from world import World
+
+
+def _near_fraction(m):
+    # share of the steps spent within the smallest radius of any light
+    if len(m.light_x) == 0:
+        return np.zeros(m.n)
+    return m.fraction_within()[:, :, int(np.argmin(m.radii))].sum(axis=1)
+
+
+def _label_share(label):
+    code = LABELS.index(label)
+    return lambda m: (m.classify() == code).astype(float)
+
+
+# metric name -> per-vehicle value from a BehaviorMetrics
+METRICS = {
+    "distance": lambda m: m.distance,
+    "speed_mean": lambda m: m.speed_mean,
+    "turn_mean": lambda m: m.turn_mean,
+    "nearest_now": lambda m: m.nearest_now,
+    "nearest_min": lambda m: m.nearest_min,
+    "near_fraction": _near_fraction,
+    "loops": lambda m: m.loops().max(axis=1) if len(m.light_x) else np.zeros(m.n),
+    "orbiting": _label_share("orbiting"),
+    "approaching": _label_share("approaching"),
+    "fleeing": _label_share("fleeing"),
+}
+
+
+def replicate(world, copies, seed=None):
+    """A new World holding `copies` copies of world's vehicles; copy r is rows r*n .. (r+1)*n."""
+    v = world.vehicles
+    if (v["EMIT"] > 0).any() or world.collisions:
+        raise ValueError("vehicle lights and collisions couple the replicas")
+    batch = World(world.width, world.height, world.lights.copy(), np.tile(v, copies), seed=seed)
+    batch.periodic = world.periodic
+    batch.periodic_cutoff = world.periodic_cutoff
+    batch.obstacles = world.obstacles
+    batch.occlusion_min_intensity = world.occlusion_min_intensity
+    batch.bit_exact = world.bit_exact
+    batch.transfer = dict(world.transfer)
+    batch.light_motion = world.light_motion
+    if world.light_strength is not None:
+        batch.light_strength = world.light_strength.copy()
+    batch.step_count = world.step_count
+    offsets = np.arange(copies) * len(v)
+    for rows, rig in world.rigs:
+        batch.add_rig(rig, (offsets[:, None] + rows[None, :]).ravel())
+    return batch
+
+
+def run_batch(world, copies, steps, metric_names, seed=None, radii=(50.0, 100.0, 200.0)):
+    """Run `copies` replicas for `steps` steps; returns {metric: value per replica}."""
+    batch = replicate(world, copies, seed)
+    n = len(world.vehicles)
+    L = batch.lights
+    periodic = batch.periodic
+    # positions always wrap; only periodic sensing measures light distances on the torus
+    metrics = BehaviorMetrics(len(batch.vehicles), L["x"], L["y"], radii,
+                              width=batch.width if periodic else None,
+                              height=batch.height if periodic else None,
+                              wrap=(batch.width, batch.height))
+    for _ in range(steps):
+        batch.step()
+        if batch.light_motion is not None:
+            metrics.set_lights(batch.lights["x"], batch.lights["y"])
+        metrics.update(batch)
+    return {name: METRICS[name](metrics).reshape(copies, n).mean(axis=1) for name in metric_names}
+
+
+def interval(values, confidence=0.95):
+    """(mean, low, high) of the normal-approximation confidence interval of the mean."""
+    values = np.asarray(values, dtype=float)
+    mean = float(values.mean())
+    if len(values) < 2:
+        return mean, -math.inf, math.inf
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2.0)
+    half = z * float(values.std(ddof=1)) / math.sqrt(len(values))
+    return mean, mean - half, mean + half
+
+
+def run_ensemble(world, steps, tolerance, metric_names=None, batch=32, min_replicas=20,
+                 max_replicas=1024, confidence=0.95, relative=False, seed=None,
+                 radii=(50.0, 100.0, 200.0), progress=None):
+    """
+    Replicas of `world` until every metric's interval is narrower than its tolerance.
+
+    tolerance: one width for all metrics or a dict metric -> width; with
+    relative=True a width is a fraction of the metric's |mean|.
+    Returns {"replicas", "converged", "intervals": {metric: (mean, low, high)},
+    "values": {metric: value per replica}}.
+    """
+    metric_names = list(metric_names or METRICS)
+    for name in metric_names:
+        if name not in METRICS:
+            raise ValueError(f"unknown metric {name!r}")
+    if not isinstance(tolerance, dict):
+        tolerance = {name: tolerance for name in metric_names}
+    for name in tolerance:
+        if name not in metric_names:
+            raise ValueError(f"tolerance given for {name!r}, which is not among the metrics")
+
+    seeds = np.random.SeedSequence(seed)
+    values = {name: np.zeros(0) for name in metric_names}
+    intervals = {}
+    converged = False
+    replicas = 0
+    while replicas < max_replicas:
+        copies = min(batch, max_replicas - replicas)
+        result = run_batch(world, copies, steps, metric_names, seeds.spawn(1)[0], radii)
+        replicas += copies
+        for name in metric_names:
+            values[name] = np.concatenate([values[name], result[name]])
+            intervals[name] = interval(values[name], confidence)
+
+        converged = replicas >= min_replicas and all(
+            _narrow(intervals[name], tolerance.get(name, math.inf), relative) for name in metric_names)
+        if progress:
+            progress(replicas, intervals)
+        if converged:
+            break
+    return {"replicas": replicas, "converged": converged, "intervals": intervals, "values": values}
+
+
+def _narrow(ci, tol, relative):
+    mean, low, high = ci
+    return high - low <= (tol * abs(mean) if relative else tol)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo ensemble of a noisy scenario.")
+    parser.add_argument("scenario")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="largest accepted interval width for every metric")
+    parser.add_argument("--tol", action="append", default=[], metavar="METRIC=WIDTH",
+                        help="per-metric tolerance, overrides --tolerance")
+    parser.add_argument("--relative", action="store_true", help="widths are fractions of |mean|")
+    parser.add_argument("--metrics", nargs="+", choices=sorted(METRICS), default=None)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--min-replicas", type=int, default=20)
+    parser.add_argument("--max-replicas", type=int, default=1024)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import scenario
+
+    world = scenario.load(args.scenario)
+    names = args.metrics or list(METRICS)
+    tolerance = {name: args.tolerance for name in names}
+    for item in args.tol:
+        name, _, width = item.partition("=")
+        if name not in tolerance:
+            parser.error(f"--tol {item}: {name!r} is not one of the metrics ({', '.join(names)})")
+        tolerance[name] = float(width)
+
+    start = time.perf_counter()
+
+    def progress(replicas, intervals):
+        print(f"\r{replicas} replicas  {time.perf_counter() - start:.0f}s", end="", flush=True)
+
+    result = run_ensemble(world, args.steps, tolerance, names, args.batch, args.min_replicas,
+                          args.max_replicas, args.confidence, args.relative, args.seed,
+                          progress=progress)
+    print()
+    level = f"{args.confidence:.0%}"
+    for name in names:
+        mean, low, high = result["intervals"][name]
+        print(f"{name:14s} {mean:12.4f}   {level} CI [{low:.4f}, {high:.4f}]")
+    state = "converged" if result["converged"] else "stopped at --max-replicas"
+    print(f"{result['replicas']} replicas, {state}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Headless frame export of a running World.
+
+Every `every` steps the world is drawn onto an offscreen surface (render.py),
+the pixels are copied out and put on a bounded queue; a writer thread saves
+them as a numbered PNG sequence or appends them to one raw RGB24 stream
+(e.g. for `ffmpeg -f rawvideo -pix_fmt rgb24 -s WxH -i frames.rgb out.mp4`).
+
+When the writer falls behind and the queue is full, the exporter either waits
+(block=True; the time spent waiting is counted in `stalled`) or drops the frame
+(block=False; counted in `dropped`). backpressure() tells how full the queue is.
+
+    python export.py my_scene.json --steps 3000 --every 5 --out frames
+"""
+
+import argparse
+import os
+import queue
+import threading
+import time
+
+import pygame
+
+import render
+
+
+class FrameExporter:
+    def __init__(self, world, out, every=1, raw=False, queue_size=16, block=False,
+                 trails=True, sensors=True):
+        """
+        out: directory for the PNG sequence, or a file path / binary file object
+        for the raw stream (raw=True).
+        """
+        self.world = world
+        self.every = every
+        self.raw = raw
+        self.block = block
+        self.trails = trails
+        self.sensors = sensors
+        self.size = (int(world.width), int(world.height))
+        self.surface = pygame.Surface(self.size)
+
+        if raw:
+            self._stream = open(out, "wb") if isinstance(out, (str, os.PathLike)) else out
+            self._owns_stream = isinstance(out, (str, os.PathLike))
+        else:
+            os.makedirs(out, exist_ok=True)
+            self._stream = None
+            self._owns_stream = False
+        self.out = out
+
+        self.captured = 0           # frames rendered and queued
+        self.written = 0            # frames on disk
+        self.dropped = 0            # frames lost because the queue was full
+        self.stalled = 0.0          # seconds the simulation waited for the writer
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="frame-writer", daemon=True)
+        self._thread.start()
+
+    # ---------- simulation thread ----------
+
+    def maybe_capture(self):
+        if self.every and self.world.step_count % self.every == 0:
+            self.capture()
+
+    def capture(self):
+        if self._error is not None:
+            raise RuntimeError("frame writer failed") from self._error
+        render.draw_world(self.surface, self.world, self.trails, self.sensors)
+        frame = (self.world.step_count, pygame.image.tobytes(self.surface, "RGB"))
+        if self.block:
+            start = time.perf_counter()
+            self._queue.put(frame)
+            self.stalled += time.perf_counter() - start
+        else:
+            try:
+                self._queue.put_nowait(frame)
+            except queue.Full:
+                self.dropped += 1
+                return False
+        self.captured += 1
+        return True
+
+    def backpressure(self):
+        """Fill level of the queue, 0 (writer keeping up) to 1 (full)."""
+        return self._queue.qsize() / self._queue.maxsize
+
+    def stats(self):
+        return {"captured": self.captured, "written": self.written, "dropped": self.dropped,
+                "stalled": self.stalled, "backpressure": self.backpressure()}
+
+    def close(self):
+        """Write the queued frames and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+        if self._owns_stream:
+            self._stream.close()
+        if self._error is not None:
+            raise RuntimeError("frame writer failed") from self._error
+
+    # ---------- writer thread ----------
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                return
+            if self._error is not None:
+                continue                   # keep draining so a blocked put can return
+            step, pixels = frame
+            try:
+                if self.raw:
+                    self._stream.write(pixels)
+                else:
+                    image = pygame.image.frombuffer(pixels, self.size, "RGB")
+                    pygame.image.save(image, os.path.join(self.out, f"frame_{step:08d}.png"))
+                self.written += 1
+            except Exception as exc:       # surfaced on the next capture() / close()
+                self._error = exc
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a scenario headless and export frames.")
+    parser.add_argument("scenario")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--every", type=int, default=1)
+    parser.add_argument("--out", default="frames", help="PNG directory, or raw stream file with --raw")
+    parser.add_argument("--raw", action="store_true")
+    parser.add_argument("--block", action="store_true", help="wait for the writer instead of dropping")
+    parser.add_argument("--trail", type=int, default=0, help="trail length to draw")
+    args = parser.parse_args()
+
+    import scenario
+
+    world = scenario.load(args.scenario)
+    if args.trail:
+        world.set_trail_len(args.trail)
+
+    exporter = FrameExporter(world, args.out, args.every, raw=args.raw, block=args.block)
+    start = time.perf_counter()
+    reported = 0
+    for _ in range(args.steps):
+        world.step()
+        exporter.maybe_capture()
+        if exporter.dropped > reported:
+            reported = exporter.dropped
+            print(f"\rwriter behind at step {world.step_count}: {reported} frames dropped",
+                  end="", flush=True)
+    exporter.close()
+    print(f"\n{exporter.written} frames written, {exporter.dropped} dropped, "
+          f"{exporter.stalled:.2f}s stalled, {time.perf_counter() - start:.1f}s total")
+    if args.raw:
+        print(f"raw RGB24 frames of {world.width}x{world.height}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Golden trajectories of the original vehicle classes, and checks of other engines against them.
+
+The reference is always the per-object class of a script (VehicleOne,
+VehicleTwoSimple, BraitenbergVehicle2, BraitenbergVehicle, Vehicle4). Each
+case runs a few start poses for a number of steps and stores x, y and
+heading at every step. Then an engine (World, World with transfer tables,
+CompactVehicle, or any callable with the same signature) runs the same
+case. The harness reports the first step and vehicle where the engine leaves
+the tolerance, and the largest errors.
+
+The scripts open a window and some run their main loop at import. So only
+their imports, class and function definitions and constant assignments are
+executed, in a private namespace. In that namespace `random` is replaced:
+
+    noise=False   a stand-in whose uniform(a, b) returns the midpoint, so all
+                  noise terms (motor noise, heading jitter) are exactly zero
+    noise=True    random.Random(seed + pose index), one stream per vehicle
+
+Engines driving their own random numbers (World) can only match with noise off.
+World with transfer tables interpolates the 4a bell within the table's
+tolerance, so its 4a orbits drift away from the class; it is not in the
+default engines.
+
+    python golden.py --record golden.npz --steps 2000
+    python golden.py --golden golden.npz --engines world compact --atol 1e-9
+"""
+
+import argparse
+import ast
+import json
+import math
+import os
+import random
+import types
+
+import numpy as np
+
+import compact
+from lights import LightManager
+from transfer import bell_table
+from world import TRANSFER_BELL, World
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# case -> script, class, modes, world preset, and whether update() takes one light position
+CASES = {
+    "vehicle1": dict(script="vehicle1.py", cls="VehicleOne", modes=("v1",), preset="vehicle1", single=True),
+    "multiplelight": dict(script="multiplelight.py", cls="VehicleOne", modes=("v1",),
+                          preset="multiplelight", single=False),
+    "vehicle2coward": dict(script="vehicle2coward.py", cls="VehicleTwoSimple", modes=("simple",),
+                           preset="vehicle2coward", single=True),
+    "vehicle2simple": dict(script="vehicle2simple.py", cls="BraitenbergVehicle2",
+                           modes=("coward", "aggressive"), preset="vehicle2simple", single=False),
+    "Garimav2": dict(script="Garimav2.py", cls="BraitenbergVehicle2", modes=("coward", "aggressive"),
+                     preset="Garimav2", single=False),
+    "vehicle3": dict(script="vehicle 3.py", cls="BraitenbergVehicle", modes=("lover", "explorer"),
+                     preset="vehicle3", single=False),
+    "vehicle4": dict(script="vehicle4.py", cls="Vehicle4", modes=("4a", "4b"), preset="vehicle4", single=False),
+}
+
+
+class _NoNoise:
+    """Stands in for the random module: every draw is the middle of its range."""
+
+    def uniform(self, a, b):
+        return 0.5 * (a + b)
+
+
+# ---------- reference classes ----------
+
+_definitions = {}
+
+
+def _is_definition(node):
+    if isinstance(node, (ast.Import, ast.ImportFrom, ast.ClassDef, ast.FunctionDef)):
+        return True
+    # constants such as WIDTH, HEIGHT = 800, 600; anything calling out (windows, fonts) is left out
+    return (isinstance(node, ast.Assign)
+            and not any(isinstance(n, ast.Call) for n in ast.walk(node.value)))
+
+
+def load_definitions(script):
+    """The script's imports, classes, functions and constants, without running it."""
+    if script not in _definitions:
+        path = os.path.join(HERE, script)
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), path)
+        ns = types.ModuleType(os.path.splitext(script)[0].replace(" ", "_"))
+        ns.__file__ = path
+        for node in tree.body:
+            if _is_definition(node):
+                code = compile(ast.Module(body=[node], type_ignores=[]), path, "exec")
+                try:
+                    exec(code, ns.__dict__)
+                except NameError:
+                    pass                    # a constant built from something left out
+        _definitions[script] = ns
+    return _definitions[script]
+
+
+def reference_vehicle(case, mode, x, y, heading, rng):
+    """One reference object; rng is what its module-level `random` becomes."""
+    spec = CASES[case]
+    ns = load_definitions(spec["script"])
+    ns.random = rng
+    cls = getattr(ns, spec["cls"])
+    if len(spec["modes"]) > 1:
+        return cls(x, y, heading=heading, mode=mode)
+    return cls(x, y, heading=heading)
+
+
+def world_size(case):
+    ns = load_definitions(CASES[case]["script"])
+    return ns.WIDTH, ns.HEIGHT
+
+
+# ---------- scenes ----------
+
+def default_scene(case, vehicles=8, seed=0):
+    """Start poses spread over the window and the script's default lights (one for single-light scripts)."""
+    width, height = world_size(case)
+    rng = np.random.default_rng(seed)
+    poses = np.column_stack([rng.uniform(0.2, 0.8, vehicles) * width,
+                             rng.uniform(0.2, 0.8, vehicles) * height,
+                             rng.uniform(-math.pi, math.pi, vehicles)])
+    ns = load_definitions(CASES[case]["script"])
+    if CASES[case]["single"] or not hasattr(ns, "LightManager"):
+        lights = [(width / 2, height / 2)] if CASES[case]["single"] else [
+            (width / 2, height / 2), (width / 3, height / 3)]
+    else:
+        manager = ns.LightManager()
+        lights = [L.pos for L in manager.get_lights()]
+    return poses, np.array(lights, dtype=float)
+
+
+def _light_views(case, lights):
+    width, height = world_size(case)
+    manager = LightManager(width, height)
+    for x, y in lights:
+        manager.add_light_at(float(x), float(y))
+    return manager.get_lights()
+
+
+def record(case, mode, poses, lights, steps, noise=False, seed=0):
+    """Golden trajectory of the reference class: array (steps, vehicles, 3) of x, y, heading."""
+    out = np.empty((steps, len(poses), 3))
+    views = _light_views(case, lights)
+    single = CASES[case]["single"]
+    for i, (x, y, h) in enumerate(poses):
+        rng = random.Random(seed + i) if noise else _NoNoise()
+        vehicle = reference_vehicle(case, mode, float(x), float(y), float(h), rng)
+        target = (float(lights[0][0]), float(lights[0][1])) if single else views
+        for t in range(steps):
+            vehicle.update(target)
+            out[t, i] = (vehicle.x, vehicle.y, vehicle.heading)
+    return out
+
+
+# ---------- engines ----------
+
+def world_engine(case, mode, poses, lights, steps, noise=False, seed=0, tables=False):
+    width, height = world_size(case)
+    world = World(width, height, seed=seed)
+    world.bit_exact = True
+    world.add_lights(lights[:, 0], lights[:, 1])
+    params = {} if noise else {"NOISE": 0.0}
+    for x, y, h in poses:
+        world.add_vehicle(CASES[case]["preset"], x, y, h, mode=mode, **params)
+    if tables:
+        world.transfer = {TRANSFER_BELL: bell_table()}
+    out = np.empty((steps, len(poses), 3))
+    v = world.vehicles
+    for t in range(steps):
+        world.step()
+        out[t, :, 0] = v["x"]
+        out[t, :, 1] = v["y"]
+        out[t, :, 2] = v["heading"]
+    return out
+
+
+def table_engine(case, mode, poses, lights, steps, noise=False, seed=0):
+    return world_engine(case, mode, poses, lights, steps, noise, seed, tables=True)
+
+
+def compact_engine(case, mode, poses, lights, steps, noise=False, seed=0):
+    width, height = world_size(case)
+    preset = CASES[case]["preset"]
+    params = compact.VehicleParams.from_preset(preset, mode=mode, width=width, height=height,
+                                               **({} if noise else {"NOISE": 0.0}))
+    views = _light_views(case, lights)
+    out = np.empty((steps, len(poses), 3))
+    for i, (x, y, h) in enumerate(poses):
+        random.seed(seed + i)                 # the same stream record() gives this vehicle
+        vehicle = compact.CompactVehicle(params, float(x), float(y), float(h))
+        for t in range(steps):
+            vehicle.update(views)
+            out[t, i] = (vehicle.x, vehicle.y, vehicle.heading)
+    return out
+
+
+ENGINES = {
+    "world": world_engine,
+    "world_tables": table_engine,
+    "compact": compact_engine,
+}
+
+
+# ---------- comparison ----------
+
+def compare(golden, trajectory, width, height, atol=1e-6, heading_atol=None):
+    """
+    Where `trajectory` leaves `golden` (both (steps, vehicles, 3)).
+
+    Positions are compared on the torus, headings modulo 2*pi. Returns a dict
+    with the first step / vehicle beyond tolerance (None if none) and the
+    largest errors.
+    """
+    heading_atol = atol if heading_atol is None else heading_atol
+    d = trajectory - golden
+    dx = d[..., 0] - width * np.round(d[..., 0] / width)
+    dy = d[..., 1] - height * np.round(d[..., 1] / height)
+    pos_err = np.hypot(dx, dy)
+    head_err = np.abs((d[..., 2] + math.pi) % (2 * math.pi) - math.pi)
+    bad = (pos_err > atol) | (head_err > heading_atol)
+    report = {"steps": len(golden), "max_position_error": float(pos_err.max(initial=0.0)),
+              "max_heading_error": float(head_err.max(initial=0.0)), "step": None, "vehicle": None,
+              "diverged_vehicles": int(bad.any(axis=0).sum())}
+    if bad.any():
+        t, i = np.argwhere(bad)[0]
+        report.update(step=int(t) + 1, vehicle=int(i), position=golden[t, i, :2].tolist(),
+                      position_error=float(pos_err[t, i]), heading_error=float(head_err[t, i]))
+    return report
+
+
+def record_all(cases=None, steps=1000, vehicles=8, noise=False, seed=0):
+    """{(case, mode): (poses, lights, golden)} for every case and mode."""
+    goldens = {}
+    for case in cases or CASES:
+        poses, lights = default_scene(case, vehicles, seed)
+        for mode in CASES[case]["modes"]:
+            goldens[case, mode] = (poses, lights, record(case, mode, poses, lights, steps, noise, seed))
+    return goldens
+
+
+def save(path, goldens, noise, seed):
+    arrays = {}
+    for (case, mode), (poses, lights, golden) in goldens.items():
+        arrays[f"{case}/{mode}/poses"] = poses
+        arrays[f"{case}/{mode}/lights"] = lights
+        arrays[f"{case}/{mode}/golden"] = golden
+    arrays["meta"] = np.frombuffer(json.dumps({"noise": noise, "seed": seed}).encode(), dtype=np.uint8)
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+def load(path):
+    """(goldens, noise, seed) as written by save()."""
+    with np.load(path) as data:
+        meta = json.loads(data["meta"].tobytes().decode())
+        goldens = {}
+        for key in data.files:
+            if key.endswith("/golden"):
+                case, mode, _ = key.split("/")
+                goldens[case, mode] = (data[f"{case}/{mode}/poses"], data[f"{case}/{mode}/lights"],
+                                       data[key])
+    return goldens, meta["noise"], meta["seed"]
+
+
+def check(goldens, engine, noise=False, seed=0, atol=1e-6, heading_atol=None):
+    """compare() of one engine against every golden trajectory; {(case, mode): report}."""
+    reports = {}
+    for (case, mode), (poses, lights, golden) in goldens.items():
+        trajectory = engine(case, mode, poses, lights, len(golden), noise, seed)
+        reports[case, mode] = compare(golden, trajectory, *world_size(case), atol, heading_atol)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check engines against golden trajectories of the classes.")
+    parser.add_argument("--golden", help="load golden trajectories from this .npz")
+    parser.add_argument("--record", help="record golden trajectories and save them here")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=None)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--vehicles", type=int, default=8, help="start poses per case")
+    parser.add_argument("--noise", action="store_true", help="seeded noise instead of none")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engines", nargs="*", choices=sorted(ENGINES), default=["world", "compact"])
+    parser.add_argument("--atol", type=float, default=1e-6, help="position tolerance in pixels")
+    parser.add_argument("--heading-atol", type=float, default=None, help="heading tolerance in radians")
+    args = parser.parse_args()
+
+    if args.golden:
+        goldens, noise, seed = load(args.golden)
+        if args.cases:
+            goldens = {key: value for key, value in goldens.items() if key[0] in args.cases}
+    else:
+        noise, seed = args.noise, args.seed
+        goldens = record_all(args.cases, args.steps, args.vehicles, noise, seed)
+        if args.record:
+            save(args.record, goldens, noise, seed)
+            print(f"recorded {len(goldens)} golden trajectories to {args.record}")
+
+    failed = False
+    for name in args.engines:
+        print(f"\n{name}")
+        for (case, mode), r in check(goldens, ENGINES[name], noise, seed, args.atol,
+                                     args.heading_atol).items():
+            label = f"  {case:15s} {mode:10s}"
+            if r["step"] is None:
+                print(f"{label} ok over {r['steps']} steps (max error {r['max_position_error']:.2e} px)")
+            else:
+                failed = True
+                x, y = r["position"]
+                print(f"{label} diverges at step {r['step']}, vehicle {r['vehicle']} near ({x:.0f}, {y:.0f}):"
+                      f" {r['position_error']:.2e} px, {r['heading_error']:.2e} rad;"
+                      f" {r['diverged_vehicles']} vehicles diverge, max {r['max_position_error']:.1f} px")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Frame-time budget governor.
+
+FrameGovernor is told how long each frame's update and draw took. While
+the smoothed frame time is over budget it lowers the quality one level at a
+time. Each level keeps the cuts of the levels before it:
+
+    full            everything
+    hud             HUD text re-rendered only every few frames
+    no trails       trails not drawn
+    plain lights    lights without outlines
+    vehicle glyphs  vehicles at least at render.LodRenderer's glyph level
+    vehicle dots    vehicles as dots
+    half substeps   half the simulation steps per frame
+    one substep     a single simulation step per frame
+
+After a run of frames well inside the budget it raises the quality one level
+again. hud_line() describes the current level.
+
+A loop uses only the settings it has: the vehicle4 and Garimav2 scripts
+follow hud_every and trails (they draw one vehicle and have no substeps).
+
+    python governor.py my_scene.json --substeps 4
+"""
+
+import argparse
+import math
+import time
+
+import render
+
+
+# name, settings; settings not given keep the value of the level before
+QUALITY = (
+    ("full", dict(hud_every=1, trails=True, light_detail=True, lod_floor=0, substep_scale=1.0)),
+    ("hud", dict(hud_every=10)),
+    ("no trails", dict(trails=False)),
+    ("plain lights", dict(light_detail=False)),
+    ("vehicle glyphs", dict(lod_floor=1)),
+    ("vehicle dots", dict(lod_floor=2)),
+    ("half substeps", dict(substep_scale=0.5)),
+    ("one substep", dict(substep_scale=0.0)),
+)
+
+
+def _cumulative(levels):
+    out = []
+    settings = {}
+    for name, changes in levels:
+        settings = dict(settings, **changes)
+        out.append((name, settings))
+    return tuple(out)
+
+
+class FrameGovernor:
+    def __init__(self, budget_ms=1000.0 / 60, headroom=0.6, calm_frames=60, smoothing=0.2):
+        """Steps up after `calm_frames` frames below headroom * budget."""
+        self.budget_ms = budget_ms
+        self.headroom = headroom
+        self.calm_frames = calm_frames
+        self.smoothing = smoothing
+        self.levels = _cumulative(QUALITY)
+        self.level = 0
+        self.frame_ms = 0.0            # smoothed update + draw time
+        self.update_ms = 0.0
+        self.draw_ms = 0.0
+        self._calm = 0
+
+    @property
+    def name(self):
+        return self.levels[self.level][0]
+
+    @property
+    def settings(self):
+        return self.levels[self.level][1]
+
+    @property
+    def hud_every(self):
+        return self.settings["hud_every"]
+
+    @property
+    def trails(self):
+        return self.settings["trails"]
+
+    @property
+    def light_detail(self):
+        return self.settings["light_detail"]
+
+    @property
+    def lod_floor(self):
+        return self.settings["lod_floor"]
+
+    @property
+    def substep_scale(self):
+        return self.settings["substep_scale"]
+
+    def substeps(self, requested):
+        """Simulation steps to run this frame out of `requested`."""
+        return max(1, int(requested * self.substep_scale))
+
+    def frame(self, update_ms, draw_ms):
+        """Account one frame; returns True if the quality level changed."""
+        a = self.smoothing
+        self.update_ms = update_ms if self.frame_ms == 0 else (1 - a) * self.update_ms + a * update_ms
+        self.draw_ms = draw_ms if self.frame_ms == 0 else (1 - a) * self.draw_ms + a * draw_ms
+        self.frame_ms = self.update_ms + self.draw_ms
+        if self.frame_ms > self.budget_ms and self.level < len(self.levels) - 1:
+            self._change(+1)
+            return True
+        if self.frame_ms < self.headroom * self.budget_ms and self.level > 0:
+            # step back up only after a run of cheap frames
+            self._calm += 1
+            if self._calm >= self.calm_frames:
+                self._change(-1)
+                return True
+        else:
+            self._calm = 0
+        return False
+
+    def _change(self, step):
+        self.level += step
+        self.frame_ms = 0.0            # judge the new level on its own frames
+        self._calm = 0
+
+    def hud_line(self):
+        return (f"quality: {self.name} ({self.level}/{len(self.levels) - 1} steps down)"
+                f"   update {self.update_ms:.1f} + draw {self.draw_ms:.1f} ms of {self.budget_ms:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="View a scenario under a frame-time budget.")
+    parser.add_argument("scenario")
+    parser.add_argument("--substeps", type=int, default=2, help="simulation steps per frame at full quality")
+    parser.add_argument("--fps", type=float, default=60.0)
+    parser.add_argument("--trail", type=int, default=200)
+    args = parser.parse_args()
+
+    import pygame
+
+    import scenario
+
+    world = scenario.load(args.scenario)
+    world.set_trail_len(args.trail)
+
+    pygame.init()
+    screen = pygame.display.set_mode((int(world.width), int(world.height)))
+    pygame.display.set_caption("Frame-time governor")
+    font = pygame.font.SysFont(None, 20)
+    clock = pygame.time.Clock()
+    # the governor decides the level of detail; the renderer only follows the object count
+    renderer = render.LodRenderer(budget_ms=math.inf)
+    governor = FrameGovernor(budget_ms=1000.0 / args.fps)
+    hud = []
+    frames = 0
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                world.add_light_at(*event.pos)
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+                world.add_vehicle("vehicle4", *event.pos, heading=0.0)
+
+        start = time.perf_counter()
+        for _ in range(governor.substeps(args.substeps)):
+            world.step()
+        mid = time.perf_counter()
+
+        renderer.floor = governor.lod_floor
+        renderer.draw(screen, world, trails=governor.trails, light_detail=governor.light_detail)
+        if frames % governor.hud_every == 0:
+            lines = [f"step {world.step_count}   {len(world.vehicles)} vehicles   {clock.get_fps():.0f} fps",
+                     governor.hud_line(), f"detail: {renderer.level}",
+                     "L-click: add light   R-click: add vehicle"]
+            hud = [font.render(line, True, (0, 0, 0)) for line in lines]
+        for i, text in enumerate(hud):
+            screen.blit(text, (10, 10 + 20 * i))
+        end = time.perf_counter()
+
+        if governor.frame((mid - start) * 1000.0, (end - mid) * 1000.0):
+            frames = -1                # show the new level right away
+        frames += 1
+        pygame.display.flip()
+        clock.tick(args.fps)
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Light-intensity heatmap overlay for the pygame views.
+
+The summed intensity gain / (d^2 + eps) of all lights is evaluated for every
+pixel at once and turned into a translucent warm glow on a cached surface.
+The surface is only recomputed when the lights change. While a light is being
+dragged the field is computed on a coarser grid (every `drag_scale`-th pixel)
+and scaled up, and at full resolution again once the drag ends.
+"""
+
+import math
+
+import numpy as np
+import pygame
+
+from world import falloff_intensity
+
+
+# pixels x lights evaluated per block, keeps the temporaries small
+_BLOCK = 1 << 21
+
+
+class IntensityOverlay:
+    def __init__(self, width, height, gain=800.0, eps=1.0, i_max=math.inf, reference=0.35,
+                 alpha=130, drag_scale=4):
+        """reference: intensity shown at half strength (default: the 4a preferred intensity)."""
+        self.width = width
+        self.height = height
+        self.gain = gain
+        self.eps = eps
+        self.i_max = i_max
+        self.reference = reference
+        self.alpha = alpha
+        self.drag_scale = drag_scale
+        self.periodic = False
+        self.visible = False
+        self.surface = None
+        self.computed = 0              # how many times the field was evaluated
+        self._key = None
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def update(self, lights, dragging=False):
+        """lights: (x, y) pairs. Recomputes only if they (or the resolution) changed."""
+        if not self.visible:
+            return
+        xy = np.asarray(lights, dtype=float).reshape(-1, 2)
+        scale = self.drag_scale if dragging else 1
+        key = (xy.tobytes(), scale, self.periodic)
+        if key == self._key:
+            return
+        self._key = key
+        self.surface = self._render(xy, scale)
+        self.computed += 1
+
+    def field(self, xy, scale=1):
+        """Summed intensity at pixel centers, shape (width // scale, height // scale)."""
+        gx = (np.arange(self.width // scale) + 0.5) * scale
+        gy = (np.arange(self.height // scale) + 0.5) * scale
+        px, py = np.meshgrid(gx, gy, indexing="ij")
+        px = px.ravel()
+        py = py.ravel()
+        total = np.zeros(len(px))
+        if len(xy):
+            step = max(1, _BLOCK // len(xy))
+            for s in range(0, len(px), step):
+                dx = xy[None, :, 0] - px[s:s + step, None]
+                dy = xy[None, :, 1] - py[s:s + step, None]
+                if self.periodic:
+                    dx -= self.width * np.round(dx / self.width)
+                    dy -= self.height * np.round(dy / self.height)
+                total[s:s + step] = falloff_intensity(dx, dy, self.gain, self.eps, self.i_max).sum(axis=1)
+        return total.reshape(len(gx), len(gy))
+
+    def _render(self, xy, scale):
+        I = self.field(xy, scale)
+        level = I / (I + self.reference)                   # 0..1, half at `reference`
+        surf = pygame.Surface(I.shape, pygame.SRCALPHA)
+        rgb = pygame.surfarray.pixels3d(surf)
+        rgb[..., 0] = 255
+        rgb[..., 1] = (200 * (1.0 - level)).astype(np.uint8)
+        rgb[..., 2] = 0
+        del rgb
+        a = pygame.surfarray.pixels_alpha(surf)
+        a[...] = (self.alpha * level).astype(np.uint8)
+        del a
+        if scale != 1:
+            surf = pygame.transform.smoothscale(surf, (self.width, self.height))
+        return surf
+
+    def draw(self, surf):
+        if self.visible and self.surface is not None:
+            surf.blit(self.surface, (0, 0))
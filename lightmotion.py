@@ -0,0 +1,171 @@
+"""
+Scripted light motion: orbits, paths and pulsing intensity.
+
+Every light of a World gets a row in a set of parallel arrays describing how
+it moves (static, orbit around a center, or looping along a polyline path) and
+how its intensity pulses. advance() evaluates all of them for a time t in a
+few vectorized operations and hands only the lights that move to
+World.move_lights(), so spatial indexes update just those.
+
+    motion = LightMotion()
+    motion.set_orbit(0, cx=450, cy=350, radius=120, period=600)
+    motion.set_path(1, [(100, 100), (800, 100), (800, 600)], speed=2.0)
+    motion.set_pulse(1, base=1.0, amplitude=0.5, period=200)
+    world.light_motion = motion
+"""
+
+import math
+
+import numpy as np
+
+
+STATIC = 0
+ORBIT = 1
+PATH = 2
+
+
+class LightMotion:
+    def __init__(self, n_lights=0):
+        self.kind = np.zeros(0, dtype=np.int8)
+        # orbit
+        self.center = np.zeros((0, 2))
+        self.orbit_radius = np.zeros(0)
+        self.angular_speed = np.zeros(0)       # radians per time unit
+        self.phase = np.zeros(0)
+        # path: every light's points live in one concatenated array
+        self.path_speed = np.zeros(0)
+        self.path_first = np.zeros(0, dtype=np.intp)   # first point of the light's path
+        self.path_count = np.zeros(0, dtype=np.intp)
+        self.path_points = np.zeros((0, 2))
+        self.path_arc = np.zeros(0)            # arc length at each point, along its own path
+        # path_arc shifted by a per-path offset so that one searchsorted serves every path
+        self.path_key = np.zeros(0)
+        self.path_offset = np.zeros(0)
+        self.path_length = np.zeros(0)         # closed loop length per light
+        # pulse: strength = base + amplitude * sin(2 pi t / period + phase)
+        self.pulse_base = np.ones(0)
+        self.pulse_amplitude = np.zeros(0)
+        self.pulse_period = np.ones(0)
+        self.pulse_phase = np.zeros(0)
+        self._grow(n_lights)
+
+    def _grow(self, n):
+        extra = n - len(self.kind)
+        if extra <= 0:
+            return
+
+        def more(a, fill):
+            pad = np.full((extra,) + a.shape[1:], fill, dtype=a.dtype)
+            return np.concatenate([a, pad])
+
+        self.kind = more(self.kind, STATIC)
+        self.center = more(self.center, 0.0)
+        self.orbit_radius = more(self.orbit_radius, 0.0)
+        self.angular_speed = more(self.angular_speed, 0.0)
+        self.phase = more(self.phase, 0.0)
+        self.path_speed = more(self.path_speed, 0.0)
+        self.path_first = more(self.path_first, 0)
+        self.path_count = more(self.path_count, 0)
+        self.path_length = more(self.path_length, 0.0)
+        self.path_offset = more(self.path_offset, 0.0)
+        self.pulse_base = more(self.pulse_base, 1.0)
+        self.pulse_amplitude = more(self.pulse_amplitude, 0.0)
+        self.pulse_period = more(self.pulse_period, 1.0)
+        self.pulse_phase = more(self.pulse_phase, 0.0)
+
+    # ---------- scripting ----------
+
+    _PER_LIGHT = ("kind", "center", "orbit_radius", "angular_speed", "phase", "path_speed",
+                  "path_first", "path_count", "path_length", "path_offset", "pulse_base",
+                  "pulse_amplitude", "pulse_period", "pulse_phase")
+
+    def remove(self, indices):
+        """Forget removed lights, keeping the rows of the others aligned with the world."""
+        indices = np.asarray(indices, dtype=np.intp)
+        indices = indices[indices < len(self.kind)]
+        for name in self._PER_LIGHT:
+            setattr(self, name, np.delete(getattr(self, name), indices, axis=0))
+
+    def set_static(self, i):
+        self._grow(i + 1)
+        self.kind[i] = STATIC
+
+    def set_orbit(self, i, cx, cy, radius, period, phase=0.0):
+        """Circle (cx, cy) once every `period` time units (negative: clockwise)."""
+        self._grow(i + 1)
+        self.kind[i] = ORBIT
+        self.center[i] = (cx, cy)
+        self.orbit_radius[i] = radius
+        self.angular_speed[i] = 2 * math.pi / period
+        self.phase[i] = phase
+
+    def set_path(self, i, points, speed):
+        """Loop along the closed polyline `points` at `speed` per time unit."""
+        pts = np.asarray(points, dtype=float)
+        if len(pts) < 2:
+            raise ValueError("a light path needs at least 2 points")
+        self._grow(i + 1)
+        closed = np.vstack([pts, pts[:1]])
+        arc = np.concatenate([[0.0], np.cumsum(np.hypot(*np.diff(closed, axis=0).T))])
+        # the old points of this light stay behind unused; paths are set rarely
+        offset = self.path_key[-1] + 1.0 if len(self.path_key) else 0.0
+        self.path_first[i] = len(self.path_points)
+        self.path_offset[i] = offset
+        self.path_key = np.concatenate([self.path_key, arc + offset])
+        self.path_count[i] = len(closed)
+        self.path_points = np.vstack([self.path_points, closed])
+        self.path_arc = np.concatenate([self.path_arc, arc])
+        self.path_length[i] = arc[-1]
+        self.path_speed[i] = speed
+        self.kind[i] = PATH
+
+    def set_pulse(self, i, base=1.0, amplitude=0.5, period=120.0, phase=0.0):
+        self._grow(i + 1)
+        self.pulse_base[i] = base
+        self.pulse_amplitude[i] = amplitude
+        self.pulse_period[i] = period
+        self.pulse_phase[i] = phase
+
+    # ---------- evaluation ----------
+
+    def positions(self, t, indices):
+        """(x, y) at time t of the moving lights `indices`."""
+        x = np.zeros(len(indices))
+        y = np.zeros(len(indices))
+
+        orbit = self.kind[indices] == ORBIT
+        o = indices[orbit]
+        angle = self.angular_speed[o] * t + self.phase[o]
+        x[orbit] = self.center[o, 0] + self.orbit_radius[o] * np.cos(angle)
+        y[orbit] = self.center[o, 1] + self.orbit_radius[o] * np.sin(angle)
+
+        path = self.kind[indices] == PATH
+        p = indices[path]
+        if len(p):
+            s = np.mod(self.path_speed[p] * t, np.maximum(self.path_length[p], 1e-12))
+            # segment k of each path: last point whose arc length is <= s
+            first = self.path_first[p]
+            k = np.searchsorted(self.path_key, s + self.path_offset[p], side="right") - 1
+            k = np.clip(k, first, first + self.path_count[p] - 2)
+            seg = np.maximum(self.path_arc[k + 1] - self.path_arc[k], 1e-12)
+            u = np.clip((s - self.path_arc[k]) / seg, 0.0, 1.0)[:, None]
+            xy = self.path_points[k] * (1 - u) + self.path_points[k + 1] * u
+            x[path] = xy[:, 0]
+            y[path] = xy[:, 1]
+        return x, y
+
+    def strengths(self, t):
+        return self.pulse_base + self.pulse_amplitude * np.sin(
+            2 * math.pi * t / self.pulse_period + self.pulse_phase)
+
+    def advance(self, world, t):
+        """Put the world's lights where they are at time t."""
+        n = len(world.lights)
+        self._grow(n)
+        moving = np.flatnonzero(self.kind[:n] != STATIC)
+        if len(moving):
+            x, y = self.positions(t, moving)
+            world.move_lights(moving, x, y)
+
+        if (self.pulse_amplitude[:n] != 0).any() or world.light_strength is not None:
+            world.light_strength = self.strengths(t)[:n]
@@ -0,0 +1,214 @@
+"""
+Array-backed lights for the pygame scripts.
+
+LightManager keeps all positions in one contiguous (capacity, 2) array and the
+radii in another. Capacity doubles when it runs out, so adding a light is
+amortized O(1). Removing a light moves the last row into its slot, which is
+O(1) as well. Array code reads the live rows through `xy`, `x`, `y` and
+`radius` without copying. Positions are written through the views (move_to,
+x, y), which keep each view's `pos` tuple in step with its row.
+
+Light is a small __slots__ view onto one row. get_lights() returns one view
+per light, in row order, so the scripts' `for L in lights: L.pos` loops keep
+working unchanged. A view stays attached to its light when rows are
+swapped, so code may hold on to it (e.g. while dragging). A removed light's
+view keeps a private copy of its row: like a removed Light object of the
+scripts it can still be read and moved, it just isn't in the manager anymore.
+
+The scripts subclass both classes for their own drawing and default layout.
+"""
+
+import random
+
+import numpy as np
+
+from world import LIGHT_DTYPE
+
+
+class Light:
+    # pos caches the row as a plain tuple: the scripts read it for every light
+    # and sensor each frame, so it must cost no more than an attribute lookup
+    __slots__ = ("_manager", "_index", "pos")
+
+    def __init__(self, manager, index):
+        self._manager = manager
+        self._index = index
+        self.pos = (manager._xy.item(index, 0), manager._xy.item(index, 1))
+
+    @property
+    def x(self):
+        return self.pos[0]
+
+    @x.setter
+    def x(self, value):
+        self.move_to((value, self.pos[1]))
+
+    @property
+    def y(self):
+        return self.pos[1]
+
+    @y.setter
+    def y(self, value):
+        self.move_to((self.pos[0], value))
+
+    @property
+    def radius(self):
+        return self._manager._radius.item(self._index)
+
+    @radius.setter
+    def radius(self, value):
+        self._manager._radius[self._index] = value
+
+    def move_to(self, pos):
+        xy = self._manager._xy
+        xy[self._index] = pos
+        self.pos = (xy.item(self._index, 0), xy.item(self._index, 1))
+
+    def draw(self, surface):
+        import pygame
+
+        x, y = self.pos
+        r = int(self.radius)
+        pygame.draw.circle(surface, (255, 255, 0), (int(x), int(y)), r)
+        pygame.draw.circle(surface, (0, 0, 0), (int(x), int(y)), r, 2)
+
+
+class _Detached:
+    """One-row storage for the view of a removed light."""
+
+    __slots__ = ("_xy", "_radius")
+
+    def __init__(self, xy, radius):
+        self._xy = np.array([xy], dtype=float)
+        self._radius = np.array([radius], dtype=float)
+
+
+class LightManager:
+    light_class = Light
+
+    def __init__(self, width, height, radius=18, margin=50, capacity=8):
+        """radius: default for new lights; margin: keeps random lights off the edges."""
+        self.width = width
+        self.height = height
+        self.default_radius = radius
+        self.margin = margin
+        self._xy = np.zeros((capacity, 2))
+        self._radius = np.zeros(capacity)
+        self._views = []
+
+    # ---------- arrays ----------
+
+    @property
+    def xy(self):
+        """Live (lights, 2) positions."""
+        return self._xy[:len(self._views)]
+
+    @property
+    def x(self):
+        return self._xy[:len(self._views), 0]
+
+    @property
+    def y(self):
+        return self._xy[:len(self._views), 1]
+
+    @property
+    def radius(self):
+        return self._radius[:len(self._views)]
+
+    def to_rows(self):
+        """A copy as world.LIGHT_DTYPE rows (for scenarios and World)."""
+        rows = np.zeros(len(self._views), dtype=LIGHT_DTYPE)
+        rows["x"] = self.x
+        rows["y"] = self.y
+        rows["radius"] = self.radius
+        return rows
+
+    def __len__(self):
+        return len(self._views)
+
+    # ---------- editing ----------
+
+    def add_light_at(self, x, y, radius=None):
+        n = len(self._views)
+        if n == len(self._radius):
+            grow = max(8, 2 * n)
+            self._xy = np.concatenate([self._xy, np.zeros((grow - n, 2))])
+            self._radius = np.concatenate([self._radius, np.zeros(grow - n)])
+        self._xy[n] = (x, y)
+        self._radius[n] = self.default_radius if radius is None else radius
+        self._views.append(self.light_class(self, n))
+        return self._views[n]
+
+    def add_random_light(self, radius=None):
+        x = random.randint(self.margin, self.width - self.margin)
+        y = random.randint(self.margin, self.height - self.margin)
+        return self.add_light_at(x, y, radius)
+
+    def _detach(self, light):
+        i = light._index
+        light._manager = _Detached(self._xy[i], self._radius[i])
+        light._index = 0
+
+    def remove(self, light):
+        """Remove one light (a view from get_lights()) by moving the last row into its slot."""
+        i = light._index
+        last = len(self._views) - 1
+        self._detach(light)
+        if i != last:
+            self._xy[i] = self._xy[last]
+            self._radius[i] = self._radius[last]
+            moved = self._views[last]
+            moved._index = i
+            self._views[i] = moved
+        self._views.pop()
+
+    def clear_all(self):
+        for light in self._views:
+            self._detach(light)
+        self._views = []
+
+    def reset_defaults(self):
+        self.clear_all()
+
+    def load_lights(self, rows):
+        """Replace all lights with the rows of a scenario / snapshot light array."""
+        self.clear_all()
+        for r in rows:
+            self.add_light_at(float(r["x"]), float(r["y"]), float(r["radius"]))
+
+    def _nearest(self, x, y):
+        if not self._views:
+            return None, None
+        d2 = (self.x - x) ** 2 + (self.y - y) ** 2
+        i = int(np.argmin(d2))
+        return self._views[i], float(d2[i])
+
+    def move_nearest(self, x, y, threshold_factor=2.0):
+        """Move the nearest light to (x, y) if the click is close enough to it."""
+        nearest, dist_sq = self._nearest(x, y)
+        if nearest is not None and dist_sq <= (nearest.radius * threshold_factor) ** 2:
+            nearest.move_to((x, y))
+            return True
+        return False
+
+    def move_nearest_or_add(self, x, y, threshold_factor=2.0):
+        """If click is near a light, move that light; else add a new one."""
+        if not self.move_nearest(x, y, threshold_factor):
+            self.add_light_at(x, y)
+
+    def remove_nearest(self, x, y, threshold_factor=2.0):
+        nearest, dist_sq = self._nearest(x, y)
+        if nearest is not None and dist_sq <= (nearest.radius * threshold_factor) ** 2:
+            self.remove(nearest)
+            return True
+        return False
+
+    # ---------- access ----------
+
+    def draw(self, surface):
+        for light in self._views:
+            light.draw(surface)
+
+    def get_lights(self):
+        """The live list of light views, in row order."""
+        return self._views
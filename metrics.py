@@ -0,0 +1,192 @@
+"""
+Streaming behavior metrics: updated every step, memory independent of run length.
+
+For every vehicle (a whole World fleet, or one object from the pygame scripts)
+BehaviorMetrics keeps running totals instead of the trajectory:
+
+    time spent within each given distance of each light
+    winding angle around each light (-> loop count)
+    mean and variance of speed and turn rate (Welford)
+    distance traveled
+    initial / current / closest distance to the nearest light
+
+classify() turns these into 'orbiting', 'approaching', 'fleeing' or 'wandering'.
+
+Vehicles wrap around the edges. Displacements are therefore unwrapped over the
+area they wrap around, and winding angles are taken from the unwrapped path,
+so an edge crossing is neither a long jump nor a sudden turn around a light.
+"""
+
+import math
+
+import numpy as np
+
+
+LABELS = ("wandering", "orbiting", "approaching", "fleeing")
+
+
+class BehaviorMetrics:
+    def __init__(self, n_vehicles, light_x, light_y, radii=(50.0, 100.0, 200.0),
+                 width=None, height=None, wrap=None):
+        """
+        light_x, light_y: positions of the lights to track (copied; call
+        set_lights() if they move). width / height: give them for a periodic
+        world so distances to lights use the nearest image. wrap: (width, height)
+        the positions wrap around, for update_arrays() / update_vehicle();
+        defaults to (width, height). update(world) always uses the world's size.
+        """
+        self.n = n_vehicles
+        self.radii = np.asarray(radii, dtype=float)
+        self.width = width
+        self.height = height
+        self.wrap = wrap if wrap is not None else (width, height) if width and height else None
+        self.set_lights(light_x, light_y)
+
+        n, m, r = n_vehicles, len(self.light_x), len(self.radii)
+        self.steps = 0
+        self.time_within = np.zeros((n, m, r), dtype=np.int64)
+        self.winding = np.zeros((n, m))
+        self.distance = np.zeros(n)
+        self.speed_mean = np.zeros(n)
+        self.speed_m2 = np.zeros(n)
+        self.turn_mean = np.zeros(n)
+        self.turn_m2 = np.zeros(n)
+        self.nearest_start = np.full(n, np.nan)
+        self.nearest_now = np.full(n, np.nan)
+        self.nearest_min = np.full(n, np.inf)
+
+        self._last_x = None
+        self._last_y = None
+        self._path_x = None                # unwrapped positions
+        self._path_y = None
+        self._last_angle = None
+
+    def set_lights(self, light_x, light_y):
+        self.light_x = np.array(light_x, dtype=float)
+        self.light_y = np.array(light_y, dtype=float)
+
+    def _wrap(self, dx, dy):
+        if self.width:
+            dx = dx - self.width * np.round(dx / self.width)
+        if self.height:
+            dy = dy - self.height * np.round(dy / self.height)
+        return dx, dy
+
+    # ---------- feeding ----------
+
+    def update_arrays(self, x, y, speed, turn, wrap=None):
+        """
+        One step of positions, speeds and turn rates for all tracked vehicles;
+        wrap overrides the (width, height) the positions wrap around.
+        """
+        wrap = self.wrap if wrap is None else wrap
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.steps += 1
+        k = self.steps
+
+        # Welford running mean / variance
+        for value, mean, m2 in ((np.asarray(speed, dtype=float), self.speed_mean, self.speed_m2),
+                                (np.asarray(turn, dtype=float), self.turn_mean, self.turn_m2)):
+            delta = value - mean
+            mean += delta / k
+            m2 += delta * (value - mean)
+
+        if self._last_x is None:
+            self._path_x = x.copy()
+            self._path_y = y.copy()
+        else:
+            sx = x - self._last_x
+            sy = y - self._last_y
+            if wrap is not None:
+                sx -= wrap[0] * np.round(sx / wrap[0])
+                sy -= wrap[1] * np.round(sy / wrap[1])
+            self.distance += np.hypot(sx, sy)
+            self._path_x += sx
+            self._path_y += sy
+        self._last_x = x.copy()
+        self._last_y = y.copy()
+
+        if len(self.light_x) == 0:
+            return
+        dx, dy = self._wrap(x[:, None] - self.light_x[None, :], y[:, None] - self.light_y[None, :])
+        d = np.hypot(dx, dy)
+        self.time_within += d[:, :, None] <= self.radii[None, None, :]
+
+        px, py = self._wrap(self._path_x[:, None] - self.light_x[None, :],
+                            self._path_y[:, None] - self.light_y[None, :])
+        angle = np.arctan2(py, px)
+        if self._last_angle is not None:
+            step = angle - self._last_angle
+            self.winding += (step + math.pi) % (2 * math.pi) - math.pi
+        self._last_angle = angle
+
+        nearest = d.min(axis=1)
+        if k == 1:
+            self.nearest_start[:] = nearest
+        self.nearest_now = nearest
+        np.minimum(self.nearest_min, nearest, out=self.nearest_min)
+
+    def update(self, world):
+        """Feed one step of a world.World."""
+        v = world.vehicles
+        self.update_arrays(v["x"], v["y"], v["v"], v["omega"], (world.width, world.height))
+
+    def update_vehicle(self, vehicle, wrap=None):
+        """Feed one step of a single object from the pygame scripts (n_vehicles == 1)."""
+        speed = getattr(vehicle, "v", getattr(vehicle, "forward_speed", getattr(vehicle, "speed", 0.0)))
+        turn = getattr(vehicle, "omega", getattr(vehicle, "turn_rate", 0.0))
+        self.update_arrays([vehicle.x], [vehicle.y], [speed], [turn], wrap)
+
+    # ---------- results ----------
+
+    def loops(self):
+        """Completed loops around each light, shape (vehicles, lights)."""
+        return np.floor(np.abs(self.winding) / (2 * math.pi)).astype(int)
+
+    def fraction_within(self):
+        """Fraction of steps spent within each radius of each light, shape (vehicles, lights, radii)."""
+        return self.time_within / max(self.steps, 1)
+
+    def summary(self):
+        k = max(self.steps, 1)
+        return {
+            "steps": self.steps,
+            "distance": self.distance,
+            "speed_mean": self.speed_mean,
+            "speed_var": self.speed_m2 / k,
+            "turn_mean": self.turn_mean,
+            "turn_var": self.turn_m2 / k,
+            "fraction_within": self.fraction_within(),
+            "winding": self.winding,
+            "loops": self.loops(),
+            "nearest_start": self.nearest_start,
+            "nearest_now": self.nearest_now,
+            "nearest_min": self.nearest_min,
+        }
+
+    def classify(self, min_loops=2, near_fraction=0.5):
+        """
+        One label code per vehicle (index into LABELS).
+
+        orbiting     at least `min_loops` loops around some light
+        approaching  ended near a light (within the smallest radius) and spent
+                     at least `near_fraction` of the run within the largest one
+        fleeing      ended farther from every light than it started, never
+                     coming within the smallest radius
+        wandering    anything else
+        """
+        labels = np.zeros(self.n, dtype=np.int8)
+        if len(self.light_x) == 0 or self.steps == 0:
+            return labels
+        frac = self.fraction_within()
+        r_min = self.radii.min()
+        largest = int(np.argmax(self.radii))
+
+        orbiting = self.loops().max(axis=1) >= min_loops
+        approaching = (self.nearest_now <= r_min) & (frac[:, :, largest].sum(axis=1) >= near_fraction)
+        fleeing = (self.nearest_now > self.nearest_start) & (self.nearest_min > r_min)
+        labels[fleeing] = LABELS.index("fleeing")
+        labels[approaching] = LABELS.index("approaching")
+        labels[orbiting] = LABELS.index("orbiting")
+        return labels
@@ -0,0 +1,253 @@
+"""
+Polygonal obstacles: they cast shadows and vehicles cannot drive into them.
+
+All polygon edges go into one bounding-volume hierarchy (BVH). Queries are
+batched: a whole array of sensor->light rays, or of vehicle circles, walks the
+tree together one level at a time, so the Python overhead is per tree level
+rather than per ray.
+"""
+
+import numpy as np
+
+
+LEAF_SIZE = 4
+
+
+class Obstacles:
+    def __init__(self, polygons=()):
+        self.polygons = []
+        self.segments = np.zeros((0, 4))          # x1, y1, x2, y2
+        self.polygon_of = np.zeros(0, dtype=np.intp)
+        self.version = 0
+        self._build()
+        for poly in polygons:
+            self.add_polygon(poly)
+
+    def add_polygon(self, points):
+        """Add a closed polygon given as [(x, y), ...]; the last edge closes it."""
+        pts = np.asarray(points, dtype=float)
+        if len(pts) < 3:
+            raise ValueError("an obstacle needs at least 3 corners")
+        segs = np.hstack([pts, np.roll(pts, -1, axis=0)])
+        self.segments = np.vstack([self.segments, segs])
+        self.polygon_of = np.concatenate([self.polygon_of, np.full(len(segs), len(self.polygons))])
+        self.polygons.append(pts)
+        self._build()
+
+    def add_wall(self, x1, y1, x2, y2, thickness=6.0):
+        """A straight wall as a thin rectangle."""
+        dx, dy = x2 - x1, y2 - y1
+        length = max(np.hypot(dx, dy), 1e-9)
+        nx, ny = -dy / length * thickness / 2, dx / length * thickness / 2
+        self.add_polygon([(x1 + nx, y1 + ny), (x2 + nx, y2 + ny),
+                          (x2 - nx, y2 - ny), (x1 - nx, y1 - ny)])
+
+    def clear(self):
+        self.polygons = []
+        self.segments = np.zeros((0, 4))
+        self.polygon_of = np.zeros(0, dtype=np.intp)
+        self._build()
+
+    def __len__(self):
+        return len(self.polygons)
+
+    # ---------- BVH ----------
+
+    def _build(self):
+        self.version += 1
+        segs = self.segments
+        lo = np.minimum(segs[:, :2], segs[:, 2:])
+        hi = np.maximum(segs[:, :2], segs[:, 2:])
+        centers = 0.5 * (lo + hi)
+
+        order = np.arange(len(segs))
+        node_lo, node_hi, left, right, start, count = [], [], [], [], [], []
+
+        def build(first, last):
+            idx = len(node_lo)
+            ids = order[first:last]
+            node_lo.append(lo[ids].min(axis=0))
+            node_hi.append(hi[ids].max(axis=0))
+            left.append(-1)
+            right.append(-1)
+            start.append(first)
+            count.append(last - first)
+            if last - first > LEAF_SIZE:
+                # median split along the longest side of the centers' extent
+                c = centers[ids]
+                axis = int(np.argmax(c.max(axis=0) - c.min(axis=0)))
+                order[first:last] = ids[np.argsort(c[:, axis], kind="stable")]
+                mid = (first + last) // 2
+                left[idx] = build(first, mid)
+                right[idx] = build(mid, last)
+                count[idx] = 0
+            return idx
+
+        if len(segs):
+            build(0, len(segs))
+        self._order = order
+        self._node_lo = np.array(node_lo).reshape(-1, 2)
+        self._node_hi = np.array(node_hi).reshape(-1, 2)
+        self._left = np.array(left, dtype=np.intp)
+        self._right = np.array(right, dtype=np.intp)
+        self._start = np.array(start, dtype=np.intp)
+        self._count = np.array(count, dtype=np.intp)
+
+    def _candidates(self, box_lo, box_hi, ray=None):
+        """(query, segment) pairs whose leaf boxes overlap the query boxes."""
+        out = list(self._walk(box_lo, box_hi, ray))
+        if not out:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty
+        return np.concatenate([q for q, _ in out]), np.concatenate([s for _, s in out])
+
+    def _walk(self, box_lo, box_hi, ray=None, alive=None):
+        """
+        Walk the tree for all queries at once, yielding (query, segment) leaf pairs level by level.
+
+        With `ray` node boxes are also tested against the query segment itself
+        (slab test, see _ray_hits_box), which prunes long diagonal rays. Queries the
+        caller clears in `alive` between yields are dropped from the walk.
+        """
+        if len(self._node_lo) == 0 or len(box_lo) == 0:
+            return
+        q = np.arange(len(box_lo))
+        node = np.zeros(len(box_lo), dtype=np.intp)
+        while len(q):
+            nlo = self._node_lo[node]
+            nhi = self._node_hi[node]
+            hit = ((box_lo[q, 0] <= nhi[:, 0]) & (box_lo[q, 1] <= nhi[:, 1])
+                   & (box_hi[q, 0] >= nlo[:, 0]) & (box_hi[q, 1] >= nlo[:, 1]))
+            if alive is not None:
+                hit &= alive[q]
+            q, node = q[hit], node[hit]
+            if ray is not None:
+                hit = self._ray_hits_box(ray, q, node)
+                q, node = q[hit], node[hit]
+
+            leaf = self._left[node] < 0
+            lq, ln = q[leaf], node[leaf]
+            q, node = q[~leaf], node[~leaf]
+            if len(lq):
+                n = self._count[ln]
+                total = int(n.sum())
+                offset = np.arange(total) - np.repeat(np.cumsum(n) - n, n)
+                yield np.repeat(lq, n), self._order[np.repeat(self._start[ln], n) + offset]
+
+            q = np.concatenate([q, q])
+            node = np.concatenate([self._left[node], self._right[node]])
+
+    def _ray_hits_box(self, ray, q, node):
+        # slab test; ray = (ax, ay, 1/dx, 1/dy), an axis-parallel ray has an infinite
+        # inverse and the NaN of 0 * inf is skipped by fmin / fmax
+        ax, ay, ix, iy = (r[q] for r in ray)
+        lo = self._node_lo[node]
+        hi = self._node_hi[node]
+        t1 = (lo[:, 0] - ax) * ix
+        t2 = (hi[:, 0] - ax) * ix
+        t3 = (lo[:, 1] - ay) * iy
+        t4 = (hi[:, 1] - ay) * iy
+        t_in = np.fmax(np.fmax(np.fmin(t1, t2), np.fmin(t3, t4)), 0.0)
+        t_out = np.fmin(np.fmin(np.fmax(t1, t2), np.fmax(t3, t4)), 1.0)
+        return t_in <= t_out
+
+    # ---------- line of sight ----------
+
+    def occluded(self, ax, ay, bx, by):
+        """True where the segment (ax, ay) -> (bx, by) crosses an obstacle edge."""
+        ax, ay, bx, by = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (ax, ay, bx, by)))
+        shape = ax.shape
+        ax, ay, bx, by = (a.ravel() for a in (ax, ay, bx, by))
+        blocked = np.zeros(len(ax), dtype=bool)
+
+        box_lo = np.stack([np.minimum(ax, bx), np.minimum(ay, by)], axis=1)
+        box_hi = np.stack([np.maximum(ax, bx), np.maximum(ay, by)], axis=1)
+        alive = np.ones(len(ax), dtype=bool)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ray = (ax, ay, 1.0 / (bx - ax), 1.0 / (by - ay))
+        for q, s in self._walk(box_lo, box_hi, ray, alive):
+            seg = self.segments[s]
+            rx, ry = bx[q] - ax[q], by[q] - ay[q]
+            sx, sy = seg[:, 2] - seg[:, 0], seg[:, 3] - seg[:, 1]
+            qx, qy = seg[:, 0] - ax[q], seg[:, 1] - ay[q]
+            den = rx * sy - ry * sx
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = (qx * sy - qy * sx) / den
+                u = (qx * ry - qy * rx) / den
+            cross = (den != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+            blocked[q[cross]] = True
+            # a blocked ray needs no further tests
+            alive[q[cross]] = False
+        return blocked.reshape(shape)
+
+    # ---------- keeping vehicles out ----------
+
+    def inside(self, x, y):
+        """True where the point lies inside any obstacle (even-odd rule per polygon)."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if len(self.segments) == 0:
+            return np.zeros(len(x), dtype=bool)
+        # horizontal ray to the right of each point, up to the far end of the obstacles
+        far = self._node_hi[0, 0] + 1.0
+        box_lo = np.stack([x, y], axis=1)
+        box_hi = np.stack([np.full_like(x, far), y], axis=1)
+        q, s = self._candidates(box_lo, box_hi)
+        seg = self.segments[s]
+        y1, y2 = seg[:, 1], seg[:, 3]
+        straddle = (y1 > y[q]) != (y2 > y[q])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cx = seg[:, 0] + (y[q] - y1) * (seg[:, 2] - seg[:, 0]) / (y2 - y1)
+        crossing = straddle & (cx > x[q])
+        key = q[crossing] * len(self.polygons) + self.polygon_of[s[crossing]]
+        odd = np.bincount(key, minlength=len(x) * len(self.polygons)) % 2 == 1
+        return odd.reshape(len(x), len(self.polygons)).any(axis=1)
+
+    def push_out(self, x, y, radius):
+        """
+        Move circles (in place) off the obstacle edges they overlap; returns the contact count.
+
+        Meant to run every step: a circle that crossed an edge is put back on the
+        outside, but one placed deep inside an obstacle is left where it is.
+        """
+        if len(self.segments) == 0 or len(x) == 0:
+            return 0
+        r = np.asarray(radius, dtype=float) * np.ones(len(x))
+        box_lo = np.stack([x - r, y - r], axis=1)
+        box_hi = np.stack([x + r, y + r], axis=1)
+        q, s = self._candidates(box_lo, box_hi)
+        if len(q) == 0:
+            return 0
+
+        # closest point of every candidate edge to the circle center
+        seg = self.segments[s]
+        ex, ey = seg[:, 2] - seg[:, 0], seg[:, 3] - seg[:, 1]
+        length2 = np.maximum(ex * ex + ey * ey, 1e-12)
+        t = np.clip(((x[q] - seg[:, 0]) * ex + (y[q] - seg[:, 1]) * ey) / length2, 0.0, 1.0)
+        dx = x[q] - (seg[:, 0] + t * ex)
+        dy = y[q] - (seg[:, 1] + t * ey)
+        dist = np.hypot(dx, dy)
+
+        # a center inside the polygon has to go out through the edge, not away from it
+        touched = np.unique(q)
+        inside_all = np.zeros(len(x), dtype=bool)
+        inside_all[touched] = self.inside(x[touched], y[touched])
+        inside = inside_all[q]
+        depth = np.where(inside, r[q] + dist, r[q] - dist)
+        sign = np.where(inside, -1.0, 1.0)
+        hit = depth > 0
+        if not hit.any():
+            return 0
+        q, dx, dy, dist, depth, sign = q[hit], dx[hit], dy[hit], dist[hit], depth[hit], sign[hit]
+
+        # per circle keep only its nearest edge so corners don't double-push
+        order = np.lexsort((dist, q))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = q[order][1:] != q[order][:-1]
+        pick = order[first]
+        safe = dist[pick] > 1e-9
+        nx = np.where(safe, dx[pick] / np.where(safe, dist[pick], 1.0), 1.0)
+        ny = np.where(safe, dy[pick] / np.where(safe, dist[pick], 1.0), 0.0)
+        x[q[pick]] += sign[pick] * nx * depth[pick]
+        y[q[pick]] += sign[pick] * ny * depth[pick]
+        return len(pick)
@@ -0,0 +1,281 @@
+"""
+Evolutionary tuning of vehicle parameters toward an objective.
+
+A genetic algorithm (tournament selection, blend crossover, Gaussian mutation,
+elitism) searches the box given by BOUNDS. Every candidate is scored by a
+headless world.World run: `replicas` vehicles from seeded random start poses,
+summarized with metrics.BehaviorMetrics and handed to the objective
+(higher is better). Candidates of a generation are evaluated in parallel
+processes.
+
+Fitness values are cached on disk, one JSON line per evaluation, keyed by a hash
+of the preset, mode, parameters, run settings and objective name. Re-running or
+resuming an optimization skips every evaluation already in the cache.
+
+    python optimize.py vehicle4 4a --objective orbit --generations 30
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from basins import DEFAULT_SCENES
+from metrics import BehaviorMetrics
+from world import LIGHT_DTYPE, World, vehicle_row
+
+
+# search box per tunable; thresholds are the 4b window (low_4b, high_4b)
+BOUNDS = {
+    "INTENSITY_GAIN": (100.0, 3000.0),
+    "MOTOR_GAIN": (0.5, 15.0),
+    "BASE_SPEED": (-1.0, 3.0),
+    "TURN_GAIN": (0.01, 0.4),
+    "mu_4a": (0.05, 1.0),
+    "sigma_4a": (0.02, 0.6),
+    "low_4b": (0.0, 0.8),
+    "high_4b": (0.05, 1.5),
+}
+
+# the parameters each mode actually uses
+MODE_PARAMS = {
+    "coward": ["INTENSITY_GAIN", "MOTOR_GAIN", "BASE_SPEED", "TURN_GAIN"],
+    "aggressive": ["INTENSITY_GAIN", "MOTOR_GAIN", "BASE_SPEED", "TURN_GAIN"],
+    "lover": ["INTENSITY_GAIN", "MOTOR_GAIN", "BASE_SPEED", "TURN_GAIN"],
+    "explorer": ["INTENSITY_GAIN", "BASE_SPEED", "TURN_GAIN"],
+    "4a": ["INTENSITY_GAIN", "MOTOR_GAIN", "BASE_SPEED", "TURN_GAIN", "mu_4a", "sigma_4a"],
+    "4b": ["INTENSITY_GAIN", "MOTOR_GAIN", "BASE_SPEED", "TURN_GAIN", "low_4b", "high_4b"],
+}
+
+
+# ---------- objectives ----------
+# an objective takes the BehaviorMetrics of a run and returns one number (higher is better);
+# it must be a module-level function so worker processes can import it
+
+def orbit(metrics):
+    """Mean number of loops around the most-circled light."""
+    return float(metrics.loops().max(axis=1).mean())
+
+
+def approach(metrics):
+    """Mean fraction of time within the smallest radius of any light."""
+    return float(metrics.fraction_within()[:, :, 0].max(axis=1).mean())
+
+
+def avoid(metrics):
+    """Mean closest distance to any light over the run."""
+    return float(metrics.nearest_min.mean())
+
+
+def explore(metrics):
+    """Mean distance traveled."""
+    return float(metrics.distance.mean())
+
+
+OBJECTIVES = {f.__name__: f for f in (orbit, approach, avoid, explore)}
+
+
+# ---------- evaluation ----------
+
+def _objective_name(objective):
+    return f"{objective.__module__}.{objective.__qualname__}"
+
+
+def _rounded(params):
+    # 7 significant digits: enough for tuning, and keeps hashes stable across float noise
+    return {k: float(f"{v:.7g}") for k, v in sorted(params.items())}
+
+
+def _rounded_genomes(genomes):
+    return np.vectorize(lambda v: float(f"{v:.7g}"))(genomes)
+
+
+def evaluation_key(preset, mode, params, settings, objective):
+    blob = json.dumps([preset, mode, _rounded(params), settings, _objective_name(objective)],
+                      sort_keys=True)
+    return hashlib.sha1(blob.encode()).hexdigest()
+
+
+def evaluate(job):
+    """Score one parameter set (runs in a worker process)."""
+    preset, mode, params, settings, objective = job
+    scene = settings["scene"]
+    rng = np.random.default_rng(settings["seed"])
+    n = settings["replicas"]
+    vehicles = np.repeat(vehicle_row(preset, 0.0, 0.0, mode=mode, **params), n)
+    vehicles["x"] = rng.uniform(0, scene["width"], n)
+    vehicles["y"] = rng.uniform(0, scene["height"], n)
+    vehicles["heading"] = rng.uniform(0, 2 * math.pi, n)
+
+    lights = np.zeros(len(scene["lights"]), dtype=LIGHT_DTYPE)
+    for i, light in enumerate(scene["lights"]):
+        lights[i] = tuple(light)
+    world = World(scene["width"], scene["height"], lights, vehicles, seed=settings["seed"])
+    metrics = BehaviorMetrics(n, lights["x"], lights["y"], radii=settings["radii"],
+                              width=scene["width"], height=scene["height"])
+    for _ in range(settings["steps"]):
+        world.step()
+        metrics.update(world)
+    return float(objective(metrics))
+
+
+class FitnessCache:
+    """Append-only JSON-lines file of {key: fitness}."""
+
+    def __init__(self, path):
+        self.path = path
+        self.values = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue       # a line cut short by an interrupted run
+                    self.values[entry["key"]] = entry["fitness"]
+        self.hits = 0
+
+    def get(self, key):
+        if key in self.values:
+            self.hits += 1
+            return self.values[key]
+        return None
+
+    def put(self, key, fitness, params=None):
+        self.values[key] = fitness
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"key": key, "fitness": fitness, "params": params}) + "\n")
+
+
+# ---------- search ----------
+
+class GeneticOptimizer:
+    def __init__(self, preset, mode, objective, names=None, bounds=None, population=24,
+                 elite=2, mutation=0.1, steps=1500, replicas=16, radii=(60.0, 150.0),
+                 scene=None, seed=0, cache_path="fitness_cache.jsonl", processes=None):
+        self.preset = preset
+        self.mode = mode
+        self.objective = OBJECTIVES[objective] if isinstance(objective, str) else objective
+        self.names = list(names or MODE_PARAMS[mode])
+        bounds = dict(BOUNDS, **(bounds or {}))
+        self.lo = np.array([bounds[k][0] for k in self.names])
+        self.hi = np.array([bounds[k][1] for k in self.names])
+        self.population = population
+        self.elite = elite
+        self.mutation = mutation
+        self.processes = processes
+        self.rng = np.random.default_rng(seed)
+        scene = scene or DEFAULT_SCENES[preset if preset in DEFAULT_SCENES else "vehicle3"]
+        # noise stays at the preset value; the run seed makes every evaluation repeatable
+        self.settings = dict(steps=steps, replicas=replicas, radii=list(radii),
+                             scene=dict(scene, lights=[list(L) for L in scene["lights"]]),
+                             seed=seed)
+        self.cache = FitnessCache(cache_path)
+        self.best = None               # (fitness, params)
+        self.history = []              # best fitness per generation
+
+    def params_of(self, genome):
+        return dict(zip(self.names, (float(g) for g in genome)))
+
+    def evaluate_all(self, genomes):
+        fitness = np.empty(len(genomes))
+        keys = []
+        todo = []
+        for i, genome in enumerate(genomes):
+            params = _rounded(self.params_of(genome))
+            key = evaluation_key(self.preset, self.mode, params, self.settings, self.objective)
+            keys.append(key)
+            cached = self.cache.get(key)
+            if cached is None:
+                todo.append(i)
+            else:
+                fitness[i] = cached
+
+        jobs = [(self.preset, self.mode, _rounded(self.params_of(genomes[i])), self.settings,
+                 self.objective) for i in todo]
+        if self.processes == 1:
+            results = list(map(evaluate, jobs))
+        elif jobs:
+            with ProcessPoolExecutor(self.processes) as pool:
+                results = list(pool.map(evaluate, jobs))
+        else:
+            results = []
+        for i, job, value in zip(todo, jobs, results):
+            fitness[i] = value
+            self.cache.put(keys[i], value, job[2])
+        return fitness
+
+    def _tournament(self, fitness, k=3):
+        pick = self.rng.integers(0, len(fitness), size=k)
+        return pick[np.argmax(fitness[pick])]
+
+    def run(self, generations=30, initial=None, callback=None):
+        """Evolve for `generations`; returns (best fitness, best params)."""
+        dim = len(self.names)
+        genomes = self.lo + self.rng.random((self.population, dim)) * (self.hi - self.lo)
+        if initial is not None:
+            # seed the population with a known parameter set (e.g. the preset's defaults)
+            genomes[0] = np.clip([initial[k] for k in self.names], self.lo, self.hi)
+
+        span = self.hi - self.lo
+        for gen in range(generations):
+            genomes[:, :] = _rounded_genomes(genomes)
+            fitness = self.evaluate_all(genomes)
+            best = int(np.argmax(fitness))
+            if self.best is None or fitness[best] > self.best[0]:
+                self.best = (float(fitness[best]), self.params_of(genomes[best]))
+            self.history.append(float(fitness[best]))
+            if callback:
+                callback(gen, fitness, self)
+
+            children = [genomes[i] for i in np.argsort(fitness)[::-1][:self.elite]]
+            while len(children) < self.population:
+                a = genomes[self._tournament(fitness)]
+                b = genomes[self._tournament(fitness)]
+                # BLX-0.5 crossover, then Gaussian mutation scaled to the box
+                lo = np.minimum(a, b) - 0.5 * np.abs(a - b)
+                hi = np.maximum(a, b) + 0.5 * np.abs(a - b)
+                child = lo + self.rng.random(dim) * (hi - lo)
+                child += self.rng.normal(0.0, self.mutation, dim) * span
+                children.append(np.clip(child, self.lo, self.hi))
+            genomes = np.array(children)
+        return self.best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evolve vehicle parameters toward an objective.")
+    parser.add_argument("preset", choices=["vehicle4", "vehicle3", "vehicle2simple", "Garimav2"])
+    parser.add_argument("mode", choices=sorted(MODE_PARAMS))
+    parser.add_argument("--objective", choices=sorted(OBJECTIVES), default="orbit")
+    parser.add_argument("--generations", type=int, default=30)
+    parser.add_argument("--population", type=int, default=24)
+    parser.add_argument("--steps", type=int, default=1500)
+    parser.add_argument("--replicas", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", default="fitness_cache.jsonl")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    opt = GeneticOptimizer(args.preset, args.mode, args.objective, population=args.population,
+                           steps=args.steps, replicas=args.replicas, seed=args.seed,
+                           cache_path=args.cache, processes=args.processes)
+    defaults = vehicle_row(args.preset, 0.0, 0.0, mode=args.mode)[0]
+
+    def report(gen, fitness, opt):
+        print(f"gen {gen:3d}  best {fitness.max():10.4f}  mean {fitness.mean():10.4f}"
+              f"  cache hits {opt.cache.hits}")
+
+    fitness, params = opt.run(args.generations, initial={k: float(defaults[k]) for k in opt.names},
+                              callback=report)
+    print(f"best fitness {fitness:.4f}")
+    for name, value in params.items():
+        print(f"  {name} = {value:.6g}")
+
+
+if __name__ == "__main__":
+    main()
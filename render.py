@@ -0,0 +1,187 @@
+"""
+Drawing of a world.World onto any pygame surface, in the scripts' style.
+
+Lights are yellow discs, vehicles green discs with a heading line and red
+sensor dots, trails light gray. Works on offscreen surfaces, so it needs no
+display.
+
+LodRenderer picks the level of detail per frame for large worlds:
+
+    full    the sprites above, one draw call each
+    glyph   one cached disc per object, all blitted in a single blits() call
+    pixel   small dots written straight into the pixel array
+
+It switches by the number of visible objects and steps down further while
+frames take longer than the time budget.
+"""
+
+import math
+import time
+
+import numpy as np
+import pygame
+
+
+BACKGROUND = (255, 255, 255)
+LIGHT_COLOR = (255, 255, 0)
+OUTLINE = (0, 0, 0)
+BODY_COLOR = (0, 200, 0)
+SENSOR_COLOR = (255, 0, 0)
+TRAIL_COLOR = (180, 180, 180)
+
+
+def draw_lights(surf, world, detail=True):
+    """detail=False leaves out the outlines (one draw call per light instead of two)."""
+    for x, y, r in zip(world.lights["x"], world.lights["y"], world.lights["radius"]):
+        pygame.draw.circle(surf, LIGHT_COLOR, (int(x), int(y)), int(r))
+        if detail:
+            pygame.draw.circle(surf, OUTLINE, (int(x), int(y)), int(r), 2)
+
+
+def draw_obstacles(surf, world):
+    if world.obstacles:
+        for poly in world.obstacles.polygons:
+            pygame.draw.polygon(surf, (90, 90, 90), [(int(px), int(py)) for px, py in poly])
+
+
+def draw_trails(surf, world):
+    for i in range(len(world.vehicles) if world.trail_len else 0):
+        pts = world.trail_points(i)
+        if len(pts) < 3:
+            continue
+        # a jump across the wrap-around would draw a line through the whole screen
+        jumps = np.flatnonzero(np.abs(np.diff(pts, axis=0)).max(axis=1) > 50) + 1
+        for piece in np.split(pts, jumps):
+            if len(piece) > 2:
+                pygame.draw.lines(surf, TRAIL_COLOR, False, piece.astype(int).tolist(), 2)
+
+
+def draw_vehicles(surf, world, sensors=True):
+    v = world.vehicles
+    for x, y, h, r in zip(v["x"], v["y"], v["heading"], v["radius"]):
+        pygame.draw.circle(surf, BODY_COLOR, (int(x), int(y)), int(r))
+        pygame.draw.circle(surf, OUTLINE, (int(x), int(y)), int(r), 2)
+        nose = (int(x + math.cos(h) * r), int(y + math.sin(h) * r))
+        pygame.draw.line(surf, OUTLINE, (int(x), int(y)), nose, 3)
+    if sensors:
+        for sx, sy in world.sensor_positions().reshape(-1, 2):
+            pygame.draw.circle(surf, SENSOR_COLOR, (int(sx), int(sy)), 5)
+
+
+def draw_world(surf, world, trails=True, sensors=True, hud=None, font=None, light_detail=True):
+    """Draw the whole world; `hud` is an optional list of text lines (needs `font`)."""
+    surf.fill(BACKGROUND)
+    draw_obstacles(surf, world)
+    if trails:
+        draw_trails(surf, world)
+    draw_lights(surf, world, light_detail)
+    draw_vehicles(surf, world, sensors)
+    if hud and font is not None:
+        for i, line in enumerate(hud):
+            surf.blit(font.render(line, True, (0, 0, 0)), (10, 10 + 20 * i))
+
+
+# ---------- level of detail ----------
+
+LEVELS = ("full", "glyph", "pixel")
+
+
+def _visible(xs, ys, surf):
+    w, h = surf.get_size()
+    return (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+
+
+def plot_points(surf, xs, ys, color, size=1):
+    """Write size x size dots straight into the surface pixels (vectorized)."""
+    w, h = surf.get_size()
+    ix = xs.astype(np.intp) - size // 2
+    iy = ys.astype(np.intp) - size // 2
+    pixels = pygame.surfarray.pixels3d(surf)
+    try:
+        for ox in range(size):
+            for oy in range(size):
+                px, py = ix + ox, iy + oy
+                inside = (px >= 0) & (px < w) & (py >= 0) & (py < h)
+                pixels[px[inside], py[inside]] = color
+    finally:
+        del pixels                     # unlocks the surface
+
+
+class LodRenderer:
+    def __init__(self, full_limit=300, glyph_limit=5000, budget_ms=12.0):
+        self.full_limit = full_limit
+        self.glyph_limit = glyph_limit
+        self.budget_ms = budget_ms
+        self.level = "full"
+        self.floor = 0                 # never draw above LEVELS[floor] (set by a governor)
+        self.frame_ms = 0.0            # smoothed draw time
+        self._penalty = 0              # extra levels down because of the time budget
+        self._calm = 0                 # consecutive frames well inside the budget
+        self._glyphs = {}
+
+    def _glyph(self, radius, color):
+        key = (radius, color)
+        if key not in self._glyphs:
+            r = max(1, radius)
+            g = pygame.Surface((2 * r + 1, 2 * r + 1))
+            g.fill(BACKGROUND)
+            g.set_colorkey(BACKGROUND)
+            pygame.draw.circle(g, color, (r, r), r)
+            if r > 3:
+                pygame.draw.circle(g, OUTLINE, (r, r), r, 1)
+            self._glyphs[key] = g
+        return self._glyphs[key]
+
+    def choose(self, count):
+        base = 0 if count <= self.full_limit else 1 if count <= self.glyph_limit else 2
+        return LEVELS[min(2, max(base + self._penalty, self.floor))]
+
+    def _account(self, ms):
+        self.frame_ms = ms if self.frame_ms == 0 else 0.8 * self.frame_ms + 0.2 * ms
+        if self.frame_ms > self.budget_ms and self._penalty < 2:
+            self._penalty += 1
+            self.frame_ms = 0.0
+            self._calm = 0
+        elif self.frame_ms < 0.4 * self.budget_ms and self._penalty > 0:
+            # step back up only after a run of cheap frames
+            self._calm += 1
+            if self._calm >= 30:
+                self._penalty -= 1
+                self.frame_ms = 0.0
+                self._calm = 0
+        else:
+            self._calm = 0
+
+    def draw(self, surf, world, trails=True, sensors=True, hud=None, font=None, light_detail=True):
+        start = time.perf_counter()
+        v = world.vehicles
+        L = world.lights
+        count = int(_visible(v["x"], v["y"], surf).sum() + _visible(L["x"], L["y"], surf).sum())
+        self.level = self.choose(count)
+
+        if self.level == "full":
+            draw_world(surf, world, trails, sensors, light_detail=light_detail)
+        else:
+            surf.fill(BACKGROUND)
+            draw_obstacles(surf, world)
+            if trails and world.trail_len:
+                pts = world.trail.reshape(-1, 2)
+                pts = pts[~np.isnan(pts[:, 0])]
+                plot_points(surf, pts[:, 0], pts[:, 1], TRAIL_COLOR)
+            if self.level == "glyph":
+                for rows, color in ((L, LIGHT_COLOR), (v, BODY_COLOR)):
+                    for r in np.unique(rows["radius"].astype(int)):
+                        sel = rows["radius"].astype(int) == r
+                        g = self._glyph(int(r), color)
+                        xs = (rows["x"][sel] - r).astype(int).tolist()
+                        ys = (rows["y"][sel] - r).astype(int).tolist()
+                        surf.blits([(g, pos) for pos in zip(xs, ys)], doreturn=False)
+            else:
+                plot_points(surf, L["x"], L["y"], LIGHT_COLOR, 3)
+                plot_points(surf, v["x"], v["y"], BODY_COLOR, 2)
+
+        if hud and font is not None:
+            lines = list(hud) + [f"detail: {self.level} ({count} objects, {self.frame_ms:.1f} ms)"]
+            for i, line in enumerate(lines):
+                surf.blit(font.render(line, True, (0, 0, 0)), (10, 10 + 20 * i))
+        self._account((time.perf_counter() - start) * 1000.0)
@@ -0,0 +1,207 @@
+"""
+Scenario files and binary world snapshots.
+
+A scenario is a small JSON file describing a world:
+
+    {
+      "world":    {"width": 900, "height": 700, "seed": 1},
+      "lights":   [{"x": 330, "y": 350, "radius": 18}, {"x": 570, "y": 350}],
+      "vehicles": [{"preset": "vehicle4", "mode": "4a", "x": 450, "y": 190,
+                    "heading": 1.047, "params": {"TURN_GAIN": 0.2}}],
+      "obstacles": [[[400, 250], [500, 250], [500, 280], [400, 280]]]
+    }
+
+`preset` names the script whose vehicle defaults are used (see world.PRESETS,
+default "vehicle4"), `params` overrides any of the class tunables.
+
+A snapshot stores the same world as raw arrays behind a short JSON header, so
+loading it is a couple of reads no matter how many lights and vehicles it holds:
+
+    b"BVWS" | uint32 header length | JSON header | padding | lights | vehicles
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from obstacles import Obstacles
+from world import LIGHT_DTYPE, MODES, VEHICLE_DTYPE, World, vehicle_row, wire_by_mode
+
+
+SNAPSHOT_MAGIC = b"BVWS"
+SNAPSHOT_VERSION = 1
+_ALIGN = 64
+
+# pose, mode and last-step readings: not tunables
+_STATE_FIELDS = ("x", "y", "heading", "mode", "left_I", "right_I",
+                 "left_w", "right_w", "v", "omega")
+
+
+# ---------- scenario files ----------
+
+def world_from_scenario(data):
+    """Build a World from an already parsed scenario dict."""
+    spec = data.get("world", {})
+    world = World(spec.get("width", 800), spec.get("height", 600), seed=spec.get("seed"))
+
+    lights = data.get("lights", [])
+    rows = np.zeros(len(lights), dtype=LIGHT_DTYPE)
+    for i, L in enumerate(lights):
+        rows[i] = (L["x"], L["y"], L.get("radius", 18))
+    world.lights = rows
+
+    vehicles = data.get("vehicles", [])
+    for V in vehicles:
+        params = {k: float(p) if isinstance(p, str) else p
+                  for k, p in V.get("params", {}).items()}
+        world.add_vehicle(V.get("preset", "vehicle4"), V["x"], V["y"],
+                          heading=V.get("heading", 0.0), mode=V.get("mode"), **params)
+
+    if data.get("obstacles"):
+        world.obstacles = Obstacles(data["obstacles"])
+    return world
+
+
+def load_scenario(path):
+    with open(path) as f:
+        return world_from_scenario(json.load(f))
+
+
+def save_scenario(world, path):
+    """
+    Write a world back out as a scenario file.
+
+    Vehicles are written with every tunable spelled out under `params`, so the
+    file reproduces the world whatever preset they were created from.
+    """
+    names = [n for n in VEHICLE_DTYPE.names
+             if n not in ("x", "y", "heading", "mode", "left_I", "right_I",
+                          "left_w", "right_w", "v", "omega")]
+    vehicles = []
+    for row in world.vehicles:
+        vehicles.append({
+            "mode": MODES[int(row["mode"])],
+            "x": float(row["x"]),
+            "y": float(row["y"]),
+            "heading": float(row["heading"]),
+            "params": {n: _json_number(row[n]) for n in names},
+        })
+    data = {
+        "world": {"width": world.width, "height": world.height},
+        "lights": [{"x": float(L["x"]), "y": float(L["y"]), "radius": float(L["radius"])}
+                   for L in world.lights],
+        "vehicles": vehicles,
+        "obstacles": _obstacle_lists(world),
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def script_params(row, preset, attrs, unused=()):
+    """
+    Tunables of a vehicle row for one of the scripts' own vehicle classes.
+
+    Returns {attribute: value} for every field of `row` that differs from the
+    `preset` defaults and that the class keeps in an attribute (`attrs` maps
+    field name -> attribute name). Fields in `unused` play no part in the class.
+    Any other field that differs is hard-coded in the class, so the row is
+    rejected with ValueError instead of running with different values.
+    """
+    default = vehicle_row(preset, 0.0, 0.0, mode=MODES[int(row["mode"])])[0]
+    out = {}
+    for name in VEHICLE_DTYPE.names:
+        if name in _STATE_FIELDS or name in unused:
+            continue
+        if np.array_equal(row[name], default[name]):
+            continue
+        if name not in attrs:
+            raise ValueError(f"{preset} vehicles cannot change {name} "
+                             f"(scenario sets {_json_number(row[name])})")
+        out[attrs[name]] = row[name].item()
+    return out
+
+
+def _obstacle_lists(world):
+    if not world.obstacles:
+        return []
+    return [poly.tolist() for poly in world.obstacles.polygons]
+
+
+def _json_number(value):
+    if value.ndim:
+        return value.tolist()
+    value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return "inf" if value > 0 else "-inf"
+    return value
+
+
+# ---------- binary snapshots ----------
+
+def _padded(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def save_snapshot(world, path):
+    lights = np.ascontiguousarray(world.lights, dtype=LIGHT_DTYPE)
+    vehicles = np.ascontiguousarray(world.vehicles, dtype=VEHICLE_DTYPE)
+    header = json.dumps({
+        "version": SNAPSHOT_VERSION,
+        "width": world.width,
+        "height": world.height,
+        "step_count": world.step_count,
+        "obstacles": _obstacle_lists(world),
+        "lights": {"count": len(lights), "descr": lights.dtype.descr},
+        "vehicles": {"count": len(vehicles), "descr": vehicles.dtype.descr},
+    }).encode()
+
+    prefix = SNAPSHOT_MAGIC + struct.pack("<I", len(header)) + header
+    with open(path, "wb") as f:
+        f.write(prefix)
+        f.write(b"\0" * (_padded(len(prefix)) - len(prefix)))
+        f.write(lights.tobytes())
+        f.write(vehicles.tobytes())
+
+
+def _read_rows(f, spec, dtype):
+    stored = np.dtype([tuple(field) for field in spec["descr"]])
+    rows = np.fromfile(f, dtype=stored, count=spec["count"])
+    if len(rows) != spec["count"]:
+        raise ValueError("snapshot is truncated")
+    if stored == dtype:
+        return rows
+    # written by an older layout: copy the fields both layouts share
+    out = np.zeros(len(rows), dtype=dtype)
+    for name in set(stored.names) & set(dtype.names):
+        out[name] = rows[name]
+    if dtype == VEHICLE_DTYPE and "wiring" not in stored.names:
+        wire_by_mode(out)
+    return out
+
+
+def load_snapshot(path, seed=None):
+    with open(path, "rb") as f:
+        magic = f.read(4)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a world snapshot")
+        (size,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(size))
+        if header["version"] > SNAPSHOT_VERSION:
+            raise ValueError(f"snapshot version {header['version']} is newer than this reader")
+        f.seek(_padded(8 + size))
+        lights = _read_rows(f, header["lights"], LIGHT_DTYPE)
+        vehicles = _read_rows(f, header["vehicles"], VEHICLE_DTYPE)
+
+    world = World(header["width"], header["height"], lights, vehicles, seed=seed)
+    world.step_count = header["step_count"]
+    if header.get("obstacles"):
+        world.obstacles = Obstacles(header["obstacles"])
+    return world
+
+
+def load(path, seed=None):
+    """Load either a snapshot or a JSON scenario, whichever `path` is."""
+    with open(path, "rb") as f:
+        is_snapshot = f.read(4) == SNAPSHOT_MAGIC
+    return load_snapshot(path, seed) if is_snapshot else load_scenario(path)
@@ -0,0 +1,245 @@
+"""
+A World fleet partitioned over worker processes, living in shared memory.
+
+The vehicle rows and the light rows are placed in multiprocessing shared
+memory. Every worker process maps them without copying and owns one
+contiguous slice of the vehicles. It steps its slice with its own World and
+then writes the new rows into the shared ones. All workers meet at a barrier
+after every step, so they always stand at the same step.
+
+Other processes read the fleet without copying either: FleetReader maps the
+same memory by name. Every worker has a sequence counter, odd while it writes
+its rows and bumped twice per step. A read is good if all counters were even
+and equal before it and unchanged after it. So viewers can read during a long
+run(), between the row writes of two steps.
+
+Vehicles only interact with the lights here, so vehicles that carry lights
+(EMIT > 0) and collisions are not supported: they would couple the partitions.
+Sensor rigs, light motion and strengths, transfer tables and trails are not
+handed to the workers, so worlds using them are rejected too.
+
+    fleet = SharedFleet(world, workers=4)
+    fleet.run(1000)
+    reader = FleetReader(fleet.names, fleet.counts)   # e.g. in a viewer process
+    x = reader.read(lambda v, L: v["x"].copy())
+    fleet.close()
+"""
+
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from obstacles import Obstacles
+from world import LIGHT_DTYPE, VEHICLE_DTYPE, World
+
+
+# control block: one int64 each, followed by one sequence counter per worker
+_STEPS, _STEP_COUNT, _STOP = range(3)
+_SEQ = 3
+
+
+def _attach(name, dtype, count):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray((count,), dtype=dtype, buffer=shm.buf)
+
+
+def _worker(index, names, counts, rows, settings, seed, go, done, step_barrier):
+    shm_v, vehicles = _attach(names["vehicles"], VEHICLE_DTYPE, counts["vehicles"])
+    shm_l, lights = _attach(names["lights"], LIGHT_DTYPE, counts["lights"])
+    shm_c, control = _attach(names["control"], np.int64, _SEQ + counts["workers"])
+    shared = vehicles[rows[0]:rows[1]]
+    seq = _SEQ + index
+    world = None
+    try:
+        # this worker's World steps a private copy of its slice and publishes it after every step
+        world = World(settings["width"], settings["height"], lights, shared.copy(), seed=seed)
+        world.periodic = settings["periodic"]
+        world.periodic_cutoff = settings["periodic_cutoff"]
+        world.occlusion_min_intensity = settings["occlusion_min_intensity"]
+        world.bit_exact = settings["bit_exact"]
+        if settings["obstacles"]:
+            world.obstacles = Obstacles(settings["obstacles"])
+        world.step_count = int(control[_STEP_COUNT])
+
+        while True:
+            go.wait()
+            if control[_STOP]:
+                break
+            world.vehicles[:] = shared             # pick up edits made between runs
+            for _ in range(int(control[_STEPS])):
+                world.step(settings["dt"])
+                control[seq] += 1                  # odd: rows are changing
+                shared[:] = world.vehicles
+                control[seq] += 1                  # even: stable again
+                step_barrier.wait()
+            done.wait()
+    except threading.BrokenBarrierError:
+        pass                                       # another worker failed, see SharedFleet.run
+    except BaseException:
+        # release the parent and the other workers instead of leaving them at a barrier
+        go.abort()
+        done.abort()
+        step_barrier.abort()
+        raise
+    finally:
+        del world, shared, vehicles, lights, control
+        shm_v.close()
+        shm_l.close()
+        shm_c.close()
+
+
+class SharedFleet:
+    def __init__(self, world, workers=None, dt=1.0):
+        v = world.vehicles
+        if (v["EMIT"] > 0).any() or world.collisions:
+            raise ValueError("vehicle lights and collisions couple the partitions; use a plain World")
+        unsupported = [name for name, used in (
+            ("sensor rigs", world.rigs), ("light motion", world.light_motion is not None),
+            ("light strengths", world.light_strength is not None), ("transfer tables", world.transfer),
+            ("trails", world.trail_len)) if used]
+        if unsupported:
+            raise ValueError(f"{', '.join(unsupported)} are not shared with the workers; use a plain World")
+        self.workers = workers or mp.cpu_count()
+        self.width = world.width
+        self.height = world.height
+
+        self._shm = {}
+        self.vehicles = self._share("vehicles", v)
+        self.lights = self._share("lights", world.lights)
+        self.control = self._share("control", np.zeros(_SEQ + self.workers, dtype=np.int64))
+        self.control[_STEP_COUNT] = world.step_count
+        self.names = {key: shm.name for key, shm in self._shm.items()}
+        self.counts = {"vehicles": len(v), "lights": len(world.lights), "workers": self.workers}
+
+        settings = dict(width=world.width, height=world.height, dt=dt, periodic=world.periodic,
+                        periodic_cutoff=world.periodic_cutoff,
+                        occlusion_min_intensity=world.occlusion_min_intensity,
+                        bit_exact=world.bit_exact,
+                        obstacles=[p.tolist() for p in world.obstacles.polygons] if world.obstacles else [])
+
+        self._go = mp.Barrier(self.workers + 1)
+        self._done = mp.Barrier(self.workers + 1)
+        self._step = mp.Barrier(self.workers)
+        bounds = np.linspace(0, len(v), self.workers + 1).astype(int)
+        seeds = np.random.SeedSequence(world.rng.integers(2 ** 63)).spawn(self.workers)
+        self._procs = []
+        self._closing = threading.Event()
+        try:
+            for k in range(self.workers):
+                p = mp.Process(target=_worker, name=f"fleet-{k}", daemon=True,
+                               args=(k, self.names, self.counts, (bounds[k], bounds[k + 1]), settings,
+                                     seeds[k], self._go, self._done, self._step))
+                p.start()
+                self._procs.append(p)
+        except BaseException:
+            self._shutdown()
+            raise
+        # a worker killed outside Python cannot abort the barriers itself
+        threading.Thread(target=self._watch, name="fleet-watch", daemon=True).start()
+
+    def _share(self, key, array):
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._shm[key] = shm
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        view[...] = array
+        return view
+
+    @property
+    def step_count(self):
+        return int(self.control[_STEP_COUNT])
+
+    def run(self, steps):
+        """
+        Advance every partition by `steps`; returns when all are done.
+
+        Raises RuntimeError if a worker fails. The fleet is closed then.
+        """
+        if not self._procs:
+            raise RuntimeError("fleet is closed")
+        self.control[_STEPS] = steps
+        try:
+            self._go.wait()
+            self._done.wait()
+        except threading.BrokenBarrierError:
+            self._shutdown()
+            failed = [f"{p.name} (exit code {p.exitcode})" for p in self._failed]
+            raise RuntimeError(f"fleet worker failed: {', '.join(failed)}") from None
+        self.control[_STEP_COUNT] += steps
+
+    def _watch(self):
+        while not self._closing.wait(0.1):
+            if any(p.exitcode is not None for p in self._procs):
+                self._go.abort()
+                self._done.abort()
+                self._step.abort()
+                return
+
+    def close(self):
+        if not self._procs:
+            return
+        try:
+            self.control[_STOP] = 1
+            self._go.wait(timeout=10.0)
+        except threading.BrokenBarrierError:
+            pass                                   # a worker died; _shutdown stops the rest
+        finally:
+            self._shutdown()
+
+    def _shutdown(self):
+        """Stop the workers and unlink the shared memory, whatever state they are in."""
+        self._closing.set()
+        try:
+            for p in self._procs:
+                p.join(timeout=5.0)
+                if p.exitcode is None:
+                    p.terminate()
+                    p.join()
+            self._failed = [p for p in self._procs if p.exitcode]
+        finally:
+            self._procs = []
+            self.vehicles = self.lights = self.control = None
+            for shm in self._shm.values():
+                shm.close()
+                shm.unlink()
+            self._shm = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FleetReader:
+    """Zero-copy view of a SharedFleet from any process on the machine."""
+
+    def __init__(self, names, counts):
+        self._shm_v, self.vehicles = _attach(names["vehicles"], VEHICLE_DTYPE, counts["vehicles"])
+        self._shm_l, self.lights = _attach(names["lights"], LIGHT_DTYPE, counts["lights"])
+        self._shm_c, self.control = _attach(names["control"], np.int64, _SEQ + counts["workers"])
+
+    def read(self, fn, retries=100):
+        """
+        fn(vehicles, lights) on the live rows, retried until no rows were written meanwhile.
+
+        fn should copy out what it needs; the views change with the next step.
+        """
+        for _ in range(retries):
+            seqs = self.control[_SEQ:].copy()
+            if seqs[0] % 2 or (seqs != seqs[0]).any():
+                # a worker is writing, or the partitions stand at different steps
+                time.sleep(0.0001)
+                continue
+            result = fn(self.vehicles, self.lights)
+            if np.array_equal(self.control[_SEQ:], seqs):
+                return result
+        raise TimeoutError("fleet kept stepping while reading")
+
+    def close(self):
+        del self.vehicles, self.lights, self.control
+        self._shm_v.close()
+        self._shm_l.close()
+        self._shm_c.close()
@@ -0,0 +1,124 @@
+"""
+Uniform-grid spatial hash for neighbor queries over NumPy position arrays.
+
+The grid is rebuilt from scratch with one sort, which for a few thousand points
+is far cheaper than comparing every pair. Queries return candidate pairs for a
+whole batch of query points at once; the caller does the exact distance test.
+"""
+
+import math
+
+import numpy as np
+
+
+class SpatialHash:
+    def __init__(self, cell_size, width, height, periodic=False):
+        self.cell_size = float(cell_size)
+        self.periodic = periodic
+        if periodic:
+            # cells must tile the torus exactly, so they are stretched to divide it
+            self.nx = max(1, int(width // self.cell_size))
+            self.ny = max(1, int(height // self.cell_size))
+            self.cell_w = width / self.nx
+            self.cell_h = height / self.ny
+        else:
+            self.nx = max(1, int(math.ceil(width / self.cell_size)))
+            self.ny = max(1, int(math.ceil(height / self.cell_size)))
+            self.cell_w = self.cell_h = self.cell_size
+        self.order = np.zeros(0, dtype=np.intp)       # item indices sorted by cell
+        self.cell_of = np.zeros(0, dtype=np.intp)     # cell of every item at the last build
+        self.starts = np.zeros(self.nx * self.ny + 1, dtype=np.intp)
+
+    def _cells(self, xs, ys):
+        cx = (xs // self.cell_w).astype(np.intp)
+        cy = (ys // self.cell_h).astype(np.intp)
+        if self.periodic:
+            # positions outside the torus fall into the cell of their wrapped copy
+            return cx % self.nx, cy % self.ny
+        return np.clip(cx, 0, self.nx - 1), np.clip(cy, 0, self.ny - 1)
+
+    def build(self, xs, ys):
+        cx, cy = self._cells(xs, ys)
+        cell = cy * self.nx + cx
+        self.cell_of = cell
+        self.order = np.argsort(cell, kind="stable")
+        counts = np.bincount(cell, minlength=self.nx * self.ny)
+        self.starts[0] = 0
+        np.cumsum(counts, out=self.starts[1:])
+
+    def move(self, indices, xs, ys):
+        """
+        Update after the items `indices` moved to xs[indices], ys[indices].
+
+        Only the items that changed cell are re-binned: they are taken out of
+        the sorted order and merged back in at their new cells, without sorting
+        the others again. The result is the same as a build(). Returns True if
+        any item changed cell.
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        cx, cy = self._cells(xs[indices], ys[indices])
+        cell = cy * self.nx + cx
+        changed = cell != self.cell_of[indices]
+        if not changed.any():
+            return False
+        items = indices[changed]
+        old = self.cell_of[items]
+        self.cell_of[items] = cell[changed]
+
+        # order is sorted by (cell, item), like the stable sort of build()
+        n = len(self.cell_of)
+        out = np.zeros(n, dtype=bool)
+        out[items] = True
+        keep = self.order[~out[self.order]]
+        new_keys = np.sort(self.cell_of[items] * n + items)
+        at = np.searchsorted(self.cell_of[keep] * n + keep, new_keys)
+        self.order = np.insert(keep, at, new_keys % n)
+
+        counts = np.diff(self.starts)
+        np.subtract.at(counts, old, 1)
+        np.add.at(counts, self.cell_of[items], 1)
+        np.cumsum(counts, out=self.starts[1:])
+        return True
+
+    def candidate_pairs(self, qx, qy, radius):
+        """
+        All (query index, item index) pairs whose cells lie within `radius`.
+
+        Pairs are a superset of the true neighbors; filter by distance afterwards.
+        """
+        reach_x = int(math.ceil(radius / self.cell_w))
+        reach_y = int(math.ceil(radius / self.cell_h))
+        cx, cy = self._cells(qx, qy)
+        query = np.arange(len(qx))
+        offsets_x = range(-reach_x, reach_x + 1)
+        offsets_y = range(-reach_y, reach_y + 1)
+        if self.periodic:
+            # neighbor cells wrap around; a small grid must not visit a cell twice
+            offsets_x = sorted({o % self.nx for o in offsets_x})
+            offsets_y = sorted({o % self.ny for o in offsets_y})
+        q_parts = []
+        i_parts = []
+        for oy in offsets_y:
+            ny = cy + oy
+            for ox in offsets_x:
+                nx = cx + ox
+                if self.periodic:
+                    cell = (ny % self.ny) * self.nx + nx % self.nx
+                    q, i = self._expand(query, cell)
+                else:
+                    inside = (nx >= 0) & (nx < self.nx) & (ny >= 0) & (ny < self.ny)
+                    q, i = self._expand(query[inside], ny[inside] * self.nx + nx[inside])
+                q_parts.append(q)
+                i_parts.append(i)
+        if not q_parts:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        return np.concatenate(q_parts), np.concatenate(i_parts)
+
+    def _expand(self, query, cell):
+        # every query paired with every item of its cell, without a Python loop
+        start = self.starts[cell]
+        count = self.starts[cell + 1] - start
+        total = int(count.sum())
+        q = np.repeat(query, count)
+        offset = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+        return q, self.order[np.repeat(start, count) + offset]
@@ -0,0 +1,176 @@
+"""
+Streaming simulation: a generator over the steps of a World or of one vehicle.
+
+simulate() advances the source one step per item it yields. Each item is a
+State view of that step. For a World the views are the live vehicle columns,
+so nothing is copied; they are only valid until the next step. Stages are
+small generator functions that take a stream and yield a stream. pipeline()
+chains them. Nothing is kept beyond what a stage keeps itself, so memory
+stays the same however many steps are consumed.
+
+    metrics = BehaviorMetrics(len(world.vehicles), world.lights["x"], world.lights["y"])
+    last = drain(pipeline(simulate(world, steps=100000),
+                          measure(metrics),
+                          every(10),
+                          record(Recorder("poses.f32")),
+                          until(lambda s: (s.x > 800).all())))
+
+A vehicle object from the pygame scripts works as well. Give it whatever its
+update() expects: a list of lights, a LightManager (its get_lights() is read
+every step) or a light position.
+
+    for state in simulate(vehicle, lights=manager, steps=500):
+        print(state.step, state.x[0], state.y[0])
+"""
+
+import collections
+import itertools
+
+import numpy as np
+
+
+class State:
+    """One step of a simulation: arrays over the vehicles (length 1 for a single vehicle)."""
+
+    __slots__ = ("step", "x", "y", "heading", "speed", "turn", "source")
+
+    def __init__(self, step, x, y, heading, speed, turn, source):
+        self.step = step
+        self.x = x
+        self.y = y
+        self.heading = heading
+        self.speed = speed
+        self.turn = turn
+        self.source = source
+
+
+def _world_states(world, steps, dt):
+    for _ in itertools.count() if steps is None else range(steps):
+        world.step(dt)
+        v = world.vehicles              # re-read: add_vehicle replaces the array
+        yield State(world.step_count, v["x"], v["y"], v["heading"], v["v"], v["omega"], world)
+
+
+def _vehicle_states(vehicle, lights, steps, dt):
+    for step in itertools.count(1) if steps is None else range(1, steps + 1):
+        current = lights.get_lights() if hasattr(lights, "get_lights") else lights
+        if dt == 1.0:
+            vehicle.update(current)
+        else:
+            vehicle.update(current, dt)         # only Vehicle4 takes a time step
+        speed = getattr(vehicle, "v", getattr(vehicle, "forward_speed", getattr(vehicle, "speed", 0.0)))
+        turn = getattr(vehicle, "omega", getattr(vehicle, "turn_rate", 0.0))
+        yield State(step, np.array([vehicle.x]), np.array([vehicle.y]),
+                    np.array([vehicle.heading]), np.array([speed]), np.array([turn]), vehicle)
+
+
+def simulate(source, lights=None, steps=None, dt=1.0):
+    """Lazily step a World (or a script vehicle with its lights); endless if steps is None."""
+    if hasattr(source, "vehicles") and hasattr(source, "step"):
+        return _world_states(source, steps, dt)
+    if lights is None:
+        raise ValueError("a single vehicle needs the lights its update() reads")
+    return _vehicle_states(source, lights, steps, dt)
+
+
+# ---------- stages ----------
+
+def pipeline(states, *stages):
+    """Chain stages: pipeline(s, a, b) is b(a(s))."""
+    for stage in stages:
+        states = stage(states)
+    return states
+
+
+def every(n):
+    """Pass on only every n-th step."""
+    def stage(states):
+        for state in states:
+            if state.step % n == 0:
+                yield state
+    return stage
+
+
+def measure(metrics):
+    """Feed every state to a metrics.BehaviorMetrics; a World's positions wrap over its size."""
+    def stage(states):
+        for state in states:
+            source = state.source
+            wrap = (source.width, source.height) if hasattr(source, "vehicles") else None
+            metrics.update_arrays(state.x, state.y, state.speed, state.turn, wrap)
+            yield state
+    return stage
+
+
+def until(predicate, inclusive=True):
+    """End the stream at the first state for which predicate(state) is true."""
+    def stage(states):
+        for state in states:
+            if predicate(state):
+                if inclusive:
+                    yield state
+                return
+            yield state
+    return stage
+
+
+def tap(fn):
+    """Call fn(state) for every state, e.g. to draw or print."""
+    def stage(states):
+        for state in states:
+            fn(state)
+            yield state
+    return stage
+
+
+def record(recorder):
+    """Hand every state to a Recorder (or any callable taking a state)."""
+    return tap(recorder)
+
+
+class Recorder:
+    """
+    Keeps chosen State fields, in constant memory.
+
+    out: file path or binary file object; each recorded step is appended as
+    float32 rows (vehicles x fields). last: additionally keep the last `last`
+    steps in a ring buffer, see frames().
+    """
+
+    def __init__(self, out=None, fields=("x", "y", "heading"), last=0):
+        self.fields = tuple(fields)
+        self.last = last
+        self.count = 0
+        self._owns = isinstance(out, str)
+        self._file = open(out, "wb") if self._owns else out
+        self._ring = None
+        self._steps = np.zeros(last, dtype=np.int64)
+
+    def __call__(self, state):
+        row = np.stack([getattr(state, name) for name in self.fields], axis=1).astype(np.float32)
+        if self._file is not None:
+            self._file.write(row.tobytes())
+        if self.last:
+            if self._ring is None or self._ring.shape[1:] != row.shape:
+                self._ring = np.full((self.last,) + row.shape, np.nan, dtype=np.float32)
+            self._ring[self.count % self.last] = row
+            self._steps[self.count % self.last] = state.step
+        self.count += 1
+
+    def frames(self):
+        """(steps, rows) of the kept steps, oldest first; rows: (steps, vehicles, fields)."""
+        if self._ring is None:
+            return self._steps[:0], np.zeros((0, 0, len(self.fields)), dtype=np.float32)
+        k = min(self.count, self.last)
+        order = (np.arange(k) + self.count - k) % self.last
+        return self._steps[order], self._ring[order]
+
+    def close(self):
+        if self._owns:
+            self._file.close()
+
+
+def drain(states):
+    """Run a stream to its end; returns the last state (or None)."""
+    last = collections.deque(states, maxlen=1)
+    return last[0] if last else None
@@ -0,0 +1,98 @@
+import math
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import broadcast
+from broadcast import DELTA, HEADER, KEY, StateBroadcaster, StreamView, decode, encode, quantize
+from world import World
+
+
+def moving_world():
+    world = World(640, 480, seed=3)
+    world.add_lights([100, 500, 320], [100, 380, 240], radius=17.3)
+    for i in range(6):
+        world.add_vehicle("vehicle4", 50 + 90 * i, 60 + 50 * i, heading=1.1 * i,
+                          mode="4a" if i % 2 else "4b", TURN_GAIN=0.3)
+    return world
+
+
+def assert_close_to(view, world):
+    # half a quantization step at most
+    v = world.vehicles
+    assert np.abs(view.vehicles["x"] - v["x"]).max() <= 0.5 * world.width / 65535 + 1e-9
+    assert np.abs(view.vehicles["y"] - v["y"]).max() <= 0.5 * world.height / 65535 + 1e-9
+    dh = (view.vehicles["heading"] - v["heading"] + math.pi) % (2 * math.pi) - math.pi
+    assert np.abs(dh).max() <= math.pi / 65536 + 1e-12
+    assert np.abs(view.vehicles["radius"] - v["radius"]).max() <= 0.5 / broadcast.RADIUS_SCALE
+    assert np.abs(view.lights["x"] - world.lights["x"]).max() <= 0.5 * world.width / 65535 + 1e-9
+    assert np.abs(view.lights["radius"] - world.lights["radius"]).max() <= 0.5 / broadcast.RADIUS_SCALE
+
+
+def test_delta_chain_reproduces_every_frame():
+    world = moving_world()
+    view = StreamView()
+    base = None
+    for t in range(200):
+        world.step()
+        qv, ql = quantize(world)
+        kind = KEY if base is None or t % 50 == 0 else DELTA
+        frame = encode(kind, world.step_count, world.width, world.height, qv, ql, base=base)
+        view.apply(frame)
+        step, width, height, dv, dl = decode(frame, base)
+        assert np.array_equal(dv, qv) and np.array_equal(dl, ql)
+        assert view.step_count == world.step_count
+        assert_close_to(view, world)
+        base = (qv, ql)
+
+
+def test_delta_wraps_around_uint16():
+    qv = np.array([[65535, 0, 65000, 100]], dtype=np.uint16)
+    ql = np.zeros((0, 3), dtype=np.uint16)
+    moved = np.array([[0, 65535, 10, 100]], dtype=np.uint16)
+    frame = encode(DELTA, 2, 10.0, 10.0, moved, ql, base=(qv, ql))
+    assert np.array_equal(decode(frame, (qv, ql))[3], moved)
+
+
+def test_delta_needs_a_matching_base():
+    world = moving_world()
+    qv, ql = quantize(world)
+    frame = encode(DELTA, 1, world.width, world.height, qv, ql, base=(qv, ql))
+    with pytest.raises(ValueError):
+        decode(frame)
+    with pytest.raises(ValueError):
+        decode(frame, (qv[:-1], ql))
+    with pytest.raises(ValueError):
+        decode(b"XXXX" + frame[4:])
+
+
+def test_broadcaster_sends_key_frames_on_join_and_shape_change():
+    world = moving_world()
+    caster = StateBroadcaster(world, port=0, rate=0, queue_size=64)
+    received = queue.Queue()
+    client = threading.Thread(target=lambda: [received.put(f) for f in broadcast.frames("127.0.0.1", caster.port)],
+                              daemon=True)
+    client.start()
+    try:
+        deadline = time.time() + 5.0
+        while caster.stats()["subscribers"] == 0:
+            assert time.time() < deadline
+            time.sleep(0.01)
+        view = StreamView()
+        kinds = []
+        for t in range(12):
+            world.step()
+            if t == 6:
+                world.add_light_at(320, 400)          # shape change: deltas cannot apply
+            caster.publish()
+            frame = received.get(timeout=5.0)
+            kinds.append(HEADER.unpack_from(frame)[2])
+            view.apply(frame)
+            assert_close_to(view, world)
+        assert kinds == [KEY] + [DELTA] * 5 + [KEY] + [DELTA] * 5
+    finally:
+        caster.close()
+    client.join(timeout=5.0)
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+import checkpoint
+from lightmotion import LightMotion
+from obstacles import Obstacles
+from transfer import TransferTable, bell_table
+from world import TRANSFER_BELL, TRANSFER_STEP, SensorRig, World
+
+
+def busy_world():
+    world = World(600, 400, seed=3, trail_len=300)
+    world.add_lights([150, 450, 300], [200, 200, 80])
+    for i in range(12):
+        world.add_vehicle("vehicle4", 40 + 45 * i, 60 + 25 * i, heading=0.5 * i,
+                          mode="4a" if i % 2 else "4b", NOISE=0.2)
+    world.add_vehicle("vehicle4", 300, 300, mode="aggressive", EMIT=1.0)
+    world.periodic = True
+    world.periodic_cutoff = 700.0
+    world.collisions = True
+    world.vehicle_sense_radius = 150.0
+    world.occlusion_min_intensity = 1e-4
+    world.obstacles = Obstacles([[(280, 150), (320, 150), (320, 250), (280, 250)]])
+    motion = LightMotion()
+    motion.set_orbit(0, 300, 200, 120, period=400)
+    motion.set_path(1, [(100, 100), (500, 100), (500, 300)], speed=1.5)
+    motion.set_pulse(2, amplitude=0.4, period=90)
+    world.light_motion = motion
+    world.transfer[TRANSFER_BELL] = bell_table(tolerance=1e-5)
+    world.add_rig(SensorRig([0.6, 0.0, -0.6], 20.0, [[0.0, 1.0], [0.5, 0.5], [1.0, 0.0]], fov=2.0), [2, 5])
+    return world
+
+
+def test_restore_continues_bit_for_bit(tmp_path):
+    world = busy_world()
+    world.run(150)
+    saver = checkpoint.Checkpointer(world, str(tmp_path), every=0)
+    saver.checkpoint()
+    saver.close()
+    world.run(200)
+
+    restored = checkpoint.restore(str(tmp_path))
+    restored.run(200)
+    assert restored.step_count == world.step_count
+    assert np.array_equal(restored.vehicles, world.vehicles)
+    assert np.array_equal(restored.lights, world.lights)
+    assert np.array_equal(restored.trail, world.trail, equal_nan=True)
+    assert np.array_equal(restored.light_strength, world.light_strength)
+    assert np.array_equal(restored.rigs[0][1].readings, world.rigs[0][1].readings)
+    assert restored.contacts == world.contacts
+
+
+def test_table_without_recipe_is_rejected(tmp_path):
+    world = busy_world()
+    world.transfer[TRANSFER_STEP] = TransferTable(np.tanh, (0.0, 2.0))
+    saver = checkpoint.Checkpointer(world, str(tmp_path), every=0)
+    with pytest.raises(ValueError):
+        saver.checkpoint()
+    saver.close()
+
+
+def test_rejected_checkpoint_leaves_the_next_one_whole(tmp_path):
+    world = busy_world()
+    world.run(50)
+    saver = checkpoint.Checkpointer(world, str(tmp_path), every=0)
+    world.transfer[TRANSFER_STEP] = TransferTable(np.tanh, (0.0, 2.0))
+    with pytest.raises(ValueError):
+        saver.checkpoint()
+    del world.transfer[TRANSFER_STEP]
+    saver.checkpoint()
+    saver.close()
+
+    restored = checkpoint.restore(str(tmp_path))
+    assert np.array_equal(restored.lights, world.lights)
+    assert np.array_equal(restored.vehicles, world.vehicles)
+    assert np.array_equal(restored.trail, world.trail, equal_nan=True)
@@ -0,0 +1,37 @@
+import numpy as np
+
+import collisions
+
+
+def test_vehicles_across_the_edge_are_separated():
+    x = np.array([2.0, 598.0, 300.0])
+    y = np.array([100.0, 101.0, 300.0])
+    radius = np.full(3, 10.0)
+    contacts = collisions.resolve_vehicle_collisions(x, y, radius, 600, 400)
+    assert contacts == 1
+    dx = (x[0] - x[1] + 300) % 600 - 300
+    assert np.hypot(dx, y[0] - y[1]) >= 20.0 - 1e-9
+    assert x[2] == 300.0
+
+
+def test_vehicle_is_pushed_out_of_a_light_across_the_edge():
+    x = np.array([595.0])
+    y = np.array([200.0])
+    radius = np.array([10.0])
+    lx, ly, lr = np.array([5.0]), np.array([200.0]), np.array([18.0])
+    grid = collisions.light_grid(lx, ly, lr, 10.0, 600, 400)
+    assert collisions.resolve_light_collisions(x, y, radius, lx, ly, lr, grid) == 1
+    assert abs((x[0] - lx[0] + 300) % 600 - 300) >= 28.0 - 1e-9
+
+
+def test_script_vehicle_meets_a_light_across_the_edge():
+    class Thing:
+        def __init__(self, x, y, radius):
+            self.x, self.y, self.radius = x, y, radius
+
+    vehicle = Thing(597.0, 200.0, 10.0)
+    light = Thing(5.0, 200.0, 18.0)
+    collisions.collide_with_lights(vehicle, [light])
+    assert vehicle.x == 597.0
+    collisions.collide_with_lights(vehicle, [light], 600, 400)
+    assert abs(vehicle.x - (605.0 - 28.0)) < 1e-9
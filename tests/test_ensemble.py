@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+import ensemble
+from world import World
+
+
+def straight_world():
+    # no lights and no noise: every vehicle drives straight at BASE_SPEED, across the edges
+    world = World(200, 150)
+    world.add_vehicle("vehicle4", 20, 30, heading=0.3, mode="4b", NOISE=0.0, BASE_SPEED=5.0)
+    world.add_vehicle("vehicle4", 180, 100, heading=-2.0, mode="4b", NOISE=0.0, BASE_SPEED=5.0)
+    return world
+
+
+def test_distance_is_not_inflated_by_wrapping():
+    result = ensemble.run_ensemble(straight_world(), 100, 1.0, ["distance"], batch=4, min_replicas=4)
+    assert result["converged"]
+    # 100 recorded positions, 99 moves of 5 px each
+    assert np.allclose(result["values"]["distance"], 99 * 5.0)
+
+
+def test_tolerance_for_an_unknown_metric_is_rejected():
+    with pytest.raises(ValueError, match="bogus"):
+        ensemble.run_ensemble(straight_world(), 10, {"distance": 1.0, "bogus": 1.0}, ["distance"])
+    with pytest.raises(ValueError, match="loops"):
+        ensemble.run_ensemble(straight_world(), 10, {"loops": 1.0}, ["distance"])
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import golden
+
+
+@pytest.fixture(scope="module")
+def goldens():
+    return golden.record_all(steps=300, vehicles=4)
+
+
+@pytest.mark.parametrize("engine", ["world", "compact"])
+def test_engines_follow_the_classes(goldens, engine):
+    reports = golden.check(goldens, golden.ENGINES[engine], atol=1e-6)
+    diverged = {key: r["step"] for key, r in reports.items() if r["step"] is not None}
+    assert not diverged
+    assert len(reports) == sum(len(case["modes"]) for case in golden.CASES.values())
+
+
+def test_compact_follows_the_classes_with_noise():
+    noisy = golden.record_all(["Garimav2", "vehicle4"], steps=200, vehicles=3, noise=True, seed=4)
+    reports = golden.check(noisy, golden.compact_engine, noise=True, seed=4, atol=1e-6)
+    assert all(r["step"] is None for r in reports.values())
+
+
+def test_divergence_is_reported_where_it_starts(goldens):
+    def late_nudge(case, mode, poses, lights, steps, noise=False, seed=0):
+        out = golden.world_engine(case, mode, poses, lights, steps, noise, seed)
+        out[100:, 2, 0] += 0.5
+        return out
+
+    reports = golden.check({key: goldens[key] for key in [("vehicle4", "4b")]}, late_nudge)
+    r = reports["vehicle4", "4b"]
+    assert (r["step"], r["vehicle"], r["diverged_vehicles"]) == (101, 2, 1)
+
+
+def test_save_and_load_round_trip(goldens, tmp_path):
+    path = str(tmp_path / "golden.npz")
+    golden.save(path, goldens, noise=False, seed=0)
+    loaded, noise, seed = golden.load(path)
+    assert (noise, seed) == (False, 0)
+    assert loaded.keys() == goldens.keys()
+    for key, arrays in goldens.items():
+        assert all(np.array_equal(a, b) for a, b in zip(arrays, loaded[key]))
@@ -0,0 +1,31 @@
+from lights import LightManager
+
+
+def test_removed_view_is_a_harmless_orphan():
+    manager = LightManager(800, 600)
+    a = manager.add_light_at(100, 100)
+    b = manager.add_light_at(200, 200)
+    manager.remove(a)
+    a.move_to((300, 300))
+    assert a.pos == (300.0, 300.0) and a.radius == 18
+    assert b.pos == (200.0, 200.0) and len(manager) == 1
+
+    manager.clear_all()
+    b.move_to((50, 60))
+    assert b.pos == (50.0, 60.0) and len(manager) == 0
+    c = manager.add_light_at(10, 10)
+    assert c.pos == (10.0, 10.0)
+
+
+def test_pos_follows_the_row():
+    manager = LightManager(800, 600)
+    views = [manager.add_light_at(10 * i, 20 * i) for i in range(10)]
+    views[4].x = 55
+    views[6].y = 66
+    views[8].move_to((80, 81))
+    manager.remove(views[2])                  # the last row moves into slot 2
+    manager.remove_nearest(0, 0)
+    for view in manager.get_lights():
+        assert view.pos == (view.x, view.y) == tuple(manager.xy[view._index])
+    assert views[4].pos == (55.0, 80.0) and views[6].pos == (60.0, 66.0)
+    assert views[9].pos == (90.0, 180.0)
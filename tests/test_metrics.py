@@ -0,0 +1,29 @@
+import math
+
+import numpy as np
+
+from metrics import BehaviorMetrics
+from world import World
+
+
+def test_distance_and_winding_ignore_the_wrap():
+    world = World(800, 600)
+    world.add_light_at(400, 300)
+    world.add_vehicle("vehicle2simple", 790, 50, heading=0.0, NOISE=0.0)
+    metrics = BehaviorMetrics(1, world.lights["x"], world.lights["y"])
+    speeds = []
+    for _ in range(20):
+        world.step()
+        metrics.update(world)
+        speeds.append(float(world.vehicles["v"][0]))
+    assert world.vehicles["x"][0] < 100              # it did cross the edge
+    # every step moves a vehicle by its speed; the first update only sets the start
+    assert math.isclose(metrics.distance[0], sum(speeds[1:]), rel_tol=1e-9)
+    assert abs(metrics.winding[0, 0]) < math.pi / 2
+
+
+def test_update_arrays_with_wrap():
+    metrics = BehaviorMetrics(1, [400.0], [300.0], wrap=(800, 600))
+    for x in np.arange(790.0, 820.0, 1.5) % 800:
+        metrics.update_arrays([x], [50.0], [1.5], [0.0])
+    assert math.isclose(metrics.distance[0], 1.5 * 19)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import scenario
+from obstacles import Obstacles
+from world import World
+
+
+def sample_world():
+    world = World(640, 480)
+    world.add_lights([120, 500, 320], [100, 380, 240])
+    world.add_vehicle("vehicle4", 200, 150, heading=0.7, mode="4b", TURN_GAIN=0.25)
+    world.add_vehicle("Garimav2", 400, 300, heading=-1.2, MOTOR_NOISE=0.0, radius=40)
+    world.add_vehicle("vehicle2coward", 50, 60, mode="simple")
+    world.obstacles = Obstacles([[(280, 150), (320, 150), (320, 250), (280, 250)]])
+    world.run(5)
+    return world
+
+
+def test_snapshot_round_trip(tmp_path):
+    world = sample_world()
+    path = str(tmp_path / "world.bvws")
+    scenario.save_snapshot(world, path)
+    loaded = scenario.load(path)
+    assert (loaded.width, loaded.height, loaded.step_count) == (640, 480, world.step_count)
+    assert np.array_equal(loaded.lights, world.lights)
+    assert np.array_equal(loaded.vehicles, world.vehicles)
+    assert np.array_equal(loaded.obstacles.polygons[0], world.obstacles.polygons[0])
+
+
+def test_scenario_round_trip(tmp_path):
+    world = sample_world()
+    path = str(tmp_path / "world.json")
+    scenario.save_scenario(world, path)
+    loaded = scenario.load(path)
+    assert (loaded.width, loaded.height) == (640, 480)
+    assert np.array_equal(loaded.lights, world.lights)
+    for name in ("x", "y", "heading", "mode", "radius", "sensor_dist", "TURN_GAIN", "NOISE",
+                 "falloff", "MAX_WHEEL_SPEED", "wiring", "transfer"):
+        assert np.array_equal(loaded.vehicles[name], world.vehicles[name]), name
+    assert np.array_equal(loaded.obstacles.polygons[0], world.obstacles.polygons[0])
+
+
+def test_script_params_pass_through_and_reject():
+    world = World(640, 480)
+    world.add_vehicle("vehicle4", 0, 0, TURN_GAIN=0.3, radius=30)
+    world.add_vehicle("vehicle4", 0, 0, EPS=2.0)
+    attrs = {"TURN_GAIN": "TURN_GAIN", "radius": "radius", "sensor_dist": "sensor_dist"}
+
+    params = scenario.script_params(world.vehicles[0], "vehicle4", attrs)
+    assert params == {"TURN_GAIN": 0.3, "radius": 30.0, "sensor_dist": 66.0}
+    with pytest.raises(ValueError):
+        scenario.script_params(world.vehicles[1], "vehicle4", attrs)
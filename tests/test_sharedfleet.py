@@ -0,0 +1,50 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+from sharedfleet import FleetReader, SharedFleet
+from world import World
+
+
+def fleet_world():
+    world = World(600, 400, seed=1)
+    world.add_lights([200, 400], [200, 200])
+    for i in range(8):
+        world.add_vehicle("Garimav2", 50 + 60 * i, 100 + 20 * i, heading=0.3 * i)
+    return world
+
+
+def test_run_steps_the_shared_rows():
+    world = fleet_world()
+    with SharedFleet(world, workers=2) as fleet:
+        fleet.run(20)
+        reader = FleetReader(fleet.names, fleet.counts)
+        x = reader.read(lambda v, L: v["x"].copy())
+        reader.close()
+        assert fleet.step_count == 20
+        assert np.isfinite(x).all() and not np.array_equal(x, world.vehicles["x"])
+
+
+def test_failing_worker_raises_and_frees_the_memory():
+    world = fleet_world()
+    world.periodic = True
+    world.periodic_cutoff = math.nan          # math.ceil(nan) raises in the workers' first step
+    fleet = SharedFleet(world, workers=2)
+    names = list(fleet.names.values())
+    with pytest.raises(RuntimeError, match="fleet-"):
+        fleet.run(5)
+    fleet.close()
+    for name in names:
+        assert not os.path.exists(f"/dev/shm/{name.lstrip('/')}")
+
+
+def test_killed_worker_raises():
+    fleet = SharedFleet(fleet_world(), workers=2)
+    fleet.run(2)
+    fleet._procs[1].kill()
+    with pytest.raises(RuntimeError, match="fleet-1"):
+        fleet.run(5)
+    with pytest.raises(RuntimeError):
+        fleet.run(1)
@@ -0,0 +1,55 @@
+import numpy as np
+
+from spatial import SpatialHash
+from world import World
+
+
+def test_move_matches_a_fresh_build():
+    rng = np.random.default_rng(0)
+    for periodic in (False, True):
+        grid = SpatialHash(30, 600, 400, periodic=periodic)
+        fresh = SpatialHash(30, 600, 400, periodic=periodic)
+        x = rng.uniform(0, 600, 2000)
+        y = rng.uniform(0, 400, 2000)
+        grid.build(x, y)
+        for _ in range(20):
+            moved = rng.choice(len(x), 100, replace=False)
+            x[moved] = np.clip(x[moved] + rng.normal(0, 20, 100), 0, 599)
+            y[moved] = np.clip(y[moved] + rng.normal(0, 20, 100), 0, 399)
+            grid.move(moved, x, y)
+            fresh.build(x, y)
+            assert np.array_equal(grid.order, fresh.order)
+            assert np.array_equal(grid.starts, fresh.starts)
+
+
+def test_move_wraps_positions_on_a_torus():
+    grid = SpatialHash(30, 600, 400, periodic=True)
+    fresh = SpatialHash(30, 600, 400, periodic=True)
+    x = np.array([100.0, 300.0, 500.0])
+    y = np.array([50.0, 200.0, 350.0])
+    grid.build(x, y)
+    x[1] = -300.0
+    y[2] = 420.0
+    grid.move([1, 2], x, y)
+    fresh.build(x % 600, y % 400)
+    assert np.array_equal(grid.order, fresh.order)
+    assert np.array_equal(grid.starts, fresh.starts)
+
+
+def test_light_moved_off_the_torus_still_collides():
+    contacts = []
+    for moved in (False, True):
+        world = World(600, 400)
+        world.add_lights([100.0], [200.0])
+        world.add_vehicle("vehicle4", 300, 200, NOISE=0.0, BASE_SPEED=0.0, MOTOR_GAIN=0.0)
+        world.collisions = True
+        world.step()
+        if moved:
+            world.move_lights([0], [-300.0], [200.0])
+        else:
+            world = World(600, 400, world.lights.copy(), world.vehicles.copy())
+            world.collisions = True
+            world.lights["x"] = -300.0
+        world.step()
+        contacts.append(world.contacts)
+    assert contacts == [1, 1]
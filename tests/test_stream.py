@@ -0,0 +1,68 @@
+import io
+
+import numpy as np
+
+from metrics import BehaviorMetrics
+from stream import Recorder, drain, every, measure, pipeline, record, simulate, tap, until
+from world import World
+
+
+def small_world():
+    world = World(400, 300, seed=2)
+    world.add_lights([150, 250], [150, 150])
+    for i in range(3):
+        world.add_vehicle("Garimav2", 60 + 100 * i, 80, heading=0.5 * i)
+    return world
+
+
+def test_stages_filter_stop_and_observe():
+    world = small_world()
+    seen = []
+    last = drain(pipeline(simulate(world, steps=100),
+                          every(5),
+                          tap(lambda s: seen.append(s.step)),
+                          until(lambda s: s.step >= 40)))
+    assert seen == list(range(5, 41, 5))
+    assert last.step == 40
+    assert world.step_count == 40                 # nothing is stepped past the stop
+
+    exclusive = drain(pipeline(simulate(small_world(), steps=100), until(lambda s: s.step == 7, False)))
+    assert exclusive.step == 6
+
+
+def test_measure_matches_metrics_fed_by_hand():
+    world = small_world()
+    streamed = BehaviorMetrics(3, world.lights["x"], world.lights["y"])
+    drain(pipeline(simulate(world, steps=50), measure(streamed)))
+
+    other = small_world()
+    direct = BehaviorMetrics(3, other.lights["x"], other.lights["y"])
+    for _ in range(50):
+        other.step()
+        direct.update(other)
+    assert np.array_equal(streamed.distance, direct.distance)
+    assert np.array_equal(streamed.nearest_min, direct.nearest_min)
+
+
+def test_recorder_ring_keeps_the_last_steps_oldest_first():
+    out = io.BytesIO()
+    recorder = Recorder(out, fields=("x", "y"), last=4)
+    xs = []
+    drain(pipeline(simulate(small_world(), steps=10),
+                   tap(lambda s: xs.append(s.x.astype(np.float32))),
+                   record(recorder)))
+    steps, rows = recorder.frames()
+    assert list(steps) == [7, 8, 9, 10]
+    assert rows.shape == (4, 3, 2)
+    assert np.array_equal(rows[:, :, 0], np.stack(xs[-4:]))
+
+    written = np.frombuffer(out.getvalue(), dtype=np.float32).reshape(10, 3, 2)
+    assert np.array_equal(written[:, :, 0], np.stack(xs))
+
+
+def test_recorder_before_the_ring_fills():
+    recorder = Recorder(fields=("x",), last=8)
+    drain(pipeline(simulate(small_world(), steps=3), tap(recorder)))
+    steps, rows = recorder.frames()
+    assert list(steps) == [1, 2, 3]
+    assert rows.shape == (3, 3, 1)
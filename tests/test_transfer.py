@@ -0,0 +1,35 @@
+import numpy as np
+
+from transfer import bell_table
+from world import TRANSFER_BELL, TRANSFER_LINEAR, SensorRig, World
+
+
+def drives(world, transfer):
+    v = world.vehicles
+    I = np.array([[0.2, 0.5]] * len(v))
+    return world._drive(v, I, np.array([transfer] * len(v)))
+
+
+def test_table_applies_per_sensor_code():
+    world = World(600, 400)
+    world.add_vehicle("vehicle4", 100, 100, mode="4a")
+    world.add_vehicle("vehicle4", 200, 100, mode="aggressive")
+    built_in = drives(world, [TRANSFER_BELL, TRANSFER_LINEAR])
+    world.transfer[TRANSFER_BELL] = bell_table(tolerance=1e-9)
+    tabled = drives(world, [TRANSFER_BELL, TRANSFER_LINEAR])
+    # bell sensors follow the table whatever the mode, linear ones keep MOTOR_GAIN * I
+    assert np.allclose(tabled[:, 0], built_in[:, 0], atol=1e-7)
+    assert np.array_equal(tabled[:, 1], built_in[:, 1])
+    assert tabled[1, 0] != world.vehicles["MOTOR_GAIN"][1] * 0.2
+
+
+def test_rig_bell_sensors_use_the_table():
+    world = World(600, 400)
+    world.add_light_at(300, 200)
+    world.add_vehicle("vehicle4", 250, 200, mode="aggressive", NOISE=0.0)
+    rig = SensorRig([0.5, -0.5], 20.0, [[0.0, 1.0], [1.0, 0.0]], transfer=TRANSFER_BELL)
+    world.add_rig(rig, [0])
+    plain = world._rig_commands(np.array([0]), rig)[0]
+    world.transfer[TRANSFER_BELL] = bell_table(tolerance=1e-9)
+    tabled = world._rig_commands(np.array([0]), rig)[0]
+    assert np.allclose(plain, tabled, atol=1e-7)
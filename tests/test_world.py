@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+import pytest
+
+from world import MODE_WIRING, SensorRig, World
+
+
+def brute_force(world, sensors, cutoff):
+    """Sum gain / (d^2 + eps) over every periodic image of every light, one by one."""
+    v = world.vehicles
+    out = np.zeros(sensors.shape[:2])
+    for i in range(sensors.shape[0]):
+        gain = float(v["INTENSITY_GAIN"][i])
+        eps = float(v["EPS"][i])
+        for k in range(sensors.shape[1]):
+            sx, sy = sensors[i, k]
+            for L in world.lights:
+                images = []
+                for a in range(-3, 4):
+                    for b in range(-3, 4):
+                        dx = float(L["x"]) + a * world.width - sx
+                        dy = float(L["y"]) + b * world.height - sy
+                        images.append(dx * dx + dy * dy)
+                if cutoff is None:
+                    d2s = [min(images)]
+                else:
+                    d2s = [d2 for d2 in images if d2 <= cutoff * cutoff]
+                out[i, k] += sum(gain / (d2 + eps) for d2 in d2s)
+    return out
+
+
+def test_periodic_sensing_matches_a_brute_force_sum():
+    rng = np.random.default_rng(5)
+    world = World(300, 200)
+    world.add_lights(rng.uniform(0, 300, 6), rng.uniform(0, 200, 6))
+    for x, y in zip(rng.uniform(0, 300, 8), rng.uniform(0, 200, 8)):
+        world.add_vehicle("vehicle4", x, y, heading=rng.uniform(-math.pi, math.pi))
+    world.periodic = True
+    sensors = world.sensor_positions()
+
+    # minimum image only
+    assert np.allclose(world.sense(), brute_force(world, sensors, None), rtol=1e-12)
+    # every image within the cutoff (larger than the half diagonal, so it holds the nearest one)
+    world.periodic_cutoff = 450.0
+    assert np.allclose(world.sense(), brute_force(world, sensors, 450.0), rtol=1e-12)
+
+
+def rig_world(mode, emit):
+    world = World(900, 700, seed=1)
+    world.add_lights([330, 570, 450], [350, 350, 200])
+    rng = np.random.default_rng(3)
+    for i in range(20):
+        world.add_vehicle("vehicle4", rng.uniform(0, 900), rng.uniform(0, 700), rng.uniform(-3, 3),
+                          mode=mode, EMIT=emit if i % 3 == 0 else 0.0)
+    return world
+
+
+@pytest.mark.parametrize("mode", ["coward", "aggressive", "lover", "explorer", "4a", "4b"])
+@pytest.mark.parametrize("emit", [0.0, 0.5])
+def test_rig_with_the_mode_wiring_drives_like_the_mode(mode, emit):
+    plain = rig_world(mode, emit)
+    rigged = rig_world(mode, emit)
+    v = rigged.vehicles
+    angle = v["sensor_angle"][0]
+    wiring, transfer = MODE_WIRING[mode]
+    rig = SensorRig([angle, -angle], v["sensor_dist"][0], np.array(wiring).T, transfer=transfer)
+    rows = np.arange(0, 20, 2)
+    rigged.add_rig(rig, rows)
+    plain.run(100)
+    rigged.run(100)
+    for name in ("x", "y", "heading", "left_w", "right_w", "v", "omega"):
+        assert np.array_equal(plain.vehicles[name], rigged.vehicles[name]), name
+    # rig vehicles keep their readings in the rig
+    assert np.array_equal(rig.readings[:, 0], plain.vehicles["left_I"][rows])
+    assert np.array_equal(rig.readings[:, 1], plain.vehicles["right_I"][rows])
+
+
+def test_rig_field_of_view_hides_lights_behind():
+    world = World(100, 100)
+    world.add_light_at(50, 50)
+    world.add_vehicle("vehicle4", 20, 50, heading=0.0)       # facing the light
+    world.add_vehicle("vehicle4", 20, 50, heading=math.pi)   # facing away
+    narrow = SensorRig([0.0], [0.0], [[1.0, 1.0]], fov=0.1)
+    world.add_rig(narrow, [0, 1])
+    world.step()
+    assert narrow.readings[0, 0] > 0.0
+    assert narrow.readings[1, 0] == 0.0
+
+    # an omnidirectional sensor at the same spot sees the light either way
+    seen = world.sense(np.array([[[20.0, 50.0]], [[20.0, 50.0]]]), [0, 1])
+    assert seen[0, 0] == seen[1, 0] > 0.0
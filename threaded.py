@@ -0,0 +1,225 @@
+"""
+Simulation and rendering on separate threads.
+
+SimulationThread steps a World in the background as fast as it can (or at a
+fixed rate). Whenever the renderer has taken the last published frame, the
+simulation copies the state it needs for drawing into the back buffer of a
+double-buffered Snapshot pair and swaps it to the front. The renderer draws the
+front snapshot at its own frame rate and never touches the World itself.
+
+Edits go the other way as commands: the UI calls sim.send("add_light_at", x, y)
+and the simulation thread applies it between two steps.
+
+NumPy releases the GIL inside its larger array operations, so the two threads
+overlap best for big fleets.
+
+    python threaded.py my_scene.json
+"""
+
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+import render
+
+
+# World methods the UI may call through send()
+COMMANDS = ("add_light_at", "add_lights", "move_lights", "remove_lights", "set_mode", "clear_trail")
+
+
+class Snapshot:
+    """What the renderer needs of a World; quacks like one for render.draw_world."""
+
+    def __init__(self):
+        self.step_count = 0
+        self.width = 0
+        self.height = 0
+        self.lights = None
+        self.vehicles = None
+        self.sensors = None
+        self.trail = None
+        self.trail_len = 0
+        self.trail_head = 0
+        self.obstacles = None
+
+    def fill(self, world):
+        # copy into the arrays already held when the shapes still match
+        self.step_count = world.step_count
+        self.width = world.width
+        self.height = world.height
+        self.lights = _copy_into(self.lights, world.lights)
+        self.vehicles = _copy_into(self.vehicles, world.vehicles)
+        self.sensors = _copy_into(self.sensors, world.sensor_positions())
+        self.trail = _copy_into(self.trail, world.trail)
+        self.trail_len = world.trail_len
+        self.trail_head = world.trail_head
+        self.obstacles = world.obstacles
+
+    def sensor_positions(self):
+        return self.sensors
+
+    def trail_points(self, index):
+        pts = np.roll(self.trail[index], -self.trail_head, axis=0)
+        return pts[~np.isnan(pts[:, 0])]
+
+
+def _copy_into(buffer, source):
+    if buffer is None or buffer.shape != source.shape or buffer.dtype != source.dtype:
+        return source.copy()
+    np.copyto(buffer, source)
+    return buffer
+
+
+class SimulationThread:
+    def __init__(self, world, steps_per_second=None, dt=1.0):
+        self.world = world
+        self.steps_per_second = steps_per_second
+        self.dt = dt
+        self.steps_done = 0
+
+        self._buffers = [Snapshot(), Snapshot()]
+        self._front = 0
+        self._fresh = False            # front holds a frame the renderer has not taken yet
+        self._reading = None           # index of the buffer the renderer is drawing
+        self._lock = threading.Condition()
+        self._commands = queue.SimpleQueue()
+        self._running = False
+        self._error = None
+        self._buffers[0].fill(world)
+        self._thread = None
+
+    # ---------- UI side ----------
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="simulation", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("simulation thread failed") from self._error
+
+    def send(self, command, *args, **kwargs):
+        """Queue a World method call (one of COMMANDS) for the simulation thread."""
+        if command not in COMMANDS:
+            raise ValueError(f"unknown command {command!r}")
+        self._commands.put((command, args, kwargs))
+
+    def acquire(self):
+        """The newest snapshot; the simulation will not overwrite it until release()."""
+        with self._lock:
+            self._reading = self._front
+            self._fresh = False
+            return self._buffers[self._front]
+
+    def release(self):
+        with self._lock:
+            self._reading = None
+            self._lock.notify_all()
+
+    # ---------- simulation thread ----------
+
+    def _run(self):
+        world = self.world
+        next_step = time.perf_counter()
+        try:
+            while self._running:
+                while True:
+                    try:
+                        command, args, kwargs = self._commands.get_nowait()
+                    except queue.Empty:
+                        break
+                    getattr(world, command)(*args, **kwargs)
+
+                world.step(self.dt)
+                self.steps_done += 1
+
+                with self._lock:
+                    publish = not self._fresh
+                if publish:
+                    self._publish()
+
+                if self.steps_per_second:
+                    next_step += 1.0 / self.steps_per_second
+                    delay = next_step - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_step = time.perf_counter()
+        except Exception as exc:
+            self._error = exc
+            self._running = False
+
+    def _publish(self):
+        back = 1 - self._front
+        with self._lock:
+            # the back buffer may still be the one the renderer is drawing
+            while self._reading == back and self._running:
+                self._lock.wait(0.1)
+            if self._reading == back:
+                return
+        self._buffers[back].fill(self.world)
+        with self._lock:
+            self._front = back
+            self._fresh = True
+
+
+def main(scenario_path):
+    import pygame
+
+    import scenario
+
+    world = scenario.load(scenario_path)
+    pygame.init()
+    screen = pygame.display.set_mode((int(world.width), int(world.height)))
+    pygame.display.set_caption("Threaded simulation")
+    font = pygame.font.SysFont(None, 20)
+    clock = pygame.time.Clock()
+    renderer = render.LodRenderer()
+
+    sim = SimulationThread(world)
+    sim.start()
+    last_steps, last_time, rate = 0, time.perf_counter(), 0.0
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                sim.send("add_light_at", *event.pos)
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+                lights = sim.acquire().lights
+                try:
+                    if len(lights):
+                        d = np.hypot(lights["x"] - event.pos[0], lights["y"] - event.pos[1])
+                        sim.send("remove_lights", int(np.argmin(d)))
+                finally:
+                    sim.release()
+
+        now = time.perf_counter()
+        if now - last_time >= 0.5:
+            rate = (sim.steps_done - last_steps) / (now - last_time)
+            last_steps, last_time = sim.steps_done, now
+
+        snap = sim.acquire()
+        try:
+            hud = [f"step {snap.step_count}   {rate:.0f} steps/s   {clock.get_fps():.0f} fps",
+                   "L-click: add light   R-click: remove nearest light"]
+            renderer.draw(screen, snap, hud=hud, font=font)
+        finally:
+            sim.release()
+        pygame.display.flip()
+        clock.tick(60)
+
+    sim.stop()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
@@ -0,0 +1,120 @@
+"""
+Tabulated sensor-to-motor transfer functions.
+
+A TransferTable samples a function once on a uniform grid and afterwards
+evaluates it for a whole array of readings with one gather and one linear
+interpolation. The grid is refined until the interpolation error, checked
+halfway between samples, is below `tolerance`. Readings outside the table's
+domain take the value at the nearest end.
+
+A table built from a parameterized function (e.g. the 4a bell with mu_4a and
+sigma_4a) rebuilds itself when set_params() / sync() see new parameter values.
+
+    table = bell_table(mu=0.35, sigma=0.18, tolerance=1e-5)
+    world.transfer[TRANSFER_BELL] = table     # world.World uses it for every bell sensor
+"""
+
+import math
+
+import numpy as np
+
+
+MAX_SIZE = 1 << 22
+
+
+class TransferTable:
+    def __init__(self, func, domain, tolerance=1e-6, fields=None, **params):
+        """
+        func(x, **params): vectorized function to tabulate.
+        domain: (lo, hi), or a function of **params returning it.
+        fields: {param name: vehicle field} read by sync() from vehicle rows.
+        """
+        self.func = func
+        self.domain = domain
+        self.tolerance = tolerance
+        self.fields = dict(fields or {})
+        self.params = params
+        self.builds = 0
+        # name in RECIPES of the builder that made this table, so it can be rebuilt (checkpoints)
+        self.recipe = None
+        self._build()
+
+    def _build(self):
+        lo, hi = self.domain(**self.params) if callable(self.domain) else self.domain
+        lo, hi = float(lo), float(hi)
+        if hi <= lo:
+            hi = lo + 1.0
+        n = 33
+        while True:
+            xs = np.linspace(lo, hi, n)
+            ys = np.asarray(self.func(xs, **self.params), dtype=float)
+            mids = 0.5 * (xs[:-1] + xs[1:])
+            err = np.max(np.abs(self.func(mids, **self.params) - 0.5 * (ys[:-1] + ys[1:])))
+            if err <= self.tolerance or n >= MAX_SIZE:
+                break
+            n = 2 * n - 1          # keeps the old samples, halves the spacing
+        self.lo = lo
+        self.hi = hi
+        self.inv_step = (n - 1) / (hi - lo)
+        self.values = ys
+        self.slopes = np.append(np.diff(ys), 0.0)
+        self.error = float(err)
+        self.builds += 1
+
+    def __len__(self):
+        return len(self.values)
+
+    def __call__(self, x):
+        u = (np.asarray(x, dtype=float) - self.lo) * self.inv_step
+        u = np.clip(u, 0.0, len(self.values) - 1)
+        i = u.astype(np.intp)
+        return self.values[i] + (u - i) * self.slopes[i]
+
+    def set_params(self, **params):
+        """Rebuild if any parameter changed; returns True when it did."""
+        new = dict(self.params, **params)
+        if new == self.params:
+            return False
+        self.params = new
+        self._build()
+        return True
+
+    def sync(self, rows):
+        """Take the parameters from vehicle rows (which must all agree)."""
+        params = {}
+        for name, field in self.fields.items():
+            values = rows[field]
+            if len(values) == 0:
+                return False
+            if np.any(values != values[0]):
+                raise ValueError(f"one table cannot serve different {field} values")
+            params[name] = float(values[0])
+        return self.set_params(**params)
+
+
+# ---------- the vehicles' own mappings ----------
+
+def _bell(x, mu, sigma):
+    return np.exp(-((x - mu) ** 2) / (2.0 * sigma * sigma))
+
+
+def bell_table(mu=0.35, sigma=0.18, tolerance=1e-6):
+    """Vehicle 4a bell exp(-(I - mu)^2 / (2 sigma^2)), following mu_4a / sigma_4a."""
+    def domain(mu, sigma):
+        # beyond mu +- reach the bell is below the tolerance
+        reach = sigma * math.sqrt(2.0 * math.log(1.0 / tolerance)) if tolerance < 1 else sigma
+        return max(0.0, mu - reach), mu + reach
+
+    table = TransferTable(_bell, domain, tolerance, fields={"mu": "mu_4a", "sigma": "sigma_4a"},
+                          mu=mu, sigma=sigma)
+    table.recipe = "bell"
+    return table
+
+
+# builder(tolerance=..., **params) by recipe name
+RECIPES = {"bell": bell_table}
+
+
+def from_recipe(recipe, tolerance, params):
+    """Rebuild a table from its recipe name, tolerance and parameters."""
+    return RECIPES[recipe](tolerance=tolerance, **params)
@@ -2,6 +2,8 @@ import pygame
 import math
 import random
 
+from lights import LightManager as ArrayLightManager
+
 pygame.init()
 
 WIDTH, HEIGHT = 800, 600
@@ -13,75 +15,22 @@ FPS = 60
 
 font = pygame.font.SysFont("consolas", 16)
 
-class Light:
-    def __init__(self, x, y, radius=20):
-        self.x = x
-        self.y = y
-        self.radius = radius
-
-    def move_to(self, pos):
-        self.x, self.y = pos
-
-    @property
-    def pos(self):
-        return (self.x, self.y)
-
-    def draw(self, surface):
-        pygame.draw.circle(surface, (255, 255, 0), (int(self.x), int(self.y)), self.radius)
-        pygame.draw.circle(surface, (0, 0, 0), (int(self.x), int(self.y)), self.radius, 2)
-
-
-class LightManager:
+class LightManager(ArrayLightManager):
     """Helper class to manage multiple steady light sources."""
 
     def __init__(self):
-        self.lights = []
+        super().__init__(WIDTH, HEIGHT, radius=20, margin=50)
         self.reset_defaults()
 
     def reset_defaults(self):
-        self.lights.clear()
+        self.clear_all()
         cx, cy = WIDTH // 2, HEIGHT // 2
         spread = 150
         # four default lights around the center
-        self.lights.append(Light(cx - spread, cy))
-        self.lights.append(Light(cx + spread, cy))
-        self.lights.append(Light(cx, cy - spread))
-        self.lights.append(Light(cx, cy + spread))
-
-    def add_light_at(self, x, y, radius=20):
-        self.lights.append(Light(x, y, radius))
-
-    def add_random_light(self, radius=20):
-        x = random.randint(50, WIDTH - 50)
-        y = random.randint(50, HEIGHT - 50)
-        self.add_light_at(x, y, radius)
-
-    def move_nearest(self, x, y, threshold_factor=2.0):
-        if not self.lights:
-            return False
-        nearest = min(self.lights, key=lambda L: (L.x - x) ** 2 + (L.y - y) ** 2)
-        dist_sq = (nearest.x - x) ** 2 + (nearest.y - y) ** 2
-        if dist_sq <= (nearest.radius * threshold_factor) ** 2:
-            nearest.move_to((x, y))
-            return True
-        return False
-
-    def remove_nearest(self, x, y, threshold_factor=2.0):
-        if not self.lights:
-            return False
-        nearest = min(self.lights, key=lambda L: (L.x - x) ** 2 + (L.y - y) ** 2)
-        dist_sq = (nearest.x - x) ** 2 + (nearest.y - y) ** 2
-        if dist_sq <= (nearest.radius * threshold_factor) ** 2:
-            self.lights.remove(nearest)
-            return True
-        return False
-
-    def draw(self, surface):
-        for light in self.lights:
-            light.draw(surface)
-
-    def get_lights(self):
-        return self.lights
+        self.add_light_at(cx - spread, cy)
+        self.add_light_at(cx + spread, cy)
+        self.add_light_at(cx, cy - spread)
+        self.add_light_at(cx, cy + spread)
 
 
 
@@ -1,6 +1,15 @@
 import pygame
 import math
 import random
+import sys
+import time
+
+import collisions
+import heatmap
+import scenario
+from governor import FrameGovernor
+from lights import LightManager as ArrayLightManager
+from world import MODES
 
 
 pygame.init()
@@ -14,74 +23,18 @@ font = pygame.font.SysFont("consolas", 16)
 
 
 
-class Light:
-    def __init__(self, x, y, radius=18):
-        self.x = x
-        self.y = y
-        self.radius = radius
-
-    @property
-    def pos(self):
-        return (self.x, self.y)
-
-    def move_to(self, pos):
-        self.x, self.y = pos
-
-    def draw(self, surf):
-        pygame.draw.circle(surf, (255, 255, 0), (int(self.x), int(self.y)), self.radius)
-        pygame.draw.circle(surf, (0, 0, 0), (int(self.x), int(self.y)), self.radius, 2)
-
-
-class LightManager:
+class LightManager(ArrayLightManager):
     def __init__(self):
-        self.lights = []
+        super().__init__(WIDTH, HEIGHT, radius=18, margin=60)
         self.reset_defaults()
 
     def reset_defaults(self):
         """Two lights around center (good for figure-8 / peanut trajectories)."""
-        self.lights.clear()
+        self.clear_all()
         cx, cy = WIDTH // 2, HEIGHT // 2
         spread = 120
-        self.lights.append(Light(cx - spread, cy))
-        self.lights.append(Light(cx + spread, cy))
-
-    def clear_all(self):
-        self.lights.clear()
-
-    def add_light_at(self, x, y, radius=18):
-        self.lights.append(Light(x, y, radius))
-
-    def add_random_light(self, radius=18):
-        x = random.randint(60, WIDTH - 60)
-        y = random.randint(60, HEIGHT - 60)
-        self.add_light_at(x, y, radius)
-
-    def _nearest(self, x, y):
-        if not self.lights:
-            return None, None
-        nearest = min(self.lights, key=lambda L: (L.x - x) ** 2 + (L.y - y) ** 2)
-        dist_sq = (nearest.x - x) ** 2 + (nearest.y - y) ** 2
-        return nearest, dist_sq
-
-    def move_nearest_or_add(self, x, y, threshold_factor=2.0):
-        """If click is near a light, move that light; else add a new one."""
-        nearest, dist_sq = self._nearest(x, y)
-        if nearest is not None and dist_sq <= (nearest.radius * threshold_factor) ** 2:
-            nearest.move_to((x, y))
-        else:
-            self.add_light_at(x, y)
-
-    def remove_nearest(self, x, y, threshold_factor=2.0):
-        nearest, dist_sq = self._nearest(x, y)
-        if nearest is not None and dist_sq <= (nearest.radius * threshold_factor) ** 2:
-            self.lights.remove(nearest)
-
-    def draw(self, surf):
-        for L in self.lights:
-            L.draw(surf)
-
-    def get_lights(self):
-        return self.lights
+        self.add_light_at(cx - spread, cy)
+        self.add_light_at(cx + spread, cy)
 
 
 # ------------------------ Vehicle 4 ------------------------
@@ -141,6 +94,15 @@ class Vehicle4:
         self.trail = []
         self.max_trail_len = 2000
 
+        # bump into lights instead of driving through them
+        self.collide_lights = False
+
+        # rendered HUD lines, reused on frames that skip re-rendering them
+        self._hud = None
+
+        # sense the wrapped world as a torus: use the nearest copy of each light
+        self.periodic = False
+
     # ---------- geometry helpers ----------
 
     def _sensor_positions(self):
@@ -167,6 +129,9 @@ class Vehicle4:
         lx, ly = light_pos
         dx = lx - px
         dy = ly - py
+        if self.periodic:
+            dx -= WIDTH * round(dx / WIDTH)
+            dy -= HEIGHT * round(dy / HEIGHT)
         d2 = dx * dx + dy * dy
         eps = 1.0
         I = self.INTENSITY_GAIN / (d2 + eps)
@@ -253,6 +218,9 @@ class Vehicle4:
         self.x += self.v * math.cos(self.heading) * dt
         self.y += self.v * math.sin(self.heading) * dt
 
+        if self.collide_lights:
+            collisions.collide_with_lights(self, lights, WIDTH, HEIGHT)
+
         # wrap world
         self.x %= WIDTH
         self.y %= HEIGHT
@@ -264,9 +232,10 @@ class Vehicle4:
 
     # ---------- drawing ----------
 
-    def draw(self, surf, light_count):
+    def draw(self, surf, light_count, trail=True, hud=True):
+        """trail=False skips the trail; hud=False reuses the HUD text rendered last time."""
         # trail first
-        if len(self.trail) > 2:
+        if trail and len(self.trail) > 2:
             pygame.draw.lines(surf, (180, 180, 180), False,
                               [(int(px), int(py)) for (px, py) in self.trail], 2)
 
@@ -290,18 +259,25 @@ class Vehicle4:
         t2 = f"Lights: {light_count}   L-click: move / add   R-click: remove   [C] reset   [N] random   [X] clear all"
         t3 = f"I_L={self.left_I:.3f}  I_R={self.right_I:.3f}"
         t4 = f"vL={self.left_w:.2f}  vR={self.right_w:.2f}  v={self.v:.2f}"
-        t5 = f"turn={self.omega:.4f} rad/frame"
+        t5 = (f"turn={self.omega:.4f} rad/frame   [K] collide with lights: {'on' if self.collide_lights else 'off'}"
+              f"   [P] periodic sensing: {'on' if self.periodic else 'off'}")
 
-        surf.blit(font.render(t1, True, (0, 0, 0)), (10, 10))
-        surf.blit(font.render(t2, True, (0, 0, 0)), (10, 30))
-        surf.blit(font.render(t3, True, (0, 0, 0)), (10, 50))
-        surf.blit(font.render(t4, True, (0, 0, 0)), (10, 70))
-        surf.blit(font.render(t5, True, (0, 0, 0)), (10, 90))
+        if hud or self._hud is None:
+            self._hud = [font.render(t, True, (0, 0, 0)) for t in (t1, t2, t3, t4, t5)]
+        for i, text in enumerate(self._hud):
+            surf.blit(text, (10, 10 + 20 * i))
+
+
+# scenario fields the class keeps as attributes; scenarios changing any other
+# tunable are rejected (see scenario.script_params)
+SCENARIO_PARAMS = {name: name for name in (
+    "radius", "sensor_angle", "sensor_dist", "INTENSITY_GAIN", "BASE_SPEED", "MOTOR_GAIN",
+    "MAX_WHEEL_SPEED", "TURN_GAIN", "NOISE", "mu_4a", "sigma_4a", "low_4b", "high_4b")}
 
 
 # ------------------------ main loop ------------------------
 
-def main():
+def main(scenario_path=None):
     light_manager = LightManager()
 
     vehicle = Vehicle4(
@@ -311,6 +287,26 @@ def main():
         mode="4a",
     )
 
+    if scenario_path:
+        # lights and the first vehicle's pose, mode and params come from the scenario file
+        world = scenario.load(scenario_path)
+        light_manager.load_lights(world.lights)
+        if len(world.vehicles):
+            row = world.vehicles[0]
+            vehicle.x, vehicle.y, vehicle.heading = float(row["x"]), float(row["y"]), float(row["heading"])
+            for name, value in scenario.script_params(row, "vehicle4", SCENARIO_PARAMS).items():
+                setattr(vehicle, name, value)
+            if MODES[row["mode"]] in ("4a", "4b"):
+                vehicle.set_mode(MODES[row["mode"]])
+
+    overlay = heatmap.IntensityOverlay(WIDTH, HEIGHT, gain=vehicle.INTENSITY_GAIN,
+                                       reference=vehicle.mu_4a)
+    dragged = None               # light held by the mouse
+    # drops trail and HUD refreshes while frames run over budget, see governor.py
+    governor = FrameGovernor(budget_ms=1000.0 / FPS)
+    frames = 0
+    hint = None
+
     running = True
     while running:
         dt = clock.tick(FPS) / 60.0
@@ -323,8 +319,16 @@ def main():
                 mx, my = event.pos
                 if event.button == 1:        # left -> move nearest or add
                     light_manager.move_nearest_or_add(mx, my)
+                    dragged, _ = light_manager._nearest(mx, my)
                 elif event.button == 3:      # right -> remove nearest
-                    light_manager.remove_nearest(mx, my)
+                    if light_manager.remove_nearest(mx, my):
+                        dragged = None
+
+            if event.type == pygame.MOUSEMOTION and dragged is not None:
+                dragged.move_to(event.pos)
+
+            if event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                dragged = None
 
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_1:
@@ -338,23 +342,46 @@ def main():
                 elif event.key == pygame.K_c:
                     light_manager.reset_defaults()
                     vehicle.clear_trail()
+                    dragged = None
                 elif event.key == pygame.K_n:
                     light_manager.add_random_light()
+                elif event.key == pygame.K_k:
+                    vehicle.collide_lights = not vehicle.collide_lights
+                elif event.key == pygame.K_p:
+                    vehicle.periodic = not vehicle.periodic
+                elif event.key == pygame.K_h:
+                    overlay.toggle()
                 elif event.key == pygame.K_x:
                     light_manager.clear_all()
+                    dragged = None
                     vehicle.clear_trail()
 
+        start = time.perf_counter()
         lights = light_manager.get_lights()
         vehicle.update(lights, dt=1.0)
+        mid = time.perf_counter()
 
         screen.fill((255, 255, 255))
+        overlay.periodic = vehicle.periodic
+        overlay.update(light_manager.xy, dragging=dragged is not None)
+        overlay.draw(screen)
         light_manager.draw(screen)
-        vehicle.draw(screen, len(lights))
-
+        refresh = frames % governor.hud_every == 0
+        vehicle.draw(screen, len(lights), trail=governor.trails, hud=refresh)
+        if refresh or hint is None:
+            text = f"[H] intensity heatmap: {'on' if overlay.visible else 'off'}   (drag lights with the left button)"
+            if governor.level:
+                text += "   " + governor.hud_line()
+            hint = font.render(text, True, (0, 0, 0))
+        screen.blit(hint, (10, 110))
+
+        if governor.frame((mid - start) * 1000.0, (time.perf_counter() - mid) * 1000.0):
+            frames = -1                # show the new level right away
+        frames += 1
         pygame.display.flip()
 
     pygame.quit()
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
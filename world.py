@@ -0,0 +1,727 @@
+"""
+Array-backed world for headless runs of many vehicles and lights.
+
+The pygame scripts keep one Python object per light and per vehicle. Here the
+whole world lives in two NumPy structured arrays (one row per light, one row
+per vehicle) so that it can be loaded from a snapshot in one read and stepped
+for the whole fleet at once.
+
+Every vehicle row carries the same tunables as the class it comes from
+(INTENSITY_GAIN, MOTOR_GAIN, BASE_SPEED, ...), and `mode` selects the wiring:
+
+    'v1'          VehicleOne        (one front sensor, speed ~ intensity)
+    'simple'      VehicleTwoSimple  (linear falloff, same-side)
+    'coward'      Vehicle 2a        (same-side excitatory)
+    'aggressive'  Vehicle 2b        (crossed excitatory)
+    'lover'       Vehicle 3a        (same-side inhibitory)
+    'explorer'    Vehicle 3b        (crossed inhibitory)
+    '4a' / '4b'   Vehicle 4         (crossed, bell / threshold mapping)
+
+Internally every mode is just a wiring: a per-sensor transfer function (linear,
+bell, threshold) feeding a 2x2 sensor-to-motor matrix (same-side or crossed,
+excitatory or inhibitory), see MODE_WIRING. The matrices live in each vehicle
+row, so a vehicle can also be given any custom wiring, and a mixed fleet computes
+all wheel commands with one batched matrix product.
+
+A vehicle with EMIT > 0 carries its own light, which every other vehicle senses
+through its usual intensity model, as if it were one more light of that strength.
+"""
+
+import math
+
+import numpy as np
+
+import collisions
+from spatial import SpatialHash
+
+
+MODES = ("v1", "simple", "coward", "aggressive", "lover", "explorer", "4a", "4b")
+MODE_CODES = {name: code for code, name in enumerate(MODES)}
+
+# sensor falloff models
+FALLOFF_INVERSE_SQUARE = 0     # gain / (d^2 + eps)
+FALLOFF_LINEAR = 1             # (range - d) / range, zero beyond range
+
+EXPLORER_GAIN = 2.0            # fixed gain of the 3b wiring (see vehicle 3.py)
+
+# per-sensor transfer functions f(I), the motor drive before wiring
+TRANSFER_LINEAR = 0            # MOTOR_GAIN * I
+TRANSFER_FIXED = 1             # EXPLORER_GAIN * I
+TRANSFER_BELL = 2              # MOTOR_GAIN * exp(-(I - mu_4a)^2 / (2 sigma_4a^2))
+TRANSFER_STEP = 3              # MOTOR_GAIN * (0, 0.5 or 1 at low_4b / high_4b)
+
+_SAME = ((1.0, 0.0), (0.0, 1.0))
+_CROSSED = ((0.0, 1.0), (1.0, 0.0))
+_NEG_SAME = ((-1.0, 0.0), (0.0, -1.0))
+_NEG_CROSSED = ((0.0, -1.0), (-1.0, 0.0))
+
+# mode -> (wiring matrix, transfer function); wheel = BASE_SPEED + wiring @ f(sensors),
+# rows are (left, right) wheels, columns (left, right) sensors
+MODE_WIRING = {
+    "v1": (_SAME, TRANSFER_LINEAR),
+    "simple": (_SAME, TRANSFER_LINEAR),
+    "coward": (_SAME, TRANSFER_LINEAR),
+    "aggressive": (_CROSSED, TRANSFER_LINEAR),
+    "lover": (_NEG_SAME, TRANSFER_LINEAR),
+    "explorer": (_NEG_CROSSED, TRANSFER_FIXED),
+    "4a": (_CROSSED, TRANSFER_BELL),
+    "4b": (_CROSSED, TRANSFER_STEP),
+}
+
+LIGHT_DTYPE = np.dtype([
+    ("x", "<f8"),
+    ("y", "<f8"),
+    ("radius", "<f8"),
+])
+
+VEHICLE_DTYPE = np.dtype([
+    # pose
+    ("x", "<f8"),
+    ("y", "<f8"),
+    ("heading", "<f8"),
+    ("radius", "<f8"),
+    ("mode", "<i4"),
+    ("falloff", "<i4"),
+    # geometry
+    ("sensor_angle", "<f8"),
+    ("sensor_dist", "<f8"),
+    # intensity model
+    ("INTENSITY_GAIN", "<f8"),
+    ("EPS", "<f8"),
+    ("I_MAX", "<f8"),
+    ("I_MAX_SUM", "<f8"),
+    ("MAX_SENSOR_RANGE", "<f8"),
+    # motors / kinematics
+    ("BASE_SPEED", "<f8"),
+    ("MOTOR_GAIN", "<f8"),
+    ("MIN_WHEEL_SPEED", "<f8"),
+    ("MAX_WHEEL_SPEED", "<f8"),
+    ("TURN_GAIN", "<f8"),
+    ("NOISE", "<f8"),
+    # strength of the light the vehicle carries itself (0 = none)
+    ("EMIT", "<f8"),
+    # vehicle 4
+    ("mu_4a", "<f8"),
+    ("sigma_4a", "<f8"),
+    ("low_4b", "<f8"),
+    ("high_4b", "<f8"),
+    # wiring: sensor-to-motor matrix and per-sensor transfer function (see MODE_WIRING)
+    ("wiring", "<f8", (2, 2)),
+    ("transfer", "<i4", (2,)),
+    # debug / last step
+    ("left_I", "<f8"),
+    ("right_I", "<f8"),
+    ("left_w", "<f8"),
+    ("right_w", "<f8"),
+    ("v", "<f8"),
+    ("omega", "<f8"),
+])
+
+# Defaults of each script's vehicle class, keyed by the script name.
+# Sensor geometry is stored as (angle in radians, distance as a multiple of radius,
+# extra distance) so that it scales with the radius like in the classes.
+PRESETS = {
+    "vehicle1": dict(
+        mode="v1", radius=20, sensor_angle=0.0, sensor_scale=1.0, sensor_extra=5.0,
+        INTENSITY_GAIN=5000.0, EPS=0.0, I_MAX=1.0, I_MAX_SUM=1.0,
+        BASE_SPEED=-0.1, MOTOR_GAIN=5.0, MIN_WHEEL_SPEED=0.0, MAX_WHEEL_SPEED=math.inf,
+        TURN_GAIN=0.0, NOISE=0.0,
+    ),
+    "multiplelight": dict(
+        mode="v1", radius=20, sensor_angle=0.0, sensor_scale=1.0, sensor_extra=5.0,
+        INTENSITY_GAIN=5000.0, EPS=0.0, I_MAX=1.0, I_MAX_SUM=1.0,
+        BASE_SPEED=-0.1, MOTOR_GAIN=5.0, MIN_WHEEL_SPEED=0.0, MAX_WHEEL_SPEED=math.inf,
+        TURN_GAIN=0.0, NOISE=0.05,
+    ),
+    "vehicle2coward": dict(
+        mode="simple", radius=25, sensor_angle=math.radians(25), sensor_scale=1.2,
+        falloff=FALLOFF_LINEAR, I_MAX=1.0, MAX_SENSOR_RANGE=250.0,
+        BASE_SPEED=0.0, MOTOR_GAIN=4.0, TURN_GAIN=0.06, NOISE=0.0,
+    ),
+    "vehicle2simple": dict(
+        mode="coward", radius=25, sensor_angle=math.radians(55), sensor_scale=1.8,
+        INTENSITY_GAIN=800.0, EPS=1.0, I_MAX=1.5, I_MAX_SUM=3.0,
+        BASE_SPEED=1.5, MOTOR_GAIN=6.0, MIN_WHEEL_SPEED=-8.0, MAX_WHEEL_SPEED=8.0,
+        TURN_GAIN=0.06, NOISE=0.4,
+    ),
+    "Garimav2": dict(
+        mode="coward", radius=30, sensor_angle=math.radians(50), sensor_scale=1.6,
+        INTENSITY_GAIN=800.0, EPS=1.0, I_MAX=1.5, I_MAX_SUM=3.0,
+        BASE_SPEED=1.4, MOTOR_GAIN=6.0, MIN_WHEEL_SPEED=-7.0, MAX_WHEEL_SPEED=7.0,
+        TURN_GAIN=0.055, NOISE=0.3,
+    ),
+    "vehicle3": dict(
+        mode="lover", radius=25, sensor_angle=math.radians(55), sensor_scale=1.8,
+        INTENSITY_GAIN=800.0, EPS=1.0, I_MAX=1.5, I_MAX_SUM=3.0,
+        BASE_SPEED=1.8, MOTOR_GAIN=5.0, MIN_WHEEL_SPEED=0.0, MAX_WHEEL_SPEED=8.0,
+        TURN_GAIN=0.06, NOISE=0.2,
+    ),
+    "vehicle4": dict(
+        mode="4a", radius=22, sensor_angle=math.radians(55), sensor_scale=2.2,
+        INTENSITY_GAIN=800.0, EPS=1.0,
+        BASE_SPEED=0.2, MOTOR_GAIN=9.0, MIN_WHEEL_SPEED=-10.0, MAX_WHEEL_SPEED=10.0,
+        TURN_GAIN=0.18, NOISE=0.02,
+        mu_4a=0.35, sigma_4a=0.18, low_4b=0.15, high_4b=0.40,
+    ),
+}
+
+# names used by the classes that differ from the array field names
+PARAM_ALIASES = {
+    "MOTOR_NOISE": "NOISE",
+    "sensor_offset_angle": "sensor_angle",
+    "sensor_distance": "sensor_dist",
+    "MAX_INTENSITY": "I_MAX",
+}
+
+# fields every preset starts from before its own values are applied
+_FIELD_DEFAULTS = dict(
+    falloff=FALLOFF_INVERSE_SQUARE, INTENSITY_GAIN=800.0, EPS=1.0,
+    I_MAX=math.inf, I_MAX_SUM=math.inf, MAX_SENSOR_RANGE=math.inf,
+    MIN_WHEEL_SPEED=-math.inf, MAX_WHEEL_SPEED=math.inf,
+    mu_4a=0.35, sigma_4a=0.18, low_4b=0.15, high_4b=0.40,
+)
+
+def falloff_intensity(dx, dy, gain, eps, i_max, linear=None, sensor_range=None):
+    """
+    Intensity of one source seen from offset (dx, dy), clamped to [0, i_max].
+
+    All arguments broadcast against each other. `linear` marks entries using the
+    linear falloff of VehicleTwoSimple instead of gain / (d^2 + eps).
+    """
+    d2 = dx * dx + dy * dy
+    den = d2 + eps
+    shape = np.broadcast_shapes(den.shape, np.shape(gain))
+    I = np.divide(gain, den, out=np.full(shape, np.inf), where=den > 0)
+    if linear is not None:
+        dist = np.hypot(dx, dy)
+        with np.errstate(invalid="ignore"):       # inf range of the non-linear entries
+            lin = np.maximum(sensor_range - dist, 0.0) / sensor_range * i_max
+        I = np.where(linear, lin, I)
+    return np.clip(I, 0.0, i_max)
+
+
+def _exp(x):
+    """math.exp over a 1-D array, bit for bit what the scalar classes compute."""
+    return np.fromiter(map(math.exp, x.tolist()), dtype=float, count=len(x))
+
+
+# the block size keeps the (vehicles x sensors x lights) temporaries around 16 MB
+_SENSE_BLOCK = 1 << 20
+
+
+def vehicle_row(preset, x, y, heading=0.0, mode=None, **params):
+    """Build one VEHICLE_DTYPE row from a preset name plus overrides."""
+    if preset not in PRESETS:
+        raise ValueError(f"unknown vehicle preset {preset!r}")
+    spec = dict(_FIELD_DEFAULTS)
+    spec.update(PRESETS[preset])
+    radius = params.pop("radius", spec.pop("radius"))
+    scale = spec.pop("sensor_scale")
+    extra = spec.pop("sensor_extra", 0.0)
+    spec["sensor_dist"] = radius * scale + extra
+    spec["mode"] = MODE_CODES[mode if mode is not None else spec["mode"]]
+    spec["wiring"], spec["transfer"] = MODE_WIRING[MODES[spec["mode"]]]
+
+    for name, value in params.items():
+        name = PARAM_ALIASES.get(name, name)
+        if name not in VEHICLE_DTYPE.names:
+            raise ValueError(f"unknown vehicle parameter {name!r}")
+        spec[name] = MODE_CODES[value] if name == "mode" and isinstance(value, str) else value
+
+    row = np.zeros(1, dtype=VEHICLE_DTYPE)
+    row["x"] = x
+    row["y"] = y
+    row["heading"] = heading
+    row["radius"] = radius
+    for name, value in spec.items():
+        row[name] = value
+    return row
+
+
+def wire_by_mode(rows):
+    """Fill the wiring and transfer fields of vehicle rows from their modes (in place)."""
+    for name, (wiring, transfer) in MODE_WIRING.items():
+        sel = rows["mode"] == MODE_CODES[name]
+        rows["wiring"][sel] = wiring
+        rows["transfer"][sel] = transfer
+
+
+class SensorRig:
+    """
+    A sensor array shared by a group of vehicles: K sensors feeding two motors.
+
+    angles (radians from the heading) and distances (pixels from the center) place
+    the sensors; fov is each sensor's full field of view in radians (2*pi or more
+    sees all around); weights is the K x 2 sensor-to-(left, right)-motor matrix;
+    transfer holds the per-sensor TRANSFER_* codes. With angles (a, -a), the
+    vehicle's sensor_dist, fov 2*pi and weights = wiring.T a rig drives a vehicle
+    exactly like its mode does.
+    """
+
+    def __init__(self, angles, distances, weights, fov=None, transfer=TRANSFER_LINEAR):
+        self.angles = np.asarray(angles, dtype=float).ravel()
+        k = len(self.angles)
+        self.distances = np.broadcast_to(np.asarray(distances, dtype=float), (k,)).copy()
+        self.weights = np.asarray(weights, dtype=float).reshape(k, 2)
+        fov = 2.0 * math.pi if fov is None else fov
+        self.fov = np.broadcast_to(np.asarray(fov, dtype=float), (k,)).copy()
+        self.transfer = np.broadcast_to(np.asarray(transfer, dtype=np.int32), (k,)).copy()
+        self.readings = None           # (vehicles, K) intensities of the last step
+
+    def __len__(self):
+        return len(self.angles)
+
+    def place(self, v):
+        """
+        Sensor coordinates (vehicles, K, xy) for vehicle rows v, and the field-of-view
+        test: unit facing vectors fx, fy and cos(fov / 2), each (vehicles, K, 1).
+        """
+        lx = np.cos(self.angles) * self.distances
+        ly = np.sin(self.angles) * self.distances
+        ch = np.cos(v["heading"])[:, None]
+        sh = np.sin(v["heading"])[:, None]
+        out = np.empty((len(v), len(self), 2))
+        out[:, :, 0] = v["x"][:, None] + ch * lx - sh * ly
+        out[:, :, 1] = v["y"][:, None] + sh * lx + ch * ly
+        if (self.fov >= 2.0 * math.pi).all():
+            return out, None
+        facing = v["heading"][:, None] + self.angles
+        # omnidirectional sensors never reject a light
+        cos_half = np.where(self.fov >= 2.0 * math.pi, -np.inf, np.cos(0.5 * self.fov))
+        fov = (np.cos(facing)[:, :, None], np.sin(facing)[:, :, None],
+               np.broadcast_to(cos_half[None, :, None], facing.shape + (1,)))
+        return out, fov
+
+
+class World:
+    """All lights and vehicles of one simulation, stored as arrays."""
+
+    def __init__(self, width=800, height=600, lights=None, vehicles=None, seed=None,
+                 trail_len=0):
+        self.width = width
+        self.height = height
+        self.lights = np.zeros(0, dtype=LIGHT_DTYPE) if lights is None else lights
+        self.vehicles = np.zeros(0, dtype=VEHICLE_DTYPE) if vehicles is None else vehicles
+        self.rng = np.random.default_rng(seed)
+        self.step_count = 0
+        # bumped on every light edit so caches (and checkpoints) know when to refresh
+        self.lights_version = 0
+        # bumped only when lights are added or removed; plain moves are tracked by index
+        # so spatial indexes can update just those lights
+        self.lights_layout = 0
+        self._moved_lights = []
+        # optional per-light intensity factor (pulsing lights); None means all 1
+        self.light_strength = None
+        # optional lightmotion.LightMotion, advanced at the start of every step
+        self.light_motion = None
+
+        # periodic: sense the torus the vehicles actually live on (minimum-image
+        # distances), optionally summing further periodic images up to periodic_cutoff
+        self.periodic = False
+        self.periodic_cutoff = None
+
+        # vehicles with EMIT > 0 are sensed by the others up to this distance
+        self.vehicle_sense_radius = 200.0
+        self._grid = None
+
+        # optional circle collisions (vehicle-vehicle and vehicle-light)
+        self.collisions = False
+        self.contacts = 0                # collision and obstacle contacts of the last step
+        self._collision_grid = None
+        self._light_grid = None
+        self._light_grid_key = None
+
+        # optional obstacles.Obstacles: they block light and keep vehicles out
+        self.obstacles = None
+        # sensor-light pairs at or below this intensity skip the line-of-sight test
+        # (0.0 tests every lit pair; raise it to trade exactness for speed)
+        self.occlusion_min_intensity = 0.0
+
+        # bit_exact: evaluate the 4a bell with math.exp like the script classes; np.exp
+        # may differ in the last bit, which 4a orbits amplify (golden.py turns this on)
+        self.bit_exact = False
+
+        # optional transfer.TransferTable per TRANSFER_* code, replacing that function for
+        # every sensor with the code: f(I) = MOTOR_GAIN * table(I) (wiring stays as it is)
+        self.transfer = {}
+
+        # (vehicle indices, SensorRig) groups driven by a sensor array instead of
+        # their two standard sensors, see add_rig
+        self.rigs = []
+
+        # trail: ring buffer of the last trail_len positions, shape (vehicles, trail_len, xy)
+        self.trail_len = trail_len
+        self.trail = np.full((len(self.vehicles), trail_len, 2), np.nan, dtype=np.float32)
+        self.trail_head = 0
+
+    # ---------- building ----------
+
+    def add_light_at(self, x, y, radius=18):
+        row = np.array([(x, y, radius)], dtype=LIGHT_DTYPE)
+        self.lights = np.concatenate([self.lights, row])
+        self._lights_changed()
+
+    def add_lights(self, xs, ys, radius=18):
+        rows = np.zeros(len(xs), dtype=LIGHT_DTYPE)
+        rows["x"] = xs
+        rows["y"] = ys
+        rows["radius"] = radius
+        self.lights = np.concatenate([self.lights, rows])
+        self._lights_changed()
+
+    def remove_lights(self, indices):
+        indices = np.atleast_1d(np.asarray(indices, dtype=np.intp))
+        self.lights = np.delete(self.lights, indices)
+        if self.light_strength is not None:
+            self.light_strength = np.delete(self.light_strength, indices)
+        if self.light_motion is not None:
+            self.light_motion.remove(indices)
+        self._lights_changed()
+
+    def _lights_changed(self):
+        self.lights_version += 1
+        self.lights_layout += 1
+        self._moved_lights = []
+        if self.light_strength is not None:
+            grow = len(self.lights) - len(self.light_strength)
+            self.light_strength = np.concatenate([self.light_strength, np.ones(grow)])
+
+    def move_lights(self, indices, xs, ys):
+        """Move some lights; caches then update only for these."""
+        indices = np.asarray(indices, dtype=np.intp)
+        self.lights["x"][indices] = xs
+        self.lights["y"][indices] = ys
+        self.lights_version += 1
+        self._moved_lights.append(indices)
+
+    def add_vehicle(self, preset, x, y, heading=0.0, mode=None, **params):
+        row = vehicle_row(preset, x, y, heading, mode, **params)
+        self.vehicles = np.concatenate([self.vehicles, row])
+        empty = np.full((1, self.trail_len, 2), np.nan, dtype=np.float32)
+        self.trail = np.concatenate([self.trail, empty])
+        return len(self.vehicles) - 1
+
+    def add_rig(self, rig, indices):
+        """Drive these vehicles by a SensorRig; BASE_SPEED, MOTOR_GAIN and clamps still apply."""
+        indices = np.atleast_1d(np.asarray(indices, dtype=np.intp))
+        for rows, _ in self.rigs:
+            if np.isin(indices, rows).any():
+                raise ValueError("vehicle already has a sensor rig")
+        self.rigs.append((indices, rig))
+
+    def set_mode(self, mode, index=None):
+        rows = slice(None) if index is None else index
+        wiring, transfer = MODE_WIRING[mode]
+        self.vehicles["mode"][rows] = MODE_CODES[mode]
+        self.vehicles["wiring"][rows] = wiring
+        self.vehicles["transfer"][rows] = transfer
+
+    def clear_trail(self):
+        self.trail[:] = np.nan
+        self.trail_head = 0
+
+    def set_trail_len(self, trail_len):
+        """Resize the trail ring buffer (emptying it); everything else is kept."""
+        self.trail_len = trail_len
+        self.trail = np.full((len(self.vehicles), trail_len, 2), np.nan, dtype=np.float32)
+        self.trail_head = 0
+
+    def trail_points(self, index):
+        """Trail of one vehicle, oldest point first, without the unfilled slots."""
+        pts = np.roll(self.trail[index], -self.trail_head, axis=0)
+        return pts[~np.isnan(pts[:, 0])]
+
+    # ---------- geometry ----------
+
+    def sensor_positions(self):
+        """Return sensor coordinates as an array of shape (vehicles, 2 sensors, xy)."""
+        v = self.vehicles
+        a = v["sensor_angle"]
+        d = v["sensor_dist"]
+        # same rotate-then-translate arithmetic as the classes, so results match bit for bit
+        lx = np.cos(a) * d
+        ly = np.sin(a) * d
+        ch = np.cos(v["heading"])
+        sh = np.sin(v["heading"])
+        out = np.empty((len(v), 2, 2))
+        # left sensor at local (lx, ly), right sensor mirrored at (lx, -ly)
+        out[:, 0, 0] = v["x"] + ch * lx - sh * ly
+        out[:, 0, 1] = v["y"] + sh * lx + ch * ly
+        out[:, 1, 0] = v["x"] + ch * lx - sh * -ly
+        out[:, 1, 1] = v["y"] + sh * lx + ch * -ly
+        return out
+
+    # ---------- sensing ----------
+
+    def _light_intensity(self, v, dx, dy):
+        """Per-light intensity for sensor offsets dx, dy of shape (block, sensors, lights)."""
+        f = (slice(None), None, None)
+        linear = v["falloff"] == FALLOFF_LINEAR
+        return falloff_intensity(dx, dy, v["INTENSITY_GAIN"][f], v["EPS"][f], v["I_MAX"][f],
+                                 linear[f] if linear.any() else None, v["MAX_SENSOR_RANGE"][f])
+
+    def _vehicle_light_intensity(self, sensors, rows=None, fov=None):
+        """
+        Summed intensity of the lights carried by other vehicles (EMIT > 0).
+
+        Only emitters within vehicle_sense_radius of a sensor are considered,
+        found through a spatial hash rebuilt every step.
+        """
+        v = self.vehicles
+        n, k = sensors.shape[:2]
+        total = np.zeros(n * k)
+        emitters = np.flatnonzero(v["EMIT"] > 0)
+        if len(emitters) == 0:
+            return total.reshape(n, k)
+
+        ex = v["x"][emitters]
+        ey = v["y"][emitters]
+        radius = self.vehicle_sense_radius
+        if (self._grid is None or self._grid.cell_size != radius
+                or self._grid.periodic != self.periodic):
+            self._grid = SpatialHash(radius, self.width, self.height, periodic=self.periodic)
+        self._grid.build(ex, ey)
+
+        sx = sensors[:, :, 0].ravel()
+        sy = sensors[:, :, 1].ravel()
+        if self.periodic:
+            # sensors poke out over the edge; look them up where they wrap to
+            q, e = self._grid.candidate_pairs(sx % self.width, sy % self.height, radius)
+        else:
+            q, e = self._grid.candidate_pairs(sx, sy, radius)
+        owner = q // k if rows is None else rows[q // k]
+        src = emitters[e]
+        dx = ex[e] - sx[q]
+        dy = ey[e] - sy[q]
+        if self.periodic:
+            self._minimum_image(dx, dy)
+        keep = (owner != src) & (dx * dx + dy * dy <= radius * radius)
+        q, owner, src, dx, dy = q[keep], owner[keep], src[keep], dx[keep], dy[keep]
+        if fov is not None:
+            fx, fy, cos_half = (a.ravel()[q] for a in fov)
+            seen = dx * fx + dy * fy >= cos_half * np.hypot(dx, dy)
+            q, owner, src, dx, dy = q[seen], owner[seen], src[seen], dx[seen], dy[seen]
+        if self.obstacles:
+            visible = ~self.obstacles.occluded(sx[q], sy[q], sx[q] + dx, sy[q] + dy)
+            q, owner, src, dx, dy = q[visible], owner[visible], src[visible], dx[visible], dy[visible]
+
+        linear = v["falloff"][owner] == FALLOFF_LINEAR
+        I = falloff_intensity(dx, dy, v["INTENSITY_GAIN"][owner], v["EPS"][owner], v["I_MAX"][owner],
+                              linear if linear.any() else None, v["MAX_SENSOR_RANGE"][owner])
+        total += np.bincount(q, weights=I * v["EMIT"][src], minlength=n * k)
+        return total.reshape(n, k)
+
+    def _periodic_images(self):
+        """Offsets of the extra periodic images within periodic_cutoff (minimum image excluded)."""
+        if not self.periodic or not self.periodic_cutoff:
+            return []
+        kx = int(math.ceil(self.periodic_cutoff / self.width))
+        ky = int(math.ceil(self.periodic_cutoff / self.height))
+        return [(i * self.width, j * self.height)
+                for i in range(-kx, kx + 1) for j in range(-ky, ky + 1) if i or j]
+
+    def _minimum_image(self, dx, dy):
+        dx -= self.width * np.round(dx / self.width)
+        dy -= self.height * np.round(dy / self.height)
+
+    def _lit(self, v, sx, sy, dx, dy, cutoff=None, fov=None):
+        """
+        Summed light seen by one block of sensors, with occlusion, an optional
+        distance cutoff and optional fields of view (see SensorRig.place).
+        """
+        I = self._light_intensity(v, dx, dy)
+        if self.light_strength is not None:
+            I *= self.light_strength
+        if cutoff is not None:
+            I[dx * dx + dy * dy > cutoff * cutoff] = 0.0
+        if fov is not None:
+            fx, fy, cos_half = fov
+            I[dx * fx + dy * fy < cos_half * np.hypot(dx, dy)] = 0.0
+        if self.obstacles:
+            b, k, m = np.nonzero(I > self.occlusion_min_intensity)
+            x0 = sx[b, k, 0]
+            y0 = sy[b, k, 0]
+            hidden = self.obstacles.occluded(x0, y0, x0 + dx[b, k, m], y0 + dy[b, k, m])
+            I[b[hidden], k[hidden], m[hidden]] = 0.0
+        return I.sum(axis=2)
+
+    def sense(self, sensors=None, rows=None, fov=None):
+        """
+        Summed intensity at every sensor, shape (vehicles, sensors).
+
+        By default the two standard sensors of all vehicles; otherwise sensor
+        coordinates (vehicles, K, xy) of the vehicles `rows` (indices, all if None)
+        with optional fields of view as returned by SensorRig.place.
+        """
+        v = self.vehicles if rows is None else self.vehicles[rows]
+        if sensors is None:
+            sensors = self.sensor_positions()
+        n, k = sensors.shape[:2]
+        total = np.zeros((n, k))
+        lx = self.lights["x"]
+        ly = self.lights["y"]
+        if n and len(lx):
+            images = self._periodic_images()
+            block = max(1, _SENSE_BLOCK // (k * len(lx) * (len(images) + 1)))
+            for s in range(0, n, block):
+                e = min(n, s + block)
+                sx = sensors[s:e, :, 0, None]
+                sy = sensors[s:e, :, 1, None]
+                dx = lx[None, None, :] - sx
+                dy = ly[None, None, :] - sy
+                if self.periodic:
+                    # nearest copy of every light on the torus
+                    self._minimum_image(dx, dy)
+                view = None if fov is None else tuple(a[s:e] for a in fov)
+                total[s:e] = self._lit(v[s:e], sx, sy, dx, dy, fov=view)
+                for ox, oy in images:
+                    total[s:e] += self._lit(v[s:e], sx, sy, dx + ox, dy + oy, self.periodic_cutoff, view)
+        if n:
+            total += self._vehicle_light_intensity(sensors, rows, fov)
+        return np.minimum(total, v["I_MAX_SUM"][:, None])
+
+    # ---------- sensor -> motor ----------
+
+    def _wheel_commands(self, I):
+        """Raw (left, right) wheel speeds before noise and clamping."""
+        v = self.vehicles
+        f = self._drive(v, I, v["transfer"])
+        # all wirings at once: wheels = base + W @ f
+        return v["BASE_SPEED"][:, None] + np.matmul(v["wiring"], f[:, :, None])[:, :, 0]
+
+    def _rig_commands(self, rows, rig):
+        """Raw wheel speeds of the vehicles `rows` driven by `rig`, and their readings."""
+        v = self.vehicles[rows]
+        sensors, fov = rig.place(v)
+        I = self.sense(sensors, rows, fov)
+        f = self._drive(v, I, np.broadcast_to(rig.transfer, I.shape))
+        return v["BASE_SPEED"][:, None] + f @ rig.weights, I
+
+    def _drive(self, v, I, transfer):
+        """Per-sensor transfer functions f(I) of rows v; I and transfer are (rows, sensors)."""
+        gain = np.broadcast_to(v["MOTOR_GAIN"][:, None], I.shape)
+
+        # per-sensor transfer functions
+        f = gain * I
+        fixed = transfer == TRANSFER_FIXED
+        f[fixed] = EXPLORER_GAIN * I[fixed]
+
+        bell = transfer == TRANSFER_BELL
+        if bell.any() and TRANSFER_BELL not in self.transfer:
+            r, k = np.nonzero(bell)
+            mu = v["mu_4a"][r]
+            sigma = v["sigma_4a"][r]
+            exp = _exp if self.bit_exact else np.exp
+            f[r, k] = gain[r, k] * exp(-((I[r, k] - mu) ** 2) / (2.0 * sigma * sigma))
+
+        step = transfer == TRANSFER_STEP
+        if step.any() and TRANSFER_STEP not in self.transfer:
+            r, k = np.nonzero(step)
+            Ib = I[r, k]
+            level = np.where(Ib < v["low_4b"][r], 0.0, np.where(Ib < v["high_4b"][r], 0.5, 1.0))
+            f[r, k] = gain[r, k] * level
+
+        # tabulated mappings replace the built-in function of every sensor with their code
+        for code, table in self.transfer.items():
+            tab = transfer == code
+            if tab.any():
+                table.sync(v[tab.any(axis=1)])
+                f[tab] = gain[tab] * table(I[tab])
+        return f
+
+    # ---------- dynamics ----------
+
+    def step(self, dt=1.0):
+        self.contacts = 0
+        if self.light_motion is not None:
+            self.light_motion.advance(self, self.step_count * dt)
+
+        v = self.vehicles
+        n = len(v)
+        if n == 0:
+            self.step_count += 1
+            return
+
+        if self.rigs:
+            # rig vehicles skip the standard sensors; their rows are overwritten below
+            plain = np.ones(n, dtype=bool)
+            for rows, _ in self.rigs:
+                plain[rows] = False
+            plain = np.flatnonzero(plain)
+            I = np.zeros((n, 2))
+            I[plain] = self.sense(self.sensor_positions()[plain], plain)
+        else:
+            I = self.sense()
+        v["left_I"] = I[:, 0]
+        v["right_I"] = I[:, 1]
+
+        raw = self._wheel_commands(I)
+        for rows, rig in self.rigs:
+            raw[rows], rig.readings = self._rig_commands(rows, rig)
+
+        noise = v["NOISE"][:, None]
+        draws = self.rng.uniform(-1.0, 1.0, size=(n, 2)) * noise
+        v1 = v["mode"] == MODE_CODES["v1"]
+        # VehicleOne jitters its heading instead of its wheels
+        wheel_noise = np.where(v1[:, None], 0.0, draws)
+        raw += wheel_noise
+
+        wheels = np.clip(raw, v["MIN_WHEEL_SPEED"][:, None], v["MAX_WHEEL_SPEED"][:, None])
+        v["left_w"] = wheels[:, 0]
+        v["right_w"] = wheels[:, 1]
+
+        v["v"] = 0.5 * (wheels[:, 0] + wheels[:, 1])
+        v["omega"] = (wheels[:, 1] - wheels[:, 0]) * v["TURN_GAIN"]
+
+        v["heading"] += v["omega"] * dt + np.where(v1, draws[:, 0], 0.0)
+        v["x"] += v["v"] * np.cos(v["heading"]) * dt
+        v["y"] += v["v"] * np.sin(v["heading"]) * dt
+
+        if self.collisions:
+            self._resolve_collisions()
+        elif self._moved_lights:
+            # no grid is kept up to date; build it afresh when collisions come back on
+            self._moved_lights = []
+            self._light_grid_key = None
+        if self.obstacles:
+            self.contacts += self.obstacles.push_out(v["x"], v["y"], v["radius"])
+
+        # wrap world
+        v["x"] %= self.width
+        v["y"] %= self.height
+
+        if self.trail_len:
+            self.trail[:, self.trail_head, 0] = v["x"]
+            self.trail[:, self.trail_head, 1] = v["y"]
+            self.trail_head = (self.trail_head + 1) % self.trail_len
+
+        self.step_count += 1
+
+    def _resolve_collisions(self):
+        v = self.vehicles
+        x = v["x"]
+        y = v["y"]
+        radius = v["radius"]
+        reach = 2.0 * float(radius.max())
+        if self._collision_grid is None or self._collision_grid.cell_size < reach:
+            self._collision_grid = SpatialHash(reach, self.width, self.height, periodic=True)
+        self.contacts += collisions.resolve_vehicle_collisions(
+            x, y, radius, self.width, self.height, self._collision_grid)
+
+        L = self.lights
+        if len(L):
+            # the light grid is rebuilt only when lights are added; moved lights are re-binned
+            key = (self.lights_layout, len(L), float(radius.max()))
+            if self._light_grid_key != key:
+                self._light_grid = collisions.light_grid(L["x"], L["y"], L["radius"],
+                                                         float(radius.max()), self.width, self.height)
+                self._light_grid_key = key
+            elif self._moved_lights:
+                self._light_grid.move(np.unique(np.concatenate(self._moved_lights)), L["x"], L["y"])
+            self._moved_lights = []
+            self.contacts += collisions.resolve_light_collisions(
+                x, y, radius, L["x"], L["y"], L["radius"], self._light_grid)
+
+    def run(self, steps, dt=1.0):
+        for _ in range(steps):
+            self.step(dt)